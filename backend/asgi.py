@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# perfil ASGI do settings (conexões por request); veja "Servidor ASGI" no README
+os.environ.setdefault('SERVIDOR_ASGI', 'true')
 
 application = get_asgi_application()
@@ -0,0 +1,32 @@
+# backend/executor_testes.py
+"""
+Executor do `manage.py test`: os testes usam um cache próprio, num diretório temporário apagado
+ao final, em vez do .cache/ do desenvolvedor (o cache.clear() dos testes apagaria o dele).
+
+Continua sendo um cache em arquivo, como o padrão de settings.CACHES: compartilhado entre
+processos, então despesas.autenticacao segue o mesmo caminho de produção (versão dos vínculos
+no cache, sem consulta).
+"""
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class ExecutorTestes(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._diretorio_cache = tempfile.mkdtemp(prefix="despesas-testes-cache-")
+        self._cache_dos_testes = override_settings(CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": self._diretorio_cache,
+            }
+        })
+        self._cache_dos_testes.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_dos_testes.disable()
+        shutil.rmtree(self._diretorio_cache, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,200 @@
+# backend/instrumentacao.py
+"""
+Instrumentação de requisições: nº de consultas SQL, tempo de banco, tempo da view, tempo de
+renderização (serialização para JSON) e latência total, agrupados pelo nome da view
+(ex.: "LancamentoViewSet.list", "RelatorioFinanceiroView.get").
+
+- Cada resposta recebe o cabeçalho `Server-Timing` (aparece na aba Network do navegador).
+- Os números são agregados em memória, por processo, e expostos em /api/instrumentacao/ (só admin).
+- settings.INSTRUMENTACAO_ORCAMENTOS define um máximo de consultas por view; quando excedido,
+  um aviso vai para o logger "backend.instrumentacao".
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+AMOSTRAS_POR_VIEW = 500
+
+
+def _config(nome, padrao):
+    return getattr(settings, f"INSTRUMENTACAO_{nome}", padrao)
+
+
+def nome_da_view(view_func, metodo: str) -> str:
+    """ViewSets viram "Classe.acao" (list, retrieve, meu...); APIViews viram "Classe.metodo"."""
+    classe = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+    if classe is None:
+        return f"{view_func.__module__}.{getattr(view_func, '__name__', type(view_func).__name__)}"
+    acoes = getattr(view_func, "actions", None)
+    acao = acoes.get(metodo.lower()) if acoes else metodo.lower()
+    return f"{classe.__name__}.{acao}" if acao else classe.__name__
+
+
+def orcamento_da_view(nome: str):
+    orcamentos = _config("ORCAMENTOS", {})
+    if nome in orcamentos:
+        return orcamentos[nome]
+    return orcamentos.get(nome.split(".")[0], _config("ORCAMENTO_PADRAO", None))
+
+
+class _Medicao:
+    """Contadores de uma requisição; alimentado pelo execute_wrapper de cada conexão."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.db = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+class Estatisticas:
+    """Agregado em memória por view. Thread-safe; zera quando o processo reinicia."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        with self._lock:
+            self._dados = defaultdict(lambda: {
+                "requisicoes": 0, "consultas": 0, "consultas_max": 0, "db_ms": 0.0, "view_ms": 0.0,
+                "render_ms": 0.0, "acima_orcamento": 0, "latencias": deque(maxlen=AMOSTRAS_POR_VIEW),
+            })
+
+    def registrar(self, nome, consultas, db_ms, view_ms, render_ms, total_ms, acima_orcamento):
+        with self._lock:
+            d = self._dados[nome]
+            d["requisicoes"] += 1
+            d["consultas"] += consultas
+            d["consultas_max"] = max(d["consultas_max"], consultas)
+            d["db_ms"] += db_ms
+            d["view_ms"] += view_ms
+            d["render_ms"] += render_ms
+            d["acima_orcamento"] += int(acima_orcamento)
+            d["latencias"].append(total_ms)
+
+    def resumo(self) -> dict:
+        with self._lock:
+            itens = [(nome, dict(d, latencias=sorted(d["latencias"]))) for nome, d in self._dados.items()]
+        saida = {}
+        for nome, d in sorted(itens):
+            n = d["requisicoes"]
+            latencias = d["latencias"]
+            saida[nome] = {
+                "requisicoes": n,
+                "consultas_media": round(d["consultas"] / n, 2),
+                "consultas_max": d["consultas_max"],
+                "orcamento_consultas": orcamento_da_view(nome),
+                "acima_orcamento": d["acima_orcamento"],
+                "db_ms_media": round(d["db_ms"] / n, 2),
+                "view_ms_media": round(d["view_ms"] / n, 2),
+                "render_ms_media": round(d["render_ms"] / n, 2),
+                "total_ms_p50": round(_percentil(latencias, 50), 2),
+                "total_ms_p95": round(_percentil(latencias, 95), 2),
+                "total_ms_max": round(latencias[-1], 2),
+            }
+        return saida
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+estatisticas = Estatisticas()
+
+
+class InstrumentacaoMiddleware:
+    """
+    Mede cada requisição. A renderização das respostas do DRF acontece depois da view (TemplateResponse),
+    então o tempo é dividido em: db (dentro de tudo), view, render (JSON) e total.
+    Desligue com INSTRUMENTACAO_ATIVA = False.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not _config("ATIVA", True):
+            return self.get_response(request)
+
+        medicao = _Medicao()
+        request._instrumentacao = {"view": None, "inicio_render": None, "fim_render": None}
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(medicao))
+            response = self.get_response(request)
+        fim = time.perf_counter()
+
+        marcas = request._instrumentacao
+        if marcas["view"] is None:
+            return response
+        fim_view = marcas["inicio_render"] or fim
+        view_ms = (fim_view - marcas["inicio_view"]) * 1000
+        render_ms = ((marcas["fim_render"] or fim_view) - fim_view) * 1000
+        total_ms = (fim - inicio) * 1000
+        db_ms = medicao.db * 1000
+
+        orcamento = orcamento_da_view(marcas["view"])
+        acima = orcamento is not None and medicao.consultas > orcamento
+        if acima:
+            logger.warning(
+                "%s fez %d consultas (orçamento: %d) em %s %s",
+                marcas["view"], medicao.consultas, orcamento, request.method, request.path,
+            )
+        lentas_ms = _config("LOG_LENTAS_MS", None)
+        if lentas_ms is not None and total_ms > lentas_ms:
+            logger.info("%s levou %.1f ms (%d consultas, %.1f ms de banco)", marcas["view"], total_ms, medicao.consultas, db_ms)
+
+        estatisticas.registrar(marcas["view"], medicao.consultas, db_ms, view_ms, render_ms, total_ms, acima)
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={db_ms:.1f};desc="{medicao.consultas} consultas"',
+            f"view;dur={view_ms:.1f}",
+            f"render;dur={render_ms:.1f}",
+            f"total;dur={total_ms:.1f}",
+        ])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        marcas = getattr(request, "_instrumentacao", None)
+        if marcas is not None:
+            marcas["view"] = nome_da_view(view_func, request.method)
+            marcas["inicio_view"] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        marcas = getattr(request, "_instrumentacao", None)
+        if marcas is not None:
+            marcas["inicio_render"] = time.perf_counter()
+            response.add_post_render_callback(lambda r: marcas.__setitem__("fim_render", time.perf_counter()))
+        return response
+
+
+class InstrumentacaoView(APIView):
+    """GET: estatísticas agregadas por view desde o início do processo. DELETE: zera os contadores."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(estatisticas.resumo())
+
+    def delete(self, request):
+        estatisticas.limpar()
+        return Response(status=204)
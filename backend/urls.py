@@ -5,6 +5,8 @@ from rest_framework.routers import DefaultRouter
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from backend.instrumentacao import InstrumentacaoView
+
 from despesas.views import (
     # Auth / User
     RegisterView, ChangePasswordView, CurrentUserView,
@@ -13,9 +15,12 @@ from despesas.views import (
     # Cadastros
     CategoriaViewSet, SubcategoriaViewSet, DespesaModeloViewSet, RegraRateioPadraoViewSet,
     # Financeiro
-    LancamentoViewSet, CartaoCreditoViewSet, CompraCartaoViewSet,
+    LancamentoViewSet, CartaoCreditoViewSet, CompraCartaoViewSet, TarefaProcessamentoViewSet,
     # Relatórios / Resumos
-    ResumoLancamentosView, RelatorioFinanceiroView,
+    ResumoLancamentosView, RelatorioFinanceiroView, AcertoContasView, ProjecaoView, TendenciasView,
+    DashboardView,
+    # Monitoramento
+    CacheReferenciaView,
 )
 
 router = DefaultRouter()
@@ -35,6 +40,7 @@ router.register(r"despesas-modelo", DespesaModeloViewSet, basename="despesas-mod
 router.register(r"rateios-padrao", RegraRateioPadraoViewSet, basename="rateios-padrao")
 router.register(r"cartoes", CartaoCreditoViewSet, basename="cartoes")
 router.register(r"compras-cartao", CompraCartaoViewSet, basename="compras-cartao")
+router.register(r"tarefas", TarefaProcessamentoViewSet, basename="tarefas")
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -43,6 +49,12 @@ urlpatterns = [
     # Endpoints extras (não-ViewSet)
     path("api/lancamentos-resumo/", ResumoLancamentosView.as_view(), name="lancamentos-resumo"),
     path("api/relatorio-financeiro/", RelatorioFinanceiroView.as_view(), name="relatorio-financeiro"),
+    path("api/acerto-contas/", AcertoContasView.as_view(), name="acerto-contas"),
+    path("api/projecao/", ProjecaoView.as_view(), name="projecao"),
+    path("api/tendencias/", TendenciasView.as_view(), name="tendencias"),
+    path("api/dashboard/", DashboardView.as_view(), name="dashboard"),
+    path("api/instrumentacao/", InstrumentacaoView.as_view(), name="instrumentacao"),
+    path("api/instrumentacao/cache/", CacheReferenciaView.as_view(), name="instrumentacao-cache"),
 
     # Auth
     path("api/auth/register/", RegisterView.as_view(), name="auth-register"),
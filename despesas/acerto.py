@@ -0,0 +1,98 @@
+# despesas/acerto.py
+"""
+Acerto de contas entre os membros do grupo.
+
+Saldo de um membro = quanto pagou (Lancamento.pagador) − sua parte nos rateios (RateioLancamento.valor),
+só de lançamentos PAGOS. Positivo: tem a receber; negativo: deve aos demais. A soma dos saldos do
+grupo é zero quando os rateios de cada lançamento fecham o valor total.
+
+- Por período: uma única consulta agrupada sobre ResumoMensal.
+- Acumulado: SaldoMembro, atualizado por diferença a cada recálculo de mês do ResumoMensal,
+  então o histórico não é relido a cada acesso.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import F, Sum
+
+from .models import ResumoMensal, SaldoMembro, StatusLancamento
+
+ZERO = Decimal("0.00")
+
+
+def saldos_do_resumo(resumos) -> dict[int, Decimal]:
+    """{membro_id: saldo} a partir de um queryset de ResumoMensal (já filtrado por grupo/período)."""
+    linhas = (
+        resumos.filter(status=StatusLancamento.PAGO)
+        .values("membro_id")
+        .annotate(saldo=Sum(F("valor_pago") - F("valor_rateado")))
+        .order_by()
+    )
+    return {linha["membro_id"]: linha["saldo"] for linha in linhas if linha["saldo"]}
+
+
+def saldos_de_linhas(linhas: dict) -> dict[int, Decimal]:
+    """Mesmo cálculo sobre o dict de despesas.resumos.calcular_resumo: {(categoria, membro, status): valores}."""
+    saldos = defaultdict(lambda: ZERO)
+    for (_, membro_id, status), valores in linhas.items():
+        if status == StatusLancamento.PAGO:
+            saldos[membro_id] += valores["valor_pago"] - valores["valor_rateado"]
+    return dict(saldos)
+
+
+def aplicar_variacao(casal_id: int, antes: dict, depois: dict) -> None:
+    """Soma em SaldoMembro a diferença (depois − antes) de cada membro. Chamar dentro da transação do recálculo."""
+    for membro_id in antes.keys() | depois.keys():
+        variacao = depois.get(membro_id, ZERO) - antes.get(membro_id, ZERO)
+        if not variacao:
+            continue
+        atualizados = SaldoMembro.objects.filter(casal_id=casal_id, membro_id=membro_id).update(
+            saldo=F("saldo") + variacao
+        )
+        if not atualizados:
+            SaldoMembro.objects.create(casal_id=casal_id, membro_id=membro_id, saldo=variacao)
+
+
+def saldos_acumulados(casal_id: int) -> dict[int, Decimal]:
+    return dict(SaldoMembro.objects.filter(casal_id=casal_id).exclude(saldo=0).values_list("membro_id", "saldo"))
+
+
+def reconstruir_saldos(casal_ids=None) -> int:
+    """Regrava SaldoMembro a partir do ResumoMensal inteiro (uma consulta agrupada). Retorna quantos saldos ficaram."""
+    resumos = ResumoMensal.objects.filter(status=StatusLancamento.PAGO)
+    saldos = SaldoMembro.objects.all()
+    if casal_ids is not None:
+        resumos = resumos.filter(casal_id__in=casal_ids)
+        saldos = saldos.filter(casal_id__in=casal_ids)
+    linhas = (
+        resumos.values("casal_id", "membro_id")
+        .annotate(saldo=Sum(F("valor_pago") - F("valor_rateado")))
+        .order_by()
+    )
+    novos = [SaldoMembro(casal_id=l["casal_id"], membro_id=l["membro_id"], saldo=l["saldo"]) for l in linhas if l["saldo"]]
+    saldos.delete()
+    SaldoMembro.objects.bulk_create(novos, batch_size=1000)
+    return len(novos)
+
+
+def transferencias_para_quitar(saldos: dict[int, Decimal]) -> list[tuple[int, int, Decimal]]:
+    """
+    Transferências (devedor, credor, valor) que zeram os saldos. Guloso: o maior devedor paga ao
+    maior credor até um dos dois zerar; gera no máximo n−1 transferências. Empates por id, para ser estável.
+    """
+    devedores = sorted(((-s, m) for m, s in saldos.items() if s < 0), key=lambda x: (-x[0], x[1]))
+    credores = sorted(((s, m) for m, s in saldos.items() if s > 0), key=lambda x: (-x[0], x[1]))
+    transferencias = []
+    i = j = 0
+    while i < len(devedores) and j < len(credores):
+        deve, devedor = devedores[i]
+        recebe, credor = credores[j]
+        valor = min(deve, recebe)
+        transferencias.append((devedor, credor, valor))
+        devedores[i] = (deve - valor, devedor)
+        credores[j] = (recebe - valor, credor)
+        if not devedores[i][0]:
+            i += 1
+        if not credores[j][0]:
+            j += 1
+    return transferencias
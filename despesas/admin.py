@@ -1,8 +1,9 @@
 from django.contrib import admin
 from .models import (
     CartaoCredito, Casal, MembroCasal, Categoria, Subcategoria, Lancamento, DespesaModelo, RegraRateioPadrao,
-    RateioLancamento, CompraCartao  # Adicionar CompraCartao
+    RateioLancamento, CompraCartao, TarefaProcessamento, FaturaCartao
 )
+from .services import agendar_sincronizacao_parcelas, remover_compra_cartao
 
 # ... (CasalAdmin, MembroCasalAdmin, CategoriaAdmin, SubcategoriaAdmin não mudam) ...
 
@@ -49,16 +50,25 @@ class RegraRateioPadraoInline(admin.TabularInline):
 
 @admin.register(DespesaModelo)
 class DespesaModeloAdmin(admin.ModelAdmin):
-    list_display = ("id", "nome", "casal", "escopo", "categoria", "valor_previsto", "dia_vencimento", "recorrente", "periodicidade", "ativo")
+    list_display = ("id", "nome", "casal", "escopo", "categoria", "valor_previsto", "dia_vencimento", "recorrente", "periodicidade", "proxima_competencia", "ativo")
     list_filter = ("escopo", "recorrente", "periodicidade", "ativo", "casal", "categoria")
     search_fields = ("nome",)
     inlines = [RegraRateioPadraoInline]
     
 @admin.register(CartaoCredito)
 class CartaoCreditoAdmin(admin.ModelAdmin):
-    list_display = ("nome", "bandeira", "limite", "dia_fechamento", "dia_vencimento", "ativo")
+    list_display = ("nome", "bandeira", "limite", "limite_utilizado", "dia_fechamento", "dia_vencimento", "ativo")
     search_fields = ("nome",)
     list_filter = ("bandeira", "ativo")
+    readonly_fields = ("limite_utilizado",)
+
+
+@admin.register(FaturaCartao)
+class FaturaCartaoAdmin(admin.ModelAdmin):
+    """ Totais mantidos pelo recálculo (despesas.faturas); rebuild_resumos corrige divergências """
+    list_display = ("cartao", "competencia", "data_fechamento", "data_vencimento", "valor_total", "valor_pago", "quantidade")
+    list_filter = ("cartao",)
+    readonly_fields = ("casal", "cartao", "competencia", "data_fechamento", "data_vencimento", "valor_total", "valor_pago", "quantidade")
 
 
 # --- NOVOS REGISTROS E INLINES ---
@@ -67,7 +77,7 @@ class LancamentoInline(admin.TabularInline):
     """ Para visualizar as parcelas geradas a partir da compra """
     model = Lancamento
     extra = 0
-    readonly_fields = ("casal", "despesa_modelo", "subcategoria", "escopo", "dono_pessoal", "descricao", "competencia", "data_vencimento", "valor_total", "status", "data_pagamento", "pagador", "compra_cartao", "parcela_numero", "parcelas_total", "criado_por")
+    readonly_fields = ("casal", "despesa_modelo", "subcategoria", "escopo", "dono_pessoal", "descricao", "competencia", "data_vencimento", "valor_total", "status", "data_pagamento", "pagador", "compra_cartao", "fatura", "parcela_numero", "parcelas_total", "criado_por")
     can_delete = False
 
     def has_add_permission(self, request, obj=None):
@@ -82,4 +92,23 @@ class CompraCartaoAdmin(admin.ModelAdmin):
     list_display = ("descricao", "cartao", "valor_total", "parcelas_total", "primeira_competencia")
     list_filter = ("cartao", "escopo")
     search_fields = ("descricao",)
-    inlines = [LancamentoInline]
\ No newline at end of file
+    inlines = [LancamentoInline]
+
+    def save_related(self, request, form, formsets, change):
+        # depois do inline: o formset salvo por último não pode sobrescrever as parcelas sincronizadas
+        super().save_related(request, form, formsets, change)
+        if not change or form.changed_data:
+            agendar_sincronizacao_parcelas(form.instance, request.user)
+
+    def delete_model(self, request, obj):
+        remover_compra_cartao(obj)
+
+    def delete_queryset(self, request, queryset):
+        for compra in queryset:
+            remover_compra_cartao(compra)
+
+@admin.register(TarefaProcessamento)
+class TarefaProcessamentoAdmin(admin.ModelAdmin):
+    list_display = ("id", "tipo", "casal", "status", "processados", "total", "criado_em", "concluida_em")
+    list_filter = ("status", "tipo")
+    readonly_fields = ("iniciada_em", "concluida_em")
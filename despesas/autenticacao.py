@@ -0,0 +1,137 @@
+# despesas/autenticacao.py
+"""
+Autenticação JWT sem consulta ao banco por request.
+
+Os tokens levam, além do user_id, username/is_staff/is_superuser, o grupo ativo (`casal`) e a
+versão dos vínculos do usuário (`vv`, PreferenciasUsuario.versao_vinculos). JWTSemConsultaAuthentication
+monta o usuário a partir dessas claims (instância de User com os demais campos adiados, carregados só se
+forem lidos) e get_casal_ativo usa o grupo do token, então uma request comum não consulta auth_user,
+PreferenciasUsuario nem MembroCasal.
+
+A versão muda quando o grupo atual é trocado, quando uma participação (MembroCasal) é criada, alterada
+ou removida (mudando grupo, usuário ou `ativo`) e quando o usuário é desativado (despesas/signals.py).
+Um token com versão antiga recebe 401 e o frontend renova o acesso em /api/token/refresh/, que emite as
+claims novas.
+
+O valor atual fica no cache do Django só se ele for compartilhado entre os processos (ver CACHES em
+settings): com um cache em memória local, a troca feita por um worker não chegaria aos outros, que
+continuariam aceitando o token antigo. Nesse caso a versão é lida do banco a cada request (uma consulta
+por chave primária em PreferenciasUsuario).
+
+DESPESAS_JWT_SEM_CONSULTA = False volta ao JWTAuthentication padrão; tokens sem as claims (emitidos
+antes) também seguem pelo caminho padrão.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import PreferenciasUsuario
+from .utils import get_casal_ativo_do_usuario
+
+User = get_user_model()
+
+CLAIM_CASAL = "casal"
+CLAIM_VERSAO = "vv"
+_CAMPOS_DO_TOKEN = ("username", "is_staff", "is_superuser")
+
+
+def _chave(usuario_id):
+    return f"despesas:jwt:vinculos:{usuario_id}"
+
+
+_CACHES_POR_PROCESSO = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def cache_compartilhado() -> bool:
+    """O cache padrão é visto por todos os processos? (memória local e dummy não são)"""
+    return settings.CACHES["default"]["BACKEND"] not in _CACHES_POR_PROCESSO
+
+
+def _versao_no_banco(usuario_id) -> int:
+    return (
+        PreferenciasUsuario.objects.filter(usuario_id=usuario_id).values_list("versao_vinculos", flat=True).first()
+        or 0
+    )
+
+
+def versao_vinculos(usuario_id) -> int:
+    if not cache_compartilhado():
+        return _versao_no_banco(usuario_id)
+    versao = cache.get(_chave(usuario_id))
+    if versao is None:
+        versao = _versao_no_banco(usuario_id)
+        cache.set(_chave(usuario_id), versao, getattr(settings, "DESPESAS_JWT_VERSAO_TIMEOUT", 300))
+    return versao
+
+
+def trocar_versao_vinculos(*usuario_ids) -> None:
+    """Invalida os tokens de acesso já emitidos para os usuários."""
+    # quem recebeu token tem PreferenciasUsuario (criada em preencher_claims)
+    PreferenciasUsuario.objects.filter(usuario_id__in=usuario_ids).update(versao_vinculos=F("versao_vinculos") + 1)
+    chaves = [_chave(usuario_id) for usuario_id in usuario_ids]
+    cache.delete_many(chaves)
+    # de novo após o commit: uma leitura concorrente pode ter recolocado a versão antiga no cache
+    transaction.on_commit(lambda: cache.delete_many(chaves))
+
+
+def preencher_claims(token, user) -> None:
+    for campo in _CAMPOS_DO_TOKEN:
+        token[campo] = getattr(user, campo)
+    # resolve (e sincroniza) o grupo antes de ler a versão: a sincronização pode trocá-la
+    casal = get_casal_ativo_do_usuario(user)
+    prefs, _ = PreferenciasUsuario.objects.get_or_create(usuario=user)
+    token[CLAIM_CASAL] = casal.pk if casal else None
+    token[CLAIM_VERSAO] = prefs.versao_vinculos
+
+
+class TokenComVinculos(RefreshToken):
+    """Refresh token com as claims de vínculo; o access token derivado as copia."""
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        preencher_claims(token, user)
+        return token
+
+
+class TokenComVinculosObtainSerializer(TokenObtainPairSerializer):
+    token_class = TokenComVinculos
+
+
+class TokenComVinculosRefreshSerializer(TokenRefreshSerializer):
+    """Renova o access token com o grupo ativo e a versão atuais, não com os do refresh token."""
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        refresh = self.token_class(data.get("refresh", attrs["refresh"]), verify=False)
+        access = refresh.access_token
+        preencher_claims(access, User.objects.get(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]}))
+        data["access"] = str(access)
+        return data
+
+
+def usuario_do_token(validated_token):
+    """User montado só com as claims; os demais campos ficam adiados e são lidos do banco se usados."""
+    valores = {"id": validated_token[api_settings.USER_ID_CLAIM], "is_active": True}
+    valores.update({campo: validated_token[campo] for campo in _CAMPOS_DO_TOKEN})
+    campos = [f.attname for f in User._meta.concrete_fields if f.attname in valores]
+    user = User.from_db(None, campos, [valores[campo] for campo in campos])
+    user.casal_do_token = validated_token[CLAIM_CASAL]
+    return user
+
+
+class JWTSemConsultaAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if not getattr(settings, "DESPESAS_JWT_SEM_CONSULTA", True) or CLAIM_VERSAO not in validated_token:
+            return super().get_user(validated_token)
+        if validated_token[CLAIM_VERSAO] != versao_vinculos(validated_token[api_settings.USER_ID_CLAIM]):
+            raise InvalidToken("Grupo atual ou participações alterados; renove o token.")
+        return usuario_do_token(validated_token)
@@ -0,0 +1,517 @@
+# despesas/benchmark.py
+"""
+Suíte de benchmark dos pontos quentes do app, rodando sobre os dados de `manage.py seed_benchmark`.
+
+Cada caso é repetido N vezes e reporta consultas SQL e latência (p50/p95/máx, em ms). Os casos que
+gravam (geração de competência e de parcelas) rodam dentro de uma transação desfeita ao final, então
+o banco não muda entre repetições nem entre execuções. Os resultados são salvos em JSON para comparar
+commits (`manage.py benchmark_suite --comparar arquivo.json`).
+
+`escrita_concorrente` compara a vazão de gravações simultâneas entre perfis de banco
+(`manage.py benchmark_escrita`); `geracao_concorrente` roda várias gerações de competência em
+processos separados sobre o mesmo banco e confere que nada foi duplicado (`manage.py stress_geracao`);
+`carga_wsgi_asgi` compara a vazão dos relatórios sob clientes simultâneos pelos handlers WSGI e ASGI
+(`manage.py benchmark_asgi`).
+"""
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from decimal import Decimal
+from pathlib import Path
+
+import environ
+from asgiref.sync import async_to_sync
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .autenticacao import TokenComVinculos
+from .models import Casal, CartaoCredito, CompraCartao, DespesaModelo, EscopoDespesa, Lancamento, MembroCasal
+from .services import gerar_lancamentos_competencia, gerar_lancamentos_competencia_lote, gerar_lancamentos_da_compra
+
+User = get_user_model()
+
+
+class _Desfazer(Exception):
+    pass
+
+
+def percentil(valores, p: float) -> float:
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    k = (len(ordenados) - 1) * p / 100
+    baixo = int(k)
+    alto = min(baixo + 1, len(ordenados) - 1)
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (k - baixo)
+
+
+def _estatisticas(tempos_ms, consultas) -> dict:
+    return {
+        "repeticoes": len(tempos_ms),
+        "consultas": int(statistics.median(consultas)),
+        "p50_ms": round(percentil(tempos_ms, 50), 2),
+        "p95_ms": round(percentil(tempos_ms, 95), 2),
+        "max_ms": round(max(tempos_ms), 2),
+    }
+
+
+def medir(executar, repeticoes: int, preparar=None, desfazer=False, aquecimento=1) -> dict:
+    """
+    Roda `executar(preparado)` `repeticoes` vezes (mais `aquecimento` rodadas descartadas).
+    Com desfazer=True, cada rodada (preparar + executar) acontece numa transação desfeita no fim;
+    só `executar` entra na contagem de tempo e de consultas.
+    """
+    tempos, consultas = [], []
+    for i in range(aquecimento + repeticoes):
+        try:
+            with transaction.atomic():
+                preparado = preparar() if preparar else None
+                with CaptureQueriesContext(connection) as ctx:
+                    inicio = time.perf_counter()
+                    executar(preparado)
+                    fim = time.perf_counter()
+                if desfazer:
+                    raise _Desfazer()
+        except _Desfazer:
+            pass  # o rollback descarta também os recálculos agendados
+        if i >= aquecimento:
+            tempos.append((fim - inicio) * 1000)
+            consultas.append(len(ctx.captured_queries))
+    return _estatisticas(tempos, consultas)
+
+
+def escolher_alvo(prefixo: str = "bench"):
+    """Grupo do meio entre os sintéticos, o primeiro membro dele e a competência mais recente com dados."""
+    casais = Casal.objects.filter(nome__startswith=f"{prefixo}-").order_by("id")
+    total = casais.count()
+    if not total:
+        return None
+    casal = casais[total // 2]
+    membro = MembroCasal.objects.filter(casal=casal, ativo=True).select_related("usuario").order_by("id").first()
+    ultima = (
+        Lancamento.objects.filter(casal=casal, competencia__lte=timezone.localdate())
+        .order_by("-competencia").values_list("competencia", flat=True).first()
+    )
+    return casal, membro.usuario, ultima or timezone.localdate().replace(day=1)
+
+
+def volume(prefixo: str = "bench") -> dict:
+    casais = Casal.objects.filter(nome__startswith=f"{prefixo}-")
+    return {
+        "casais": casais.count(),
+        "lancamentos": Lancamento.objects.filter(casal__in=casais).count(),
+        "compras_cartao": CompraCartao.objects.filter(casal__in=casais).count(),
+    }
+
+
+def executar_suite(repeticoes: int = 20, prefixo: str = "bench", lote: int = 200, filtro: str | None = None, log=None) -> dict:
+    """Roda todos os casos (ou só os que contêm `filtro` no nome) e devolve {nome: estatísticas}."""
+    alvo = escolher_alvo(prefixo)
+    if alvo is None:
+        raise ValueError(f"Nenhum grupo '{prefixo}-*' encontrado. Rode `manage.py seed_benchmark` antes.")
+    casal, usuario, competencia = alvo
+    proxima = competencia + relativedelta(months=1)
+    casais_lote = list(
+        Casal.objects.filter(nome__startswith=f"{prefixo}-").order_by("id").values_list("id", flat=True)[:lote]
+    )
+    cartao = CartaoCredito.objects.filter(casal=casal).first()
+    subcategoria_id = Lancamento.objects.filter(casal=casal).values_list("subcategoria_id", flat=True).first()
+
+    cliente = APIClient()
+    cliente.force_authenticate(usuario)
+
+    def get(url, **params):
+        def _executar(_):
+            response = cliente.get(url, params)
+            assert response.status_code == 200, (url, response.status_code)
+        return _executar
+
+    def nova_compra():
+        return CompraCartao.objects.create(
+            casal=casal, cartao=cartao, descricao="Benchmark 24x", subcategoria_id=subcategoria_id,
+            escopo=EscopoDespesa.COMPARTILHADA, valor_total=Decimal("2399.90"), parcelas_total=24,
+            primeira_competencia=proxima, primeiro_vencimento=proxima.replace(day=10), pagador=usuario,
+        )
+
+    mes = f"{competencia:%Y-%m}"
+    casos = {
+        "services.gerar_lancamentos_competencia": dict(
+            executar=lambda _: gerar_lancamentos_competencia(casal, proxima, usuario), desfazer=True,
+        ),
+        f"services.gerar_lancamentos_competencia_lote ({len(casais_lote)} grupos)": dict(
+            executar=lambda _: gerar_lancamentos_competencia_lote(casais_lote, proxima), desfazer=True,
+        ),
+        "services.gerar_lancamentos_da_compra (24x)": dict(
+            preparar=nova_compra, executar=lambda compra: gerar_lancamentos_da_compra(compra, usuario), desfazer=True,
+        ),
+        "GET /api/lancamentos/": dict(executar=get("/api/lancamentos/")),
+        f"GET /api/lancamentos/?competencia={mes}": dict(executar=get("/api/lancamentos/", competencia=mes)),
+        "GET /api/compras-cartao/": dict(executar=get("/api/compras-cartao/")),
+        "GET /api/despesas-modelo/": dict(executar=get("/api/despesas-modelo/")),
+        f"GET /api/relatorio-financeiro/?competencia={mes}": dict(
+            executar=get("/api/relatorio-financeiro/", competencia=mes),
+        ),
+        f"GET /api/relatorio-financeiro/?competencia={competencia:%Y}": dict(
+            executar=get("/api/relatorio-financeiro/", competencia=f"{competencia:%Y}"),
+        ),
+    }
+
+    resultados = {}
+    for nome, caso in casos.items():
+        if filtro and filtro not in nome:
+            continue
+        resultados[nome] = medir(repeticoes=repeticoes, **caso)
+        if log:
+            log(nome, resultados[nome])
+    return resultados
+
+
+# ---------------------------
+# Escrita concorrente por perfil de banco
+# ---------------------------
+
+_PRAGMAS_PADRAO = {"journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 5000}
+
+
+def perfis_de_escrita(pasta) -> dict:
+    """
+    Perfis comparados por `escrita_concorrente`, como entradas de settings.DATABASES:
+    - sqlite-padrao: SQLite sem ajustes e uma conexão por transação (o comportamento antigo);
+    - sqlite-otimizado: WAL/pragmas de settings.SQLITE_PRAGMAS, BEGIN IMMEDIATE e conexão persistente;
+    - o banco configurado, quando não é SQLite (PostgreSQL), com e sem conexão persistente.
+    """
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", None) or _PRAGMAS_PADRAO
+    perfis = {
+        "sqlite-padrao": {
+            "ENGINE": "django.db.backends.sqlite3", "NAME": str(Path(pasta) / "padrao.sqlite3"), "CONN_MAX_AGE": 0,
+        },
+        "sqlite-otimizado": {
+            "ENGINE": "django.db.backends.sqlite3", "NAME": str(Path(pasta) / "otimizado.sqlite3"), "CONN_MAX_AGE": None,
+            "OPTIONS": {
+                "init_command": ";".join(f"PRAGMA {nome}={valor}" for nome, valor in pragmas.items()),
+                "transaction_mode": "IMMEDIATE",
+                "timeout": pragmas.get("busy_timeout", 5000) / 1000,
+            },
+        },
+    }
+    padrao = settings.DATABASES["default"]
+    if padrao["ENGINE"] != "django.db.backends.sqlite3":
+        vendor = connections["default"].vendor
+        perfis[vendor] = dict(padrao, CONN_MAX_AGE=padrao.get("CONN_MAX_AGE") or None, TEST={})
+        if not padrao.get("OPTIONS", {}).get("pool"):
+            perfis[f"{vendor}-sem-persistencia"] = dict(padrao, CONN_MAX_AGE=0, TEST={})
+    return perfis
+
+
+def _criar_tabela(alias):
+    conexao = connections[alias]
+    chave = "INTEGER PRIMARY KEY AUTOINCREMENT" if conexao.vendor == "sqlite" else "BIGSERIAL PRIMARY KEY"
+    with conexao.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS bench_escrita")
+        cursor.execute(
+            f"CREATE TABLE bench_escrita (id {chave}, casal_id INTEGER NOT NULL, valor INTEGER NOT NULL, "
+            "acumulado INTEGER NOT NULL)"
+        )
+
+
+def _escrever(alias, casal_id, transacoes, reconectar) -> int:
+    """Transações curtas de ler-e-gravar, como um recálculo de resumo; devolve quantas falharam por lock."""
+    conexao = connections[alias]
+    erros = 0
+    try:
+        for _ in range(transacoes):
+            try:
+                with transaction.atomic(using=alias), conexao.cursor() as cursor:
+                    cursor.execute("SELECT COALESCE(SUM(valor), 0) FROM bench_escrita WHERE casal_id = %s", [casal_id])
+                    acumulado = cursor.fetchone()[0]
+                    cursor.execute(
+                        "INSERT INTO bench_escrita (casal_id, valor, acumulado) VALUES (%s, %s, %s)",
+                        [casal_id, 1, acumulado + 1],
+                    )
+            except OperationalError:
+                erros += 1
+            if reconectar:
+                conexao.close()
+    finally:
+        conexao.close()
+    return erros
+
+
+def escrita_concorrente(perfil: str, config: dict, usuarios: int = 4, transacoes: int = 200, grupos: int = 2) -> dict:
+    """`usuarios` threads gravando ao mesmo tempo em `grupos` grupos; mede transações por segundo e falhas."""
+    alias = f"bench_{perfil.replace('-', '_')}"
+    connections.settings[alias] = connections.configure_settings({"default": {}, alias: dict(config)})[alias]
+    try:
+        _criar_tabela(alias)
+        connections[alias].close()
+        reconectar = config.get("CONN_MAX_AGE") == 0
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=usuarios) as executor:
+            erros = sum(executor.map(
+                lambda i: _escrever(alias, i % grupos, transacoes, reconectar), range(usuarios)
+            ))
+        segundos = time.perf_counter() - inicio
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM bench_escrita")
+            gravadas = cursor.fetchone()[0]
+            if connections[alias].vendor != "sqlite":
+                cursor.execute("DROP TABLE bench_escrita")
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+    return {
+        "usuarios": usuarios,
+        "transacoes": usuarios * transacoes,
+        "gravadas": gravadas,
+        "falhas": erros,
+        "segundos": round(segundos, 3),
+        "tps": round(gravadas / segundos, 1) if segundos else 0.0,
+    }
+
+
+# ---------------------------
+# Geração de competência concorrente (vários processos)
+# ---------------------------
+
+def _conferir_geracao(url, prefixo, competencia) -> dict:
+    alias = "stress_geracao"
+    connections.settings[alias] = connections.configure_settings(
+        {"default": {}, alias: environ.Env.db_url_config(url)}
+    )[alias]
+    try:
+        casais = Casal.objects.using(alias).filter(nome__startswith=f"{prefixo}-")
+        lancamentos = Lancamento.objects.using(alias).filter(
+            casal__in=casais, competencia=competencia, despesa_modelo__isnull=False
+        )
+        despesas = DespesaModelo.objects.using(alias).filter(casal__in=casais, ativo=True)
+        return {
+            "esperados": despesas.count(),
+            "gerados": lancamentos.count(),
+            "duplicados": (
+                lancamentos.values("casal_id", "despesa_modelo_id").annotate(n=Count("id")).filter(n__gt=1).count()
+            ),
+            "sem_rateio": lancamentos.filter(rateios__isnull=True).count(),
+            "agenda_avancada": despesas.filter(proxima_competencia=competencia + relativedelta(months=1)).count(),
+        }
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+
+def geracao_concorrente(processos: int = 4, grupos: int = 20, despesas: int = 5, database_url: str | None = None) -> dict:
+    """
+    `processos` execuções simultâneas de `manage.py gerar_competencia` (processos separados) sobre o mesmo
+    banco: um SQLite temporário, migrado e populado aqui, ou `database_url` (os grupos sintéticos são
+    removidos ao final). Confere que cada despesa vencida gerou um único lançamento, com rateio, e que a
+    agenda avançou uma vez.
+    """
+    manage = str(Path(settings.BASE_DIR) / "manage.py")
+    competencia = timezone.localdate().replace(day=1)
+    prefixo = f"stress{os.getpid()}"
+    with tempfile.TemporaryDirectory() as pasta:
+        url = database_url or f"sqlite:///{Path(pasta) / 'stress.sqlite3'}"
+        ambiente = dict(os.environ, DATABASE_URL=url)
+        if not database_url:
+            # banco temporário, cache temporário: os ids dele não podem invalidar o cache do projeto
+            ambiente["CACHE_URL"] = f"filecache://{Path(pasta) / 'cache'}"
+
+        def executar(*args):
+            subprocess.run([sys.executable, manage, *args], env=ambiente, capture_output=True, text=True, check=True)
+
+        if not database_url:
+            executar("migrate", "--noinput", "-v", "0")
+        executar(
+            "seed_benchmark", "--casais", str(grupos), "--despesas", str(despesas), "--lancamentos", "0",
+            "--compras", "0", "--prefixo", prefixo, "--sem-resumos",
+        )
+        # lotes pequenos: os processos disputam os mesmos grupos várias vezes
+        comando = [
+            sys.executable, manage, "gerar_competencia", "--competencia", f"{competencia:%Y-%m}",
+            "--chunk", str(max(1, grupos // 4)),
+        ]
+        inicio = time.perf_counter()
+        filhos = [
+            subprocess.Popen(comando, env=ambiente, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            for _ in range(processos)
+        ]
+        saidas = [filho.communicate() for filho in filhos]
+        segundos = time.perf_counter() - inicio
+        falhas = [
+            (erro.strip().splitlines() or [f"código {filho.returncode}"])[-1]
+            for filho, (_, erro) in zip(filhos, saidas)
+            if filho.returncode
+        ]
+        try:
+            conferencia = _conferir_geracao(url, prefixo, competencia)
+        finally:
+            if database_url:
+                executar("seed_benchmark", "--limpar", "--prefixo", prefixo)
+    return {
+        "processos": processos,
+        "grupos": grupos,
+        "competencia": f"{competencia:%Y-%m}",
+        "segundos": round(segundos, 3),
+        "falhas": falhas,
+        **conferencia,
+    }
+
+
+# ---------------------------
+# Vazão sob carga: WSGI × ASGI
+# ---------------------------
+
+ROTAS_CARGA = (
+    "/api/relatorio-financeiro/", "/api/lancamentos-resumo/", "/api/tendencias/?meses=12", "/api/dashboard/",
+)
+
+
+@contextmanager
+def _perfil_asgi(paralelo: bool):
+    """Conexão por request, como no perfil ASGI do settings, e consultas paralelas ligadas ou não."""
+    config = connections.settings["default"]
+    anterior = config.get("CONN_MAX_AGE")
+    connections.close_all()
+    config["CONN_MAX_AGE"] = 0
+    try:
+        with override_settings(DESPESAS_CONSULTAS_PARALELAS=paralelo):
+            yield
+    finally:
+        connections.close_all()
+        config["CONN_MAX_AGE"] = anterior
+
+
+def _separar(rota):
+    caminho, _, query = rota.partition("?")
+    return caminho, query
+
+
+def _carga_wsgi(rotas, usuarios, requisicoes, token):
+    handler = WSGIHandler()
+
+    def chamar(rota):
+        caminho, query = _separar(rota)
+        ambiente = {
+            "REQUEST_METHOD": "GET", "PATH_INFO": caminho, "QUERY_STRING": query, "SERVER_NAME": "benchmark",
+            "SERVER_PORT": "80", "HTTP_HOST": "benchmark", "HTTP_AUTHORIZATION": f"Bearer {token}",
+            "wsgi.input": io.BytesIO(), "wsgi.url_scheme": "http", "wsgi.errors": sys.stderr,
+        }
+        status = []
+        resposta = handler(ambiente, lambda s, cabecalhos, exc_info=None: status.append(s))
+        try:
+            b"".join(resposta)
+        finally:
+            resposta.close()  # dispara request_finished, como o servidor WSGI
+        return int(status[0][:3])
+
+    def usuario(i):
+        tempos, erros = [], 0
+        try:
+            for j in range(requisicoes):
+                inicio = time.perf_counter()
+                erros += chamar(rotas[(i + j) % len(rotas)]) != 200
+                tempos.append((time.perf_counter() - inicio) * 1000)
+        finally:
+            connections.close_all()
+        return tempos, erros
+
+    with ThreadPoolExecutor(max_workers=usuarios) as executor:
+        return list(executor.map(usuario, range(usuarios)))
+
+
+async def _carga_asgi(rotas, usuarios, requisicoes, token):
+    handler = ASGIHandler()
+
+    async def chamar(rota):
+        caminho, query = _separar(rota)
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": caminho, "raw_path": caminho.encode(), "query_string": query.encode(),
+            "headers": [(b"host", b"benchmark"), (b"authorization", f"Bearer {token}".encode())],
+            "server": ("benchmark", 80), "client": ("127.0.0.1", 0),
+        }
+        corpo_lido = asyncio.Event()
+
+        async def receive():
+            if corpo_lido.is_set():
+                await asyncio.Event().wait()  # sem desconexão: o handler cancela a espera ao responder
+            corpo_lido.set()
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        status = []
+
+        async def send(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status.append(mensagem["status"])
+
+        await handler(scope, receive, send)
+        return status[0]
+
+    async def usuario(i):
+        tempos, erros = [], 0
+        for j in range(requisicoes):
+            inicio = time.perf_counter()
+            erros += await chamar(rotas[(i + j) % len(rotas)]) != 200
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return tempos, erros
+
+    return await asyncio.gather(*(usuario(i) for i in range(usuarios)))
+
+
+def carga_wsgi_asgi(usuarios: int = 8, requisicoes: int = 25, rotas=ROTAS_CARGA, prefixo: str = "bench") -> dict:
+    """
+    `usuarios` clientes simultâneos, cada um fazendo `requisicoes` GETs seguidos (alternando `rotas`) como o
+    primeiro membro de um grupo sintético, pelos handlers do Django sem servidor na frente:
+    - wsgi: WSGIHandler, um cliente por thread (como gunicorn com threads), conexões do settings;
+    - asgi: ASGIHandler num único event loop (como uvicorn), conexão por request e consultas paralelas;
+    - asgi-sequencial: o mesmo, com settings.DESPESAS_CONSULTAS_PARALELAS = False.
+    Devolve, por perfil, requisições por segundo, latência (p50/p95/máx, em ms) e respostas com erro.
+    """
+    alvo = escolher_alvo(prefixo)
+    if alvo is None:
+        raise ValueError(f"Nenhum grupo '{prefixo}-*' encontrado. Rode `manage.py seed_benchmark` antes.")
+    _, usuario, _ = alvo
+    token = str(TokenComVinculos.for_user(usuario).access_token)
+    rotas = list(rotas)
+
+    perfis = {
+        "wsgi": lambda: _carga_wsgi(rotas, usuarios, requisicoes, token),
+        "asgi": lambda: async_to_sync(_carga_asgi)(rotas, usuarios, requisicoes, token),
+        "asgi-sequencial": lambda: async_to_sync(_carga_asgi)(rotas, usuarios, requisicoes, token),
+    }
+    # aquecimento: imports, cache de referência e páginas do banco ficam iguais para os três perfis
+    _carga_wsgi(rotas, 1, len(rotas), token)
+    resultados = {}
+    for perfil, executar in perfis.items():
+        contexto = _perfil_asgi(paralelo=perfil == "asgi") if perfil.startswith("asgi") else nullcontext()
+        with contexto:
+            inicio = time.perf_counter()
+            por_usuario = executar()
+            segundos = time.perf_counter() - inicio
+        tempos = [t for tempos_usuario, _ in por_usuario for t in tempos_usuario]
+        resultados[perfil] = {
+            "requisicoes": len(tempos),
+            "erros": sum(erros for _, erros in por_usuario),
+            "segundos": round(segundos, 3),
+            "rps": round(len(tempos) / segundos, 1) if segundos else 0.0,
+            "p50_ms": round(percentil(tempos, 50), 2),
+            "p95_ms": round(percentil(tempos, 95), 2),
+            "max_ms": round(max(tempos), 2),
+        }
+    return resultados
@@ -0,0 +1,121 @@
+# despesas/cache_referencia.py
+"""
+Cache das listagens de dados de referência por grupo: categorias, subcategorias, cartões e membros
+(e da projeção de caixa, despesas.projecao).
+
+A resposta serializada de cada listagem fica no cache do Django (settings.CACHES) sob uma chave com
+(recurso, grupo, versão, query string). Invalidar é só trocar a versão do par (recurso, grupo): as
+chaves antigas deixam de ser lidas e expiram sozinhas. As versões são trocadas pelos signals em
+despesas/signals.py e, para operações em lote sem signals, chamando `invalidar` diretamente.
+
+Contadores de acertos/faltas/invalidações por recurso ficam em memória (por processo) e aparecem
+em /api/instrumentacao/cache/.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from .utils import get_casal_ativo
+
+CATEGORIAS = "categorias"
+SUBCATEGORIAS = "subcategorias"
+CARTOES = "cartoes"
+MEMBROS = "membros"
+PROJECAO = "projecao"
+
+_lock = threading.Lock()
+_contadores = defaultdict(lambda: {"acertos": 0, "faltas": 0, "invalidacoes": 0})
+
+
+def _cache():
+    return caches[getattr(settings, "DESPESAS_CACHE_REFERENCIA_ALIAS", "default")]
+
+
+def _timeout():
+    return getattr(settings, "DESPESAS_CACHE_REFERENCIA_TIMEOUT", 60 * 60)
+
+
+def _contar(recurso, campo):
+    with _lock:
+        _contadores[recurso][campo] += 1
+
+
+def _chave_versao(recurso, casal_id):
+    return f"despesas:ref:versao:{recurso}:{casal_id}"
+
+
+def _versao(recurso, casal_id):
+    chave = _chave_versao(recurso, casal_id)
+    versao = _cache().get(chave)
+    if versao is None:
+        # começa num valor novo (e não em 1) para nunca reaproveitar entradas de uma versão perdida
+        versao = time.time_ns()
+        _cache().add(chave, versao, None)
+        versao = _cache().get(chave, versao)
+    return versao
+
+
+def obter(recurso, casal_id, variante, gerar):
+    """Devolve o payload em cache ou chama `gerar()` e guarda o resultado."""
+    chave = f"despesas:ref:{recurso}:{casal_id}:{_versao(recurso, casal_id)}:{variante}"
+    dados = _cache().get(chave)
+    if dados is not None:
+        _contar(recurso, "acertos")
+        return dados
+    _contar(recurso, "faltas")
+    dados = gerar()
+    _cache().set(chave, dados, _timeout())
+    return dados
+
+
+def _trocar_versao(recurso, casal_id):
+    try:
+        _cache().incr(_chave_versao(recurso, casal_id))
+    except ValueError:
+        # versão ainda não existe: nada em cache para este par
+        pass
+
+
+def invalidar(casal_id, *recursos):
+    """
+    Descarta o cache dos recursos do grupo agora e de novo após o commit, para que uma leitura feita
+    entre a alteração e o commit não deixe dados antigos em cache.
+    """
+    if casal_id is None:
+        return
+    for recurso in recursos:
+        _contar(recurso, "invalidacoes")
+        _trocar_versao(recurso, casal_id)
+    transaction.on_commit(lambda: [_trocar_versao(recurso, casal_id) for recurso in recursos])
+
+
+def estatisticas() -> dict:
+    with _lock:
+        saida = {}
+        for recurso, c in sorted(_contadores.items()):
+            leituras = c["acertos"] + c["faltas"]
+            saida[recurso] = dict(c, taxa_acerto=round(c["acertos"] / leituras, 3) if leituras else None)
+        return saida
+
+
+def limpar_estatisticas() -> None:
+    with _lock:
+        _contadores.clear()
+
+
+class CacheReferenciaMixin:
+    """Responde `list` a partir do cache do grupo ativo; `recurso_cache` define a chave e a invalidação."""
+    recurso_cache = None
+
+    def list(self, request, *args, **kwargs):
+        casal = get_casal_ativo(request)
+        if not casal:
+            return super().list(request, *args, **kwargs)
+        variante = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.items() if k != "format"))
+        dados = obter(self.recurso_cache, casal.id, variante, lambda: super(CacheReferenciaMixin, self).list(request, *args, **kwargs).data)
+        return Response(dados)
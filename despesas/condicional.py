@@ -0,0 +1,88 @@
+# despesas/condicional.py
+"""
+GET condicional (ETag / Last-Modified) nas listagens e detalhes dos ViewSets.
+
+A versão da resposta vem de uma única consulta agregada sobre o mesmo queryset filtrado que seria
+serializado: Max(atualizado_em) e Count(pk), mais Max/Count das relações aninhadas no serializer
+(`relacoes_versao`). Tabelas que crescem sem limite (lançamentos) trocam esse agregado por um contador
+do grupo (`versao_condicional`), lido por chave primária. Se o If-None-Match do cliente bate, a
+resposta é 304 sem carregar nem serializar as linhas. Cache-Control: private, no-cache faz o navegador
+revalidar sempre em vez de reaproveitar a resposta por heurística.
+
+Limites: alterações com queryset.update() precisam gravar atualizado_em (ver
+services.quitar_lancamentos_lote); dados de User (nome, e-mail) não têm carimbo e não entram na versão.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .utils import get_casal_ativo
+
+
+def versao(queryset, relacoes=()):
+    """(assinatura, último atualizado_em) do queryset e das relações aninhadas, numa consulta."""
+    agregados = {"ultima": Max("atualizado_em"), "total": Count("pk", distinct=bool(relacoes))}
+    for i, relacao in enumerate(relacoes):
+        agregados[f"ultima_{i}"] = Max(f"{relacao}__atualizado_em")
+        agregados[f"total_{i}"] = Count(f"{relacao}__pk", distinct=True)
+    valores = queryset.order_by().aggregate(**agregados)
+    ultima = max((v for k, v in valores.items() if k.startswith("ultima") and v is not None), default=None)
+    assinatura = "|".join(
+        f"{k}={v.isoformat() if hasattr(v, 'isoformat') else v}" for k, v in sorted(valores.items())
+    )
+    return assinatura, ultima
+
+
+class GetCondicionalMixin:
+    """
+    Responde list/retrieve com ETag e Last-Modified e devolve 304 quando If-None-Match
+    (ou If-Modified-Since, sem If-None-Match) indica que o cliente já tem a versão atual.
+    `relacoes_versao`: caminhos das relações serializadas junto (ex.: "subcategoria__categoria").
+    """
+    relacoes_versao = ()
+
+    def versao_condicional(self, queryset):
+        """(assinatura, último atualizado_em ou None) da resposta; sem Last-Modified quando None."""
+        return versao(queryset, self.relacoes_versao)
+
+    def _etag(self, request, assinatura):
+        casal = get_casal_ativo(request)
+        partes = [
+            request.path,
+            "&".join(sorted(f"{k}={v}" for k, v in request.query_params.lists())),
+            request.META.get("HTTP_ACCEPT", ""),
+            str(request.user.pk),
+            str(casal.pk if casal else ""),
+            assinatura,
+        ]
+        return 'W/"%s"' % hashlib.md5("\n".join(partes).encode(), usedforsecurity=False).hexdigest()
+
+    def responder_condicional(self, request, queryset, gerar):
+        """Chama `gerar()` só se o cliente não tiver a versão atual de `queryset`."""
+        assinatura, ultima = self.versao_condicional(queryset)
+        etag = self._etag(request, assinatura)
+        ultima_ts = int(ultima.timestamp()) if ultima else None
+        condicional = get_conditional_response(request, etag=etag, last_modified=ultima_ts)
+        response = Response(status=condicional.status_code) if condicional is not None else gerar()
+        if response.status_code < 400:
+            response["ETag"] = etag
+            if ultima_ts is not None:
+                response["Last-Modified"] = http_date(ultima_ts)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.responder_condicional(
+            request, queryset, lambda: super(GetCondicionalMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        queryset = self.filter_queryset(self.get_queryset()).filter(pk=instance.pk)
+        return self.responder_condicional(
+            request, queryset, lambda: Response(self.get_serializer(instance).data)
+        )
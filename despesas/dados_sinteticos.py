@@ -0,0 +1,206 @@
+# despesas/dados_sinteticos.py
+"""
+Gerador de dados sintéticos para benchmarks (não usar em produção).
+Tudo é gravado com bulk_create, sem disparar signals.
+"""
+import random
+from datetime import date
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth import get_user_model
+
+from .models import (
+    Casal, MembroCasal, Categoria, Subcategoria, Lancamento, EscopoDespesa, StatusLancamento,
+    DespesaModelo, RegraRateioPadrao, RegraRateio, CartaoCredito, CompraCartao, RateioLancamento,
+    BandeiraCartao,
+)
+from .services import criar_categorias_padrao_para_casais, dividir_em_partes, rateios_do_lancamento
+
+User = get_user_model()
+
+
+def criar_casais(quantidade: int, membros_por_casal: int = 2, prefixo: str = "bench") -> list[Casal]:
+    """Cria grupos com membros e as categorias/subcategorias padrão."""
+    casais = Casal.objects.bulk_create([Casal(nome=f"{prefixo}-{i}") for i in range(quantidade)])
+    usuarios = User.objects.bulk_create([
+        User(username=f"{prefixo}-{c.pk}-{m}", first_name=f"Membro {m}")
+        for c in casais
+        for m in range(membros_por_casal)
+    ])
+    MembroCasal.objects.bulk_create([
+        MembroCasal(casal=casais[i // membros_por_casal], usuario=u, apelido=u.first_name,
+                    salario_mensal=Decimal(random.randint(2000, 9000)))
+        for i, u in enumerate(usuarios)
+    ])
+    criar_categorias_padrao_para_casais(casais)
+    return casais
+
+
+def _membros_por_casal(casal_ids) -> dict[int, list[int]]:
+    membros = {}
+    for casal_id, usuario_id in (
+        MembroCasal.objects.filter(casal_id__in=casal_ids).order_by("id").values_list("casal_id", "usuario_id")
+    ):
+        membros.setdefault(casal_id, []).append(usuario_id)
+    return membros
+
+
+def _subcategorias_por_casal(casal_ids) -> dict[int, list[int]]:
+    subcategorias = {}
+    for casal_id, sub_id in Subcategoria.objects.filter(categoria__casal_id__in=casal_ids).values_list("categoria__casal_id", "id"):
+        subcategorias.setdefault(casal_id, []).append(sub_id)
+    return subcategorias
+
+
+def criar_lancamentos(casais, por_casal: int, meses: int = 36, inicio: date | None = None) -> int:
+    """Cria `por_casal` lançamentos avulsos por grupo, espalhados por `meses` competências."""
+    inicio = inicio or date.today().replace(day=1) - relativedelta(months=meses - 1)
+    casal_ids = [c.pk for c in casais]
+    membros = _membros_por_casal(casal_ids)
+    subcategorias = _subcategorias_por_casal(casal_ids)
+    status = [StatusLancamento.PAGO] * 6 + [StatusLancamento.PENDENTE] * 3 + [StatusLancamento.CANCELADO]
+
+    total = 0
+    for casal_id in casal_ids:
+        lote = []
+        for _ in range(por_casal):
+            competencia = inicio + relativedelta(months=random.randrange(meses))
+            pagador = random.choice(membros[casal_id])
+            pessoal = random.random() < 0.2
+            lote.append(Lancamento(
+                casal_id=casal_id,
+                subcategoria_id=random.choice(subcategorias[casal_id]),
+                escopo=EscopoDespesa.PESSOAL if pessoal else EscopoDespesa.COMPARTILHADA,
+                dono_pessoal_id=pagador if pessoal else None,
+                descricao="Lançamento sintético",
+                competencia=competencia,
+                data_vencimento=competencia.replace(day=random.randint(1, 28)),
+                valor_total=Decimal(random.randint(500, 50000)) / 100,
+                status=random.choice(status),
+                pagador_id=pagador,
+                criado_por_id=pagador,
+            ))
+        Lancamento.objects.bulk_create(lote, batch_size=1000)
+        total += len(lote)
+    return total
+
+
+def criar_despesas_modelo(casais, por_casal: int) -> int:
+    """
+    Cria despesas recorrentes com regras de rateio variadas: metade IGUAL, um quarto PERCENTUAL
+    (percentuais somando 100) e um quarto VALOR_FIXO (valores somando o previsto).
+    """
+    casal_ids = [c.pk for c in casais]
+    membros = _membros_por_casal(casal_ids)
+    categorias = {}
+    for casal_id, cat_id in Categoria.objects.filter(casal_id__in=casal_ids).values_list("casal_id", "id"):
+        categorias.setdefault(casal_id, []).append(cat_id)
+    regras = [RegraRateio.IGUAL, RegraRateio.IGUAL, RegraRateio.PERCENTUAL, RegraRateio.VALOR_FIXO]
+
+    despesas = DespesaModelo.objects.bulk_create([
+        DespesaModelo(
+            casal_id=casal_id,
+            nome=f"Despesa {i + 1}",
+            categoria_id=random.choice(categorias[casal_id]),
+            valor_previsto=Decimal(random.randint(5000, 300000)) / 100,
+            dia_vencimento=random.randint(1, 28),
+            regra_rateio=random.choice(regras),
+        )
+        for casal_id in casal_ids
+        for i in range(por_casal)
+    ], batch_size=1000)
+
+    linhas = []
+    for despesa in despesas:
+        ids = membros[despesa.casal_id]
+        if despesa.regra_rateio == RegraRateio.PERCENTUAL:
+            partes = dividir_em_partes(Decimal("100.00"), len(ids))
+            linhas += [RegraRateioPadrao(despesa_modelo=despesa, membro_id=m, percentual=p) for m, p in zip(ids, partes)]
+        elif despesa.regra_rateio == RegraRateio.VALOR_FIXO:
+            partes = dividir_em_partes(despesa.valor_previsto, len(ids))
+            linhas += [RegraRateioPadrao(despesa_modelo=despesa, membro_id=m, valor_fixo=v) for m, v in zip(ids, partes)]
+    RegraRateioPadrao.objects.bulk_create(linhas, batch_size=1000)
+    return len(despesas)
+
+
+def criar_compras_cartao(casais, por_casal: int, meses: int = 36, inicio: date | None = None) -> int:
+    """
+    Cria um cartão por grupo e `por_casal` compras parceladas (1x a 24x) espalhadas por `meses`,
+    já com as parcelas (Lançamentos); as parcelas vencidas ficam como pagas.
+    """
+    inicio = inicio or date.today().replace(day=1) - relativedelta(months=meses - 1)
+    hoje = date.today()
+    casal_ids = [c.pk for c in casais]
+    membros = _membros_por_casal(casal_ids)
+    subcategorias = _subcategorias_por_casal(casal_ids)
+    cartoes = CartaoCredito.objects.bulk_create([
+        CartaoCredito(casal_id=casal_id, nome="Cartão principal", bandeira=BandeiraCartao.OUTRO,
+                      limite=Decimal("10000.00"), dia_fechamento=1, dia_vencimento=10)
+        for casal_id in casal_ids
+    ])
+    cartao_do_casal = {c.casal_id: c.pk for c in cartoes}
+
+    total = 0
+    for casal_id in casal_ids:
+        compras = []
+        for _ in range(por_casal):
+            competencia = inicio + relativedelta(months=random.randrange(meses))
+            pagador = random.choice(membros[casal_id])
+            pessoal = random.random() < 0.2
+            compras.append(CompraCartao(
+                casal_id=casal_id,
+                cartao_id=cartao_do_casal[casal_id],
+                descricao="Compra sintética",
+                subcategoria_id=random.choice(subcategorias[casal_id]),
+                escopo=EscopoDespesa.PESSOAL if pessoal else EscopoDespesa.COMPARTILHADA,
+                dono_pessoal_id=pagador if pessoal else None,
+                valor_total=Decimal(random.randint(2000, 500000)) / 100,
+                parcelas_total=random.choice([1, 1, 2, 3, 6, 10, 12, 24]),
+                primeira_competencia=competencia,
+                primeiro_vencimento=competencia.replace(day=10),
+                pagador_id=pagador,
+            ))
+        CompraCartao.objects.bulk_create(compras, batch_size=1000)
+
+        parcelas = []
+        for compra in compras:
+            valores = dividir_em_partes(compra.valor_total, compra.parcelas_total)
+            for i, valor in enumerate(valores):
+                vencimento = compra.primeiro_vencimento + relativedelta(months=i)
+                pago = vencimento < hoje
+                parcelas.append(Lancamento(
+                    casal_id=casal_id,
+                    subcategoria_id=compra.subcategoria_id,
+                    escopo=compra.escopo,
+                    dono_pessoal_id=compra.dono_pessoal_id,
+                    descricao=f"{compra.descricao} ({i + 1}/{compra.parcelas_total})",
+                    competencia=compra.primeira_competencia + relativedelta(months=i),
+                    data_vencimento=vencimento,
+                    valor_total=valor,
+                    status=StatusLancamento.PAGO if pago else StatusLancamento.PENDENTE,
+                    data_pagamento=vencimento if pago else None,
+                    pagador_id=compra.pagador_id,
+                    compra_cartao=compra,
+                    parcela_numero=i + 1,
+                    parcelas_total=compra.parcelas_total,
+                    criado_por_id=compra.pagador_id,
+                ))
+        Lancamento.objects.bulk_create(parcelas, batch_size=1000)
+        total += len(compras)
+    return total
+
+
+def criar_rateios(casais) -> int:
+    """Cria os rateios (igualitários ou do dono) dos lançamentos ainda sem rateio, como o app faria."""
+    casal_ids = [c.pk for c in casais]
+    membros = _membros_por_casal(casal_ids)
+    total = 0
+    for casal_id in casal_ids:
+        lancamentos = Lancamento.objects.filter(casal_id=casal_id, rateios__isnull=True).only(
+            "id", "escopo", "dono_pessoal_id", "valor_total"
+        )
+        rateios = [r for lanc in lancamentos for r in rateios_do_lancamento(lanc, membros[casal_id])]
+        RateioLancamento.objects.bulk_create(rateios, batch_size=1000)
+        total += len(rateios)
+    return total
@@ -0,0 +1,69 @@
+# despesas/exportacao.py
+"""
+Exportação de lançamentos em CSV por streaming.
+
+As linhas são lidas com .iterator(chunk_size=...) (rateios pré-carregados por bloco) e escritas
+uma a uma na resposta, então a memória usada não depende do tamanho do histórico.
+"""
+import csv
+
+from django.db.models import Prefetch
+
+from .models import MembroCasal, RateioLancamento
+
+CHUNK_EXPORTACAO = 2000
+
+COLUNAS = [
+    "id", "competencia", "data_vencimento", "descricao", "categoria", "subcategoria", "escopo", "status",
+    "valor_total", "pagador", "dono_pessoal", "data_pagamento", "parcela",
+]
+
+
+class _Eco:
+    """Pseudo-buffer para o csv.writer: devolve a linha em vez de guardá-la."""
+    def write(self, valor):
+        return valor
+
+
+def _nome(usuario, apelidos):
+    if usuario is None:
+        return ""
+    return apelidos.get(usuario.pk) or usuario.first_name or usuario.username
+
+
+def membros_para_exportacao(casal) -> list[tuple[int, str]]:
+    """(usuario_id, nome) de todos os membros do grupo, inclusive inativos, que podem ter rateios antigos."""
+    membros = MembroCasal.objects.filter(casal=casal).select_related("usuario").order_by("id")
+    return [(m.usuario_id, m.apelido or m.usuario.first_name or m.usuario.username) for m in membros]
+
+
+def linhas_lancamentos_csv(queryset, membros):
+    """Gera as linhas do CSV (cabeçalho primeiro): colunas fixas + uma coluna de rateio por membro."""
+    apelidos = dict(membros)
+    escritor = csv.writer(_Eco())
+    yield "\ufeff" + escritor.writerow(COLUNAS + [f"rateio {nome}" for _, nome in membros])
+
+    queryset = queryset.prefetch_related(
+        Prefetch("rateios", queryset=RateioLancamento.objects.only("lancamento_id", "membro_id", "valor"))
+    )
+    for lanc in queryset.iterator(chunk_size=CHUNK_EXPORTACAO):
+        por_membro = {}
+        for rateio in lanc.rateios.all():
+            por_membro[rateio.membro_id] = por_membro.get(rateio.membro_id, 0) + rateio.valor
+        subcategoria = lanc.subcategoria
+        yield escritor.writerow([
+            lanc.id,
+            f"{lanc.competencia:%Y-%m}",
+            lanc.data_vencimento.isoformat(),
+            lanc.descricao,
+            subcategoria.categoria.nome,
+            subcategoria.nome,
+            lanc.get_escopo_display(),
+            lanc.get_status_display(),
+            lanc.valor_total,
+            _nome(lanc.pagador, apelidos),
+            _nome(lanc.dono_pessoal, apelidos),
+            lanc.data_pagamento.isoformat() if lanc.data_pagamento else "",
+            f"{lanc.parcela_numero}/{lanc.parcelas_total}" if lanc.parcela_numero else "",
+            *[por_membro.get(usuario_id, "") for usuario_id, _ in membros],
+        ])
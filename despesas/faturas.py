@@ -0,0 +1,182 @@
+# despesas/faturas.py
+"""
+Faturas dos cartões de crédito.
+
+Cada parcela de compra no cartão pertence a uma FaturaCartao (Lancamento.fatura), identificada pelo
+mês de vencimento. A fatura da compra vem do dia de fechamento do cartão: compras feitas antes do
+fechamento entram na fatura que fecha naquele mês; a partir do dia do fechamento, na seguinte. A
+parcela i vai para a fatura i meses depois. Dias além do fim do mês (ex.: 31) caem no último dia.
+
+Os totais de cada fatura e o limite utilizado do cartão são recalculados junto com o ResumoMensal do
+mês (despesas.resumos.recalcular_resumo): uma consulta agrupada pelas faturas do mês do grupo, e o
+limite do cartão recebe só a diferença. GET /api/cartoes/{id}/faturas/ lê direto dessas linhas.
+
+Uma parcela cuja competência muda passa para a fatura do novo mês (signal de Lancamento), e mudar o dia
+de fechamento/vencimento do cartão regrava as datas das faturas que ainda não venceram
+(atualizar_datas_das_faturas).
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from . import cache_referencia
+from .models import CartaoCredito, FaturaCartao, Lancamento, StatusLancamento
+from .utils import dia_no_mes
+
+ZERO = Decimal("0.00")
+
+
+def datas_da_fatura(cartao: CartaoCredito, competencia: date) -> tuple[date, date]:
+    """(fechamento, vencimento) da fatura que vence no mês `competencia`."""
+    competencia = competencia.replace(day=1)
+    vencimento = dia_no_mes(competencia, cartao.dia_vencimento)
+    # vencimento depois do fechamento no mesmo mês; senão a fatura fechou no mês anterior
+    mes_fechamento = competencia if cartao.dia_fechamento < cartao.dia_vencimento else competencia - relativedelta(months=1)
+    return dia_no_mes(mes_fechamento, cartao.dia_fechamento), vencimento
+
+
+def competencia_da_compra(cartao: CartaoCredito, data_compra: date) -> date:
+    """Mês de vencimento da fatura em que entra uma compra feita em `data_compra`."""
+    mes = data_compra.replace(day=1)
+    if data_compra >= dia_no_mes(mes, cartao.dia_fechamento):
+        mes += relativedelta(months=1)
+    return mes if cartao.dia_fechamento < cartao.dia_vencimento else mes + relativedelta(months=1)
+
+
+def faturas_do_cartao(cartao: CartaoCredito, competencias) -> dict[date, FaturaCartao]:
+    """Garante as faturas do cartão nos meses informados e devolve {competência: fatura} (duas consultas)."""
+    competencias = {c.replace(day=1) for c in competencias}
+    novas = []
+    for competencia in competencias:
+        fechamento, vencimento = datas_da_fatura(cartao, competencia)
+        novas.append(FaturaCartao(
+            casal_id=cartao.casal_id, cartao=cartao, competencia=competencia,
+            data_fechamento=fechamento, data_vencimento=vencimento,
+        ))
+    FaturaCartao.objects.bulk_create(novas, ignore_conflicts=True)
+    return {f.competencia: f for f in FaturaCartao.objects.filter(cartao=cartao, competencia__in=competencias)}
+
+
+def atualizar_datas_das_faturas(cartao: CartaoCredito, desde: date | None = None) -> int:
+    """
+    Regrava fechamento e vencimento das faturas do cartão a partir do mês `desde` (padrão: o atual)
+    pelos dias atuais do cartão; as já vencidas guardam as datas que tiveram. Retorna quantas mudaram.
+    """
+    desde = (desde or timezone.localdate()).replace(day=1)
+    alteradas = []
+    agora = timezone.now()
+    for fatura in FaturaCartao.objects.filter(cartao=cartao, competencia__gte=desde):
+        datas = datas_da_fatura(cartao, fatura.competencia)
+        if datas != (fatura.data_fechamento, fatura.data_vencimento):
+            fatura.data_fechamento, fatura.data_vencimento = datas
+            fatura.atualizado_em = agora
+            alteradas.append(fatura)
+    FaturaCartao.objects.bulk_update(alteradas, ["data_fechamento", "data_vencimento", "atualizado_em"])
+    return len(alteradas)
+
+
+def calcular_faturas(faturas) -> dict[int, tuple]:
+    """{fatura_id: (valor_total, valor_pago, quantidade)} das parcelas não canceladas, numa consulta agrupada."""
+    totais = {fatura.id: (ZERO, ZERO, 0) for fatura in faturas}
+    linhas = (
+        Lancamento.objects.filter(fatura__in=faturas)
+        .exclude(status=StatusLancamento.CANCELADO)
+        .values("fatura_id")
+        .annotate(
+            total=Sum("valor_total"),
+            pago=Sum("valor_total", filter=Q(status=StatusLancamento.PAGO)),
+            qtd=Count("id"),
+        )
+        .order_by()
+    )
+    for linha in linhas:
+        totais[linha["fatura_id"]] = (linha["total"] or ZERO, linha["pago"] or ZERO, linha["qtd"])
+    return totais
+
+
+def faturas_divergentes(casal_id: int, competencia: date) -> list[FaturaCartao]:
+    """Faturas do mês cujos totais gravados não batem com as parcelas (para rebuild_resumos --verificar)."""
+    faturas = list(FaturaCartao.objects.filter(casal_id=casal_id, competencia=competencia.replace(day=1)))
+    totais = calcular_faturas(faturas)
+    return [f for f in faturas if totais[f.id] != (f.valor_total, f.valor_pago, f.quantidade)]
+
+
+def recalcular_faturas(casal_id: int, competencia: date) -> int:
+    """
+    Atualiza os totais das faturas do grupo que vencem no mês e repassa ao limite utilizado de cada
+    cartão a diferença de saldo em aberto. Chamar dentro da transação do recálculo. Retorna quantas mudaram.
+
+    As faturas do mês ficam travadas (select_for_update) até o fim da transação: dois recálculos
+    simultâneos do mesmo mês não calculam a diferença sobre o mesmo total anterior.
+    """
+    faturas = list(
+        FaturaCartao.objects.select_for_update()
+        .filter(casal_id=casal_id, competencia=competencia.replace(day=1))
+        .order_by("pk")
+    )
+    if not faturas:
+        return 0
+    totais = calcular_faturas(faturas)
+    agora = timezone.now()
+    alteradas = []
+    variacao = defaultdict(lambda: ZERO)
+    for fatura in faturas:
+        novo = totais[fatura.id]
+        if novo == (fatura.valor_total, fatura.valor_pago, fatura.quantidade):
+            continue
+        variacao[fatura.cartao_id] += (novo[0] - novo[1]) - (fatura.valor_total - fatura.valor_pago)
+        fatura.valor_total, fatura.valor_pago, fatura.quantidade = novo
+        fatura.atualizado_em = agora
+        alteradas.append(fatura)
+    FaturaCartao.objects.bulk_update(alteradas, ["valor_total", "valor_pago", "quantidade", "atualizado_em"])
+    for cartao_id, valor in variacao.items():
+        if valor:
+            CartaoCredito.objects.filter(pk=cartao_id).update(
+                limite_utilizado=F("limite_utilizado") + valor, atualizado_em=agora
+            )
+    if any(variacao.values()):
+        # a listagem de cartões (em cache) mostra o limite disponível
+        cache_referencia.invalidar(casal_id, cache_referencia.CARTOES)
+    return len(alteradas)
+
+
+def atribuir_faturas(lancamentos) -> int:
+    """Liga às faturas as parcelas de compras no cartão que ainda não têm fatura (bases anteriores às faturas)."""
+    pendentes = (
+        lancamentos.filter(compra_cartao__isnull=False, fatura__isnull=True)
+        .values_list("compra_cartao__cartao_id", "competencia")
+        .distinct()
+    )
+    por_cartao = defaultdict(set)
+    for cartao_id, competencia in pendentes:
+        por_cartao[cartao_id].add(competencia.replace(day=1))
+    atribuidas = 0
+    for cartao in CartaoCredito.objects.filter(pk__in=por_cartao):
+        for competencia, fatura in faturas_do_cartao(cartao, por_cartao[cartao.pk]).items():
+            atribuidas += lancamentos.filter(
+                compra_cartao__cartao=cartao, fatura__isnull=True,
+                competencia__gte=competencia, competencia__lt=competencia + relativedelta(months=1),
+            ).update(fatura=fatura)
+    return atribuidas
+
+
+def reconstruir_limites(casal_ids=None) -> None:
+    """Regrava CartaoCredito.limite_utilizado a partir das faturas."""
+    cartoes = CartaoCredito.objects.all()
+    if casal_ids is not None:
+        cartoes = cartoes.filter(casal_id__in=casal_ids)
+    abertos = dict(
+        FaturaCartao.objects.filter(cartao__in=cartoes)
+        .values("cartao_id")
+        .annotate(aberto=Sum(F("valor_total") - F("valor_pago")))
+        .values_list("cartao_id", "aberto")
+    )
+    for cartao in cartoes.only("id", "casal_id", "limite_utilizado"):
+        aberto = abertos.get(cartao.id) or ZERO
+        if cartao.limite_utilizado != aberto:
+            CartaoCredito.objects.filter(pk=cartao.pk).update(limite_utilizado=aberto, atualizado_em=timezone.now())
+            cache_referencia.invalidar(cartao.casal_id, cache_referencia.CARTOES)
@@ -0,0 +1,67 @@
+# despesas/filters.py
+import django_filters
+from django import forms
+
+from .models import FaturaCartao, Lancamento, ResumoMensal
+from .utils import intervalo_competencia
+
+
+class CompetenciaField(forms.CharField):
+    """Aceita "YYYY", "YYYY-MM" ou "YYYY-MM-DD" e devolve o intervalo [início, fim)."""
+    def clean(self, value):
+        value = super().clean(value)
+        if not value:
+            return None
+        try:
+            return intervalo_competencia(value)
+        except ValueError:
+            raise forms.ValidationError("Use o formato YYYY-MM (ou YYYY).")
+
+
+class CompetenciaFilter(django_filters.Filter):
+    """
+    Filtro por faixa de competência traduzido para `campo >= início AND campo < fim`,
+    que usa índice (ao contrário de competencia__startswith, que converte a data em texto).
+    limite: "intervalo" (mês/ano exato), "de" (a partir de) ou "ate" (até, inclusive).
+    """
+    field_class = CompetenciaField
+
+    def __init__(self, *args, limite="intervalo", **kwargs):
+        self.limite = limite
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        inicio, fim = value
+        if self.limite in ("intervalo", "de"):
+            qs = qs.filter(**{f"{self.field_name}__gte": inicio})
+        if self.limite in ("intervalo", "ate"):
+            qs = qs.filter(**{f"{self.field_name}__lt": fim})
+        return qs
+
+
+class CompetenciaFilterSet(django_filters.FilterSet):
+    competencia = CompetenciaFilter(field_name="competencia")
+    de = CompetenciaFilter(field_name="competencia", limite="de")
+    ate = CompetenciaFilter(field_name="competencia", limite="ate")
+
+
+class LancamentoFilter(CompetenciaFilterSet):
+    cartao = django_filters.NumberFilter(field_name="compra_cartao__cartao")
+
+    class Meta:
+        model = Lancamento
+        fields = ["status", "escopo", "subcategoria", "pagador", "compra_cartao"]
+
+
+class ResumoMensalFilter(CompetenciaFilterSet):
+    class Meta:
+        model = ResumoMensal
+        fields = []
+
+
+class FaturaCartaoFilter(CompetenciaFilterSet):
+    class Meta:
+        model = FaturaCartao
+        fields = []
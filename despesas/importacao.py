@@ -0,0 +1,342 @@
+# despesas/importacao.py
+"""
+Importação de lançamentos a partir de extratos (CSV ou OFX).
+
+O arquivo é lido como fluxo, linha a linha; as linhas válidas são agrupadas em lotes e cada lote
+é gravado numa transação própria com bulk_create de Lançamentos e Rateios. Uma linha inválida
+entra na lista de erros (com o número da linha) sem interromper o restante do arquivo.
+
+Duplicatas são detectadas pela chave (data de vencimento, valor, descrição normalizada) contra os
+lançamentos já existentes do grupo (índice lanc_casal_venc_valor_idx) e contra as linhas anteriores
+do próprio arquivo.
+
+CSV: cabeçalho obrigatório, separador "," ou ";". Colunas reconhecidas (maiúsculas/acentos tanto faz):
+data (ou data_vencimento), descricao, valor, subcategoria, categoria, competencia, pagador, escopo, dono_pessoal.
+OFX: transações (STMTTRN) com data, valor (TRNAMT) e descrição (MEMO ou NAME).
+
+Sinal: a mesma regra vale para os dois formatos. Por padrão (SINAL_NEGATIVO, como nos extratos) só os
+valores negativos são despesas; os positivos (créditos, estornos) são ignorados e contados em "ignoradas".
+Com SINAL_POSITIVO (planilha de gastos) é o contrário.
+"""
+import csv
+import io
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.text import slugify
+
+from . import tarefas
+from .models import EscopoDespesa, Lancamento, MembroCasal, RateioLancamento, StatusLancamento, Subcategoria
+from .resumos import agendar_recalculo
+from .services import mensagem_erro, rateios_do_lancamento
+from .utils import intervalo_competencia
+
+LOTE_IMPORTACAO = 500
+MAX_ERROS_DETALHADOS = 200
+
+FORMATOS = ("csv", "ofx")
+
+SINAL_NEGATIVO = "negativo"
+SINAL_POSITIVO = "positivo"
+SINAIS = (SINAL_NEGATIVO, SINAL_POSITIVO)
+
+_ALIASES_CSV = {
+    "data_vencimento": "data", "vencimento": "data", "data_lancamento": "data",
+    "historico": "descricao", "memo": "descricao", "descricao_lancamento": "descricao",
+    "valor_total": "valor", "quantia": "valor",
+    "dono": "dono_pessoal",
+}
+
+
+class LinhaInvalida(Exception):
+    pass
+
+
+class LinhaIgnorada(Exception):
+    """Linha válida que não é despesa (valor com o sinal dos créditos)."""
+
+
+# --- Leitura -------------------------------------------------------------
+
+def _texto(arquivo):
+    if isinstance(arquivo, io.TextIOBase):
+        return arquivo
+    return io.TextIOWrapper(arquivo, encoding="utf-8-sig", errors="replace", newline="")
+
+
+def _coluna(nome: str) -> str:
+    chave = slugify(nome).replace("-", "_")
+    return _ALIASES_CSV.get(chave, chave)
+
+
+def ler_csv(arquivo):
+    """Gera (nº da linha, {coluna: valor}) sem carregar o arquivo inteiro."""
+    texto = _texto(arquivo)
+    amostra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.reader(texto, dialeto)
+    cabecalho = [_coluna(c) for c in next(leitor, [])]
+    for numero, valores in enumerate(leitor, start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        yield numero, dict(zip(cabecalho, (v.strip() for v in valores)))
+
+
+_TAG_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<\r\n]*)")
+
+
+def ler_ofx(arquivo):
+    """Gera as transações de um OFX (SGML ou XML) como {data, valor, descricao}."""
+    atual = None
+    for numero, linha in enumerate(_texto(arquivo), start=1):
+        for fechando, tag, valor in _TAG_OFX.findall(linha):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if fechando and atual is not None:
+                    yield atual.pop("_linha"), atual
+                    atual = None
+                elif not fechando:
+                    atual = {"_linha": numero}
+            elif atual is not None and not fechando:
+                valor = valor.strip()
+                if tag == "DTPOSTED":
+                    atual["data"] = valor[:8]
+                elif tag == "TRNAMT":
+                    atual["valor"] = valor
+                elif tag in ("MEMO", "NAME") and valor:
+                    # MEMO costuma ser mais descritivo; NAME fica de reserva
+                    if tag == "MEMO" or not atual.get("descricao"):
+                        atual["descricao"] = valor
+
+
+LEITORES = {"csv": ler_csv, "ofx": ler_ofx}
+
+
+# --- Conversão -----------------------------------------------------------
+
+def _data(valor: str) -> date:
+    for formato in ("%Y-%m-%d", "%d/%m/%Y", "%Y%m%d", "%d/%m/%y"):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    raise LinhaInvalida(f"Data inválida: '{valor}'.")
+
+
+def _valor(bruto: str, sinal: str = SINAL_NEGATIVO) -> Decimal:
+    """Valor da despesa, positivo; LinhaIgnorada se o sinal no arquivo não for o das despesas."""
+    texto = bruto.replace("R$", "").replace(" ", "")
+    if "," in texto:
+        # formato brasileiro: 1.234,56
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        valor = Decimal(texto).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        raise LinhaInvalida(f"Valor inválido: '{bruto}'.")
+    if not valor:
+        raise LinhaInvalida("Valor zerado.")
+    if (valor < 0) != (sinal == SINAL_NEGATIVO):
+        raise LinhaIgnorada()
+    return abs(valor)
+
+
+def _competencia(valor: str) -> date:
+    try:
+        inicio, _ = intervalo_competencia(valor)
+    except ValueError:
+        raise LinhaInvalida(f"Competência inválida: '{valor}' (use YYYY-MM).")
+    return inicio
+
+
+def normalizar_descricao(descricao: str) -> str:
+    return " ".join(descricao.split()).casefold()
+
+
+class Importador:
+    """
+    Estado de uma importação para um grupo: caches de subcategorias e membros (carregados uma vez),
+    chaves já vistas para deduplicação e os contadores do resultado.
+    """
+
+    def __init__(self, casal, criado_por, pagador=None, subcategoria_padrao=None,
+                 status=StatusLancamento.PAGO, sinal=SINAL_NEGATIVO, lote=LOTE_IMPORTACAO):
+        self.casal = casal
+        self.criado_por = criado_por
+        self.pagador_padrao = pagador or criado_por
+        self.subcategoria_padrao = subcategoria_padrao
+        self.status = status
+        self.sinal = sinal
+        self.lote = max(1, lote)
+        self.resultado = {
+            "lidas": 0, "importadas": 0, "duplicadas": 0, "ignoradas": 0, "total_erros": 0, "erros": [],
+        }
+        self._vistas = set()
+
+        self.subcategorias = {}
+        for sub in Subcategoria.objects.filter(categoria__casal=casal, ativa=True).select_related("categoria"):
+            self.subcategorias.setdefault(slugify(sub.nome), sub.id)
+            self.subcategorias[f"{slugify(sub.categoria.nome)}/{slugify(sub.nome)}"] = sub.id
+        self.membros = {}
+        self.membros_ativos = []
+        for m in MembroCasal.objects.filter(casal=casal).select_related("usuario").order_by("id"):
+            for chave in (str(m.usuario_id), m.usuario.username, m.apelido):
+                if chave:
+                    self.membros.setdefault(chave.casefold(), m.usuario_id)
+            if m.ativo:
+                self.membros_ativos.append(m.usuario_id)
+
+    # --- linha -> Lancamento ---
+
+    def _membro(self, valor, campo):
+        usuario_id = self.membros.get(valor.casefold())
+        if usuario_id is None:
+            raise LinhaInvalida(f"{campo} '{valor}' não é membro do grupo.")
+        return usuario_id
+
+    def _subcategoria(self, dados):
+        nome = dados.get("subcategoria", "")
+        if nome:
+            chave = slugify(nome)
+            if dados.get("categoria"):
+                chave = f"{slugify(dados['categoria'])}/{chave}"
+            sub_id = self.subcategorias.get(chave)
+            if sub_id is None:
+                raise LinhaInvalida(f"Subcategoria '{nome}' não encontrada.")
+            return sub_id
+        if self.subcategoria_padrao is None:
+            raise LinhaInvalida("Informe a subcategoria (coluna ou subcategoria padrão).")
+        return self.subcategoria_padrao.id
+
+    def converter(self, dados) -> Lancamento:
+        if not dados.get("data"):
+            raise LinhaInvalida("Data ausente.")
+        if not dados.get("valor"):
+            raise LinhaInvalida("Valor ausente.")
+        valor = _valor(dados["valor"], self.sinal)  # antes do resto: créditos não são validados
+        vencimento = _data(dados["data"])
+        competencia = _competencia(dados["competencia"]) if dados.get("competencia") else vencimento
+        pagador_id = self._membro(dados["pagador"], "Pagador") if dados.get("pagador") else self.pagador_padrao.pk
+        escopo = (dados.get("escopo") or EscopoDespesa.COMPARTILHADA).upper()[:4]
+        if escopo not in EscopoDespesa.values:
+            raise LinhaInvalida(f"Escopo inválido: '{dados['escopo']}'.")
+        dono_id = None
+        if escopo == EscopoDespesa.PESSOAL:
+            dono_id = self._membro(dados["dono_pessoal"], "Dono") if dados.get("dono_pessoal") else pagador_id
+        return Lancamento(
+            casal_id=self.casal.pk,
+            subcategoria_id=self._subcategoria(dados),
+            escopo=escopo,
+            dono_pessoal_id=dono_id,
+            descricao=dados.get("descricao", "")[:180],
+            competencia=competencia.replace(day=1),
+            data_vencimento=vencimento,
+            valor_total=valor,
+            status=self.status,
+            data_pagamento=vencimento if self.status == StatusLancamento.PAGO else None,
+            pagador_id=pagador_id,
+            criado_por_id=self.criado_por.pk,
+        )
+
+    def _erro(self, numero, mensagem):
+        self.resultado["total_erros"] += 1
+        if len(self.resultado["erros"]) < MAX_ERROS_DETALHADOS:
+            self.resultado["erros"].append({"linha": numero, "erro": mensagem})
+
+    # --- lote ---
+
+    def _chave(self, lanc):
+        return (lanc.data_vencimento, lanc.valor_total, normalizar_descricao(lanc.descricao))
+
+    def gravar_lote(self, pendentes):
+        """Descarta duplicatas (banco + arquivo) e grava o lote numa transação."""
+        datas = {lanc.data_vencimento for _, lanc in pendentes}
+        existentes = {
+            (d, v, normalizar_descricao(desc))
+            for d, v, desc in Lancamento.objects.filter(casal=self.casal, data_vencimento__in=datas)
+            .values_list("data_vencimento", "valor_total", "descricao")
+        }
+        novos, rateios = [], []
+        for numero, lanc in pendentes:
+            chave = self._chave(lanc)
+            if chave in existentes or chave in self._vistas:
+                self.resultado["duplicadas"] += 1
+                continue
+            try:
+                rateios_lanc = rateios_do_lancamento(lanc, self.membros_ativos)
+            except ValidationError as exc:
+                self._erro(numero, mensagem_erro(exc))
+                continue
+            self._vistas.add(chave)
+            novos.append(lanc)
+            rateios.extend(rateios_lanc)
+        if not novos:
+            return
+        with transaction.atomic():
+            Lancamento.objects.bulk_create(novos, batch_size=500)
+            RateioLancamento.objects.bulk_create(rateios, batch_size=500)
+            agendar_recalculo(self.casal.pk, {lanc.competencia for lanc in novos})
+        self.resultado["importadas"] += len(novos)
+
+    def importar(self, linhas, progresso=None) -> dict:
+        pendentes = []
+        for numero, dados in linhas:
+            self.resultado["lidas"] += 1
+            try:
+                pendentes.append((numero, self.converter(dados)))
+            except LinhaIgnorada:
+                self.resultado["ignoradas"] += 1
+            except LinhaInvalida as exc:
+                self._erro(numero, str(exc))
+            if len(pendentes) >= self.lote:
+                self.gravar_lote(pendentes)
+                pendentes = []
+                if progresso:
+                    progresso(self.resultado["lidas"])
+        if pendentes:
+            self.gravar_lote(pendentes)
+        if progresso:
+            progresso(self.resultado["lidas"])
+        return self.resultado
+
+
+def formato_do_arquivo(nome: str, formato: str | None = None) -> str:
+    formato = (formato or nome.rsplit(".", 1)[-1]).lower()
+    if formato not in FORMATOS:
+        raise ValidationError(f"Formato não suportado: '{formato}'. Use CSV ou OFX.")
+    return formato
+
+
+def importar_lancamentos(casal, arquivo, formato, criado_por, progresso=None, **opcoes) -> dict:
+    """Importa um arquivo CSV/OFX (objeto binário ou texto) para o grupo. Retorna o resumo com os erros."""
+    importador = Importador(casal, criado_por, **opcoes)
+    return importador.importar(LEITORES[formato](arquivo), progresso=progresso)
+
+
+@tarefas.registrar("importar_lancamentos")
+def _tarefa_importar(tarefa, formato: str, pagador_id=None, subcategoria_id=None,
+                     status=StatusLancamento.PAGO, sinal=SINAL_NEGATIVO):
+    """O arquivo enviado vem no anexo da tarefa (ver LancamentoViewSet.importar)."""
+    User = get_user_model()
+    pagador = User.objects.filter(pk=pagador_id).first() if pagador_id else None
+    subcategoria = Subcategoria.objects.filter(pk=subcategoria_id).first() if subcategoria_id else None
+    # quem enviou pode ter sido removido: o pagador ou o primeiro membro ativo assina os lançamentos
+    criado_por = tarefa.criado_por or pagador or User.objects.filter(
+        membros_casal__casal_id=tarefa.casal_id, membros_casal__ativo=True,
+    ).order_by("membros_casal__id").first()
+    if criado_por is None:
+        raise ValidationError("Grupo sem membros ativos para registrar a importação.")
+    resultado = importar_lancamentos(
+        tarefa.casal, io.BytesIO(tarefas.ler_anexo(tarefa)), formato, criado_por, pagador=pagador,
+        subcategoria_padrao=subcategoria, status=status, sinal=sinal,
+        progresso=lambda lidas: tarefas.atualizar_progresso(tarefa, lidas),
+    )
+    tarefas.atualizar_progresso(tarefa, resultado["lidas"], total=resultado["lidas"])
+    return resultado
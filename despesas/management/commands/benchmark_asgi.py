@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from despesas.benchmark import ROTAS_CARGA, carga_wsgi_asgi
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a vazão dos relatórios (relatório financeiro, resumo, tendências, dashboard) sob clientes "
+        "simultâneos pelos handlers WSGI e ASGI, com e sem consultas paralelas. Rode `seed_benchmark` antes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", type=int, default=8, help="Clientes simultâneos (padrão: 8).")
+        parser.add_argument("--requisicoes", type=int, default=25, help="Requisições por cliente (padrão: 25).")
+        parser.add_argument(
+            "--rota", action="append",
+            help=f"Rota a exercitar, com query string (pode repetir; padrão: {', '.join(ROTAS_CARGA)}).",
+        )
+        parser.add_argument("--prefixo", default="bench", help="Prefixo dos grupos sintéticos (padrão: bench).")
+        parser.add_argument("--saida", help="Salva o resultado em JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            resultados = carga_wsgi_asgi(
+                options["usuarios"], options["requisicoes"], options["rota"] or ROTAS_CARGA, options["prefixo"]
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(f"{'perfil':<16} {'reqs':>6} {'erros':>6} {'rps':>8} {'p50_ms':>8} {'p95_ms':>8} {'max_ms':>8}")
+        for perfil, r in resultados.items():
+            self.stdout.write(
+                f"{perfil:<16} {r['requisicoes']:>6} {r['erros']:>6} {r['rps']:>8.1f} "
+                f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['max_ms']:>8.2f}"
+            )
+        if options["saida"]:
+            Path(options["saida"]).write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"Resultado salvo em {options['saida']}"))
@@ -0,0 +1,111 @@
+import statistics
+import time
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from despesas.dados_sinteticos import criar_casais, criar_lancamentos
+from despesas.models import Lancamento, StatusLancamento
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara planos de execução e tempos das consultas de lançamentos antes (competencia__startswith, "
+        "sem índices compostos) e depois (faixa de datas + índices). Os dados sintéticos são descartados ao final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--casais", type=int, default=50)
+        parser.add_argument("--por-casal", type=int, default=2000, help="Lançamentos por grupo (padrão: 2000).")
+        parser.add_argument("--repeticoes", type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._executar(options)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _executar(self, options):
+        self.stdout.write("Gerando dados sintéticos...")
+        casais = criar_casais(options["casais"])
+        total = criar_lancamentos(casais, options["por_casal"])
+        self.stdout.write(f"{total} lançamentos em {len(casais)} grupos.")
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute("ANALYZE")
+            elif connection.vendor == "postgresql":
+                cursor.execute("ANALYZE despesas_lancamento")
+
+        alvo = Lancamento.objects.filter(casal=casais[len(casais) // 2]).order_by("-competencia").first()
+        casal, pagador, competencia = alvo.casal_id, alvo.pagador_id, alvo.competencia.replace(day=1)
+        fim = competencia + relativedelta(months=1)
+        base = Lancamento.objects.filter(casal_id=casal)
+        texto = f"{competencia:%Y-%m}"
+
+        depois = {
+            "relatorio do mes": lambda: base.filter(competencia__gte=competencia, competencia__lt=fim).aggregate(t=Sum("valor_total")),
+            "listagem (1a pagina)": lambda: base.order_by("-competencia", "data_vencimento", "id")[:50],
+            "pendentes por vencimento": lambda: base.filter(status=StatusLancamento.PENDENTE).order_by("data_vencimento")[:50],
+            "pagador no mes": lambda: base.filter(pagador_id=pagador, competencia__gte=competencia, competencia__lt=fim),
+        }
+        antes = {
+            "relatorio do mes": lambda: base.filter(competencia__startswith=texto).aggregate(t=Sum("valor_total")),
+            "listagem (1a pagina)": depois["listagem (1a pagina)"],
+            "pendentes por vencimento": depois["pendentes por vencimento"],
+            "pagador no mes": lambda: base.filter(pagador_id=pagador, competencia__startswith=texto),
+        }
+
+        resultados_depois = self._medir("DEPOIS", depois, options["repeticoes"])
+        # remove os índices compostos (DDL transacional: volta no rollback)
+        with connection.cursor() as cursor:
+            for index in Lancamento._meta.indexes:
+                cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+        resultados_antes = self._medir("ANTES", antes, options["repeticoes"])
+
+        self.stdout.write("\nResumo (mediana em ms):")
+        for nome in depois:
+            a, d = resultados_antes[nome], resultados_depois[nome]
+            self.stdout.write(f"  {nome:<26} antes={a:8.2f}  depois={d:8.2f}  ({a / d if d else 0:.1f}x)")
+
+    def _medir(self, titulo, consultas, repeticoes):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {titulo} =="))
+        medianas = {}
+        for nome, consulta in consultas.items():
+            plano = self._plano(consulta, titulo)
+            tempos = []
+            for _ in range(repeticoes):
+                t0 = time.perf_counter()
+                self._avaliar(consulta)
+                tempos.append((time.perf_counter() - t0) * 1000)
+            medianas[nome] = statistics.median(tempos)
+            self.stdout.write(f"- {nome}: {medianas[nome]:.2f} ms")
+            for linha in plano.splitlines():
+                self.stdout.write(f"    {linha}")
+        return medianas
+
+    def _avaliar(self, consulta):
+        resultado = consulta()
+        return list(resultado) if hasattr(resultado, "query") else resultado
+
+    def _plano(self, consulta, fase):
+        # Captura o SQL executado e pede o plano diretamente. O comentário com a fase evita que o
+        # cache de statements do sqlite3 devolva um plano preparado antes da remoção dos índices.
+        capturadas = []
+        def capturar(execute, sql, params, many, context):
+            capturadas.append((sql, params))
+            return execute(sql, params, many, context)
+        with connection.execute_wrapper(capturar):
+            self._avaliar(consulta)
+        sql, params = capturadas[-1]
+        prefixo = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefixo}{sql} /* {fase} */", params)
+            return "\n".join(" ".join(str(c) for c in row) for row in cursor.fetchall())
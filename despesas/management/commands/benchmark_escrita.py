@@ -0,0 +1,34 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from despesas.benchmark import escrita_concorrente, perfis_de_escrita
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a vazão de gravações concorrentes entre perfis de banco: SQLite padrão, SQLite com WAL/pragmas "
+        "e, se DATABASE_URL apontar para PostgreSQL, o banco configurado com e sem conexão persistente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", type=int, default=4, help="Threads gravando ao mesmo tempo (padrão: 4).")
+        parser.add_argument("--transacoes", type=int, default=200, help="Transações por thread (padrão: 200).")
+        parser.add_argument("--perfil", action="append", help="Só roda os perfis informados (pode repetir).")
+        parser.add_argument("--saida", help="Salva o resultado em JSON.")
+
+    def handle(self, *args, **options):
+        resultados = {}
+        self.stdout.write(f"{'perfil':<32} {'gravadas':>9} {'falhas':>7} {'segundos':>9} {'tps':>9}")
+        with tempfile.TemporaryDirectory() as pasta:
+            for perfil, config in perfis_de_escrita(pasta).items():
+                if options["perfil"] and perfil not in options["perfil"]:
+                    continue
+                r = escrita_concorrente(perfil, config, options["usuarios"], options["transacoes"])
+                resultados[perfil] = r
+                self.stdout.write(f"{perfil:<32} {r['gravadas']:>9} {r['falhas']:>7} {r['segundos']:>9.2f} {r['tps']:>9.1f}")
+        if options["saida"]:
+            Path(options["saida"]).write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"Resultado salvo em {options['saida']}"))
@@ -0,0 +1,95 @@
+import json
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from despesas.benchmark import executar_suite, volume
+
+
+def _commit_atual() -> str:
+    try:
+        saida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        return saida.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede consultas e latência (p50/p95) dos serviços e endpoints mais usados sobre os dados de "
+        "seed_benchmark e salva o resultado em JSON para comparar entre commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticoes", type=int, default=20)
+        parser.add_argument("--prefixo", default="bench", help="Prefixo dos grupos sintéticos (padrão: bench).")
+        parser.add_argument("--lote", type=int, default=200, help="Grupos na geração em lote (padrão: 200).")
+        parser.add_argument("--filtro", help="Só roda os casos cujo nome contém este texto.")
+        parser.add_argument("--saida", help="Arquivo JSON de saída (padrão: benchmarks/<data>-<commit>.json).")
+        parser.add_argument("--sem-salvar", action="store_true")
+        parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar.")
+
+    def handle(self, *args, **options):
+        anterior = None
+        if options["comparar"]:
+            try:
+                anterior = json.loads(Path(options["comparar"]).read_text(encoding="utf-8"))
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Não foi possível ler {options['comparar']}: {exc}")
+
+        dados = volume(options["prefixo"])
+        self.stdout.write(
+            f"Volume: {dados['casais']} grupos, {dados['lancamentos']} lançamentos, {dados['compras_cartao']} compras."
+        )
+        self.stdout.write(f"{'caso':<62} {'consultas':>9} {'p50 ms':>9} {'p95 ms':>9} {'máx ms':>9}")
+        try:
+            casos = executar_suite(
+                repeticoes=options["repeticoes"], prefixo=options["prefixo"], lote=options["lote"],
+                filtro=options["filtro"], log=self._linha,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        commit = _commit_atual()
+        resultado = {
+            "gerado_em": timezone.now().isoformat(timespec="seconds"),
+            "commit": commit,
+            "banco": connection.vendor,
+            "volume": dados,
+            "repeticoes": options["repeticoes"],
+            "casos": casos,
+        }
+        if anterior:
+            self._comparar(anterior, resultado)
+        if not options["sem_salvar"]:
+            destino = Path(options["saida"] or Path("benchmarks") / f"{timezone.now():%Y%m%d-%H%M%S}-{commit or 'local'}.json")
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            destino.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+            self.stdout.write(self.style.SUCCESS(f"Resultado salvo em {destino}"))
+
+    def _linha(self, nome, r):
+        self.stdout.write(f"{nome:<62} {r['consultas']:>9} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['max_ms']:>9.2f}")
+
+    def _comparar(self, anterior, atual):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\nComparação com {anterior.get('commit') or '?'} ({anterior.get('gerado_em', '?')}):"
+        ))
+        if anterior.get("volume") != atual["volume"]:
+            self.stdout.write(self.style.WARNING("Atenção: volumes de dados diferentes entre as execuções."))
+        for nome, r in atual["casos"].items():
+            antes = anterior.get("casos", {}).get(nome)
+            if not antes:
+                self.stdout.write(f"  {nome:<60} (novo)")
+                continue
+            variacao = (r["p50_ms"] / antes["p50_ms"] - 1) * 100 if antes["p50_ms"] else 0
+            estilo = self.style.ERROR if variacao > 10 else self.style.SUCCESS if variacao < -10 else str
+            self.stdout.write(estilo(
+                f"  {nome:<60} p50 {antes['p50_ms']:.2f} -> {r['p50_ms']:.2f} ms ({variacao:+.0f}%), "
+                f"consultas {antes['consultas']} -> {r['consultas']}"
+            ))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from despesas import importacao, services  # noqa: F401  (registra os handlers das tarefas)
+from despesas.models import TarefaProcessamento, StatusTarefa
+from despesas.tarefas import executar
+
+
+class Command(BaseCommand):
+    help = "Processa as tarefas pendentes em segundo plano (use com DESPESAS_TAREFAS_MODO = 'fila')."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--continuo", action="store_true", help="Fica aguardando novas tarefas.")
+        parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre consultas no modo contínuo.")
+        parser.add_argument("--lote", type=int, default=20, help="Máximo de tarefas por consulta (padrão: 20).")
+
+    def handle(self, *args, **options):
+        while True:
+            ids = list(
+                TarefaProcessamento.objects.filter(status=StatusTarefa.PENDENTE)
+                .order_by("criado_em")
+                .values_list("id", flat=True)[: options["lote"]]
+            )
+            processadas = sum(1 for tarefa_id in ids if executar(tarefa_id))
+            if processadas:
+                self.stdout.write(f"{processadas} tarefa(s) processada(s).")
+            if not options["continuo"]:
+                break
+            if not ids:
+                time.sleep(options["intervalo"])
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from despesas.models import DespesaModelo
+from despesas.services import filtro_despesas_a_gerar, gerar_lancamentos_competencia_lote
+
+
+def _parse_competencia(valor: str) -> date:
+    try:
+        return datetime.strptime(valor, "%Y-%m").date()
+    except ValueError:
+        raise CommandError("Competência inválida; use o formato YYYY-MM.")
+
+
+def _processar_lote(casal_ids, competencia):
+    try:
+        return gerar_lancamentos_competencia_lote(casal_ids, competencia)
+    finally:
+        # cada thread abre a própria conexão; fecha ao terminar o lote
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera os lançamentos de uma competência a partir das despesas modelo vencidas até o mês (incluindo meses "
+        "atrasados da agenda), em todos os grupos. Uma competência passada refaz os lançamentos que faltam nela."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--competencia", help="Competência no formato YYYY-MM (padrão: mês atual).")
+        parser.add_argument("--casal", type=int, nargs="*", help="Limita a geração a estes IDs de grupo.")
+        parser.add_argument("--chunk", type=int, default=200, help="Quantidade de grupos por lote (padrão: 200).")
+        parser.add_argument("--workers", type=int, default=1, help="Lotes processados em paralelo (padrão: 1).")
+
+    def handle(self, *args, **options):
+        if options["competencia"]:
+            competencia = _parse_competencia(options["competencia"])
+        else:
+            competencia = timezone.localdate().replace(day=1)
+        chunk = max(1, options["chunk"])
+
+        # só os grupos com despesa a gerar (vencidas: despesa_modelo_agenda_idx)
+        qs = DespesaModelo.objects.filter(filtro_despesas_a_gerar(competencia))
+        if options["casal"]:
+            qs = qs.filter(casal_id__in=options["casal"])
+        casal_ids = list(qs.order_by("casal_id").values_list("casal_id", flat=True).distinct())
+        lotes = [casal_ids[i:i + chunk] for i in range(0, len(casal_ids), chunk)]
+
+        self.stdout.write(
+            f"Gerando competência {competencia:%Y-%m} para {len(casal_ids)} grupo(s) em {len(lotes)} lote(s)..."
+        )
+        total_criados = 0
+        total_erros = 0
+
+        if options["workers"] > 1:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                resultados = pool.map(lambda ids: _processar_lote(ids, competencia), lotes)
+                for criados, erros in resultados:
+                    total_criados += sum(len(v) for v in criados.values())
+                    total_erros += self._reportar_erros(erros)
+        else:
+            for ids in lotes:
+                criados, erros = gerar_lancamentos_competencia_lote(ids, competencia)
+                total_criados += sum(len(v) for v in criados.values())
+                total_erros += self._reportar_erros(erros)
+
+        msg = f"{total_criados} lançamento(s) criado(s)."
+        if total_erros:
+            self.stdout.write(self.style.WARNING(f"{msg} {total_erros} grupo(s) com erro."))
+        else:
+            self.stdout.write(self.style.SUCCESS(msg))
+
+    def _reportar_erros(self, erros) -> int:
+        for casal_id, mensagem in erros.items():
+            self.stdout.write(self.style.ERROR(f"Grupo {casal_id}: {mensagem}"))
+        return len(erros)
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from despesas.importacao import LOTE_IMPORTACAO, formato_do_arquivo, importar_lancamentos
+from despesas.models import Casal, MembroCasal, StatusLancamento, Subcategoria
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Importa lançamentos de um extrato CSV ou OFX para um grupo, em lotes, ignorando duplicatas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Caminho do arquivo .csv ou .ofx.")
+        parser.add_argument("--casal", type=int, required=True, help="ID do grupo.")
+        parser.add_argument("--usuario", required=True, help="Username do membro que registra (e paga, por padrão).")
+        parser.add_argument("--pagador", help="Username do pagador padrão (padrão: --usuario).")
+        parser.add_argument("--subcategoria", type=int, help="ID da subcategoria para linhas sem subcategoria.")
+        parser.add_argument("--formato", choices=["csv", "ofx"], help="Padrão: pela extensão do arquivo.")
+        parser.add_argument("--status", default=StatusLancamento.PAGO, choices=StatusLancamento.values)
+        parser.add_argument("--lote", type=int, default=LOTE_IMPORTACAO, help=f"Linhas por transação (padrão: {LOTE_IMPORTACAO}).")
+
+    def handle(self, *args, **options):
+        caminho = Path(options["arquivo"])
+        if not caminho.is_file():
+            raise CommandError(f"Arquivo não encontrado: {caminho}")
+        casal = Casal.objects.filter(pk=options["casal"]).first()
+        if casal is None:
+            raise CommandError(f"Grupo com ID {options['casal']} não encontrado.")
+        usuario = self._membro(casal, options["usuario"])
+        pagador = self._membro(casal, options["pagador"]) if options["pagador"] else usuario
+        subcategoria = None
+        if options["subcategoria"]:
+            subcategoria = Subcategoria.objects.filter(pk=options["subcategoria"], categoria__casal=casal).first()
+            if subcategoria is None:
+                raise CommandError("Subcategoria não encontrada no grupo.")
+        try:
+            formato = formato_do_arquivo(caminho.name, options["formato"])
+        except ValidationError as exc:
+            raise CommandError("; ".join(exc.messages))
+
+        with caminho.open("rb") as arquivo:
+            resultado = importar_lancamentos(
+                casal, arquivo, formato, usuario, pagador=pagador, subcategoria_padrao=subcategoria,
+                status=options["status"], lote=options["lote"],
+                progresso=lambda lidas: self.stdout.write(f"  {lidas} linha(s) lidas..."),
+            )
+
+        for erro in resultado["erros"]:
+            self.stdout.write(self.style.ERROR(f"Linha {erro['linha']}: {erro['erro']}"))
+        if resultado["total_erros"] > len(resultado["erros"]):
+            self.stdout.write(self.style.ERROR(f"... e mais {resultado['total_erros'] - len(resultado['erros'])} erro(s)."))
+        msg = (
+            f"{resultado['importadas']} importado(s), {resultado['duplicadas']} duplicado(s) ignorado(s), "
+            f"{resultado['total_erros']} erro(s) em {resultado['lidas']} linha(s)."
+        )
+        self.stdout.write(self.style.WARNING(msg) if resultado["total_erros"] else self.style.SUCCESS(msg))
+
+    def _membro(self, casal, username):
+        membro = MembroCasal.objects.filter(casal=casal, usuario__username=username).select_related("usuario").first()
+        if membro is None:
+            raise CommandError(f"'{username}' não é membro do grupo.")
+        return membro.usuario
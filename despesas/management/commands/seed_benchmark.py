@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from despesas.dados_sinteticos import (
+    criar_casais, criar_compras_cartao, criar_despesas_modelo, criar_lancamentos, criar_rateios,
+)
+from despesas.models import Casal, MembroCasal
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula o banco com volume realista para benchmarks: grupos, membros, categorias padrão, "
+        "despesas modelo com rateio percentual/fixo, compras parceladas e lançamentos de vários anos. "
+        "Os dados ficam gravados (use --limpar para removê-los)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--casais", type=int, default=2000)
+        parser.add_argument("--membros", type=int, default=2, help="Membros por grupo (padrão: 2).")
+        parser.add_argument("--lancamentos", type=int, default=200, help="Lançamentos avulsos por grupo (padrão: 200).")
+        parser.add_argument("--despesas", type=int, default=8, help="Despesas modelo por grupo (padrão: 8).")
+        parser.add_argument("--compras", type=int, default=30, help="Compras no cartão por grupo (padrão: 30).")
+        parser.add_argument("--meses", type=int, default=36, help="Meses de histórico (padrão: 36).")
+        parser.add_argument("--chunk", type=int, default=200, help="Grupos por transação (padrão: 200).")
+        parser.add_argument("--prefixo", default="bench", help="Prefixo dos nomes de grupo/usuário (padrão: bench).")
+        parser.add_argument("--sem-resumos", action="store_true", help="Não reconstrói a tabela ResumoMensal ao final.")
+        parser.add_argument("--limpar", action="store_true", help="Remove os grupos com o prefixo em vez de criar.")
+
+    def handle(self, *args, **options):
+        prefixo = options["prefixo"]
+        if options["limpar"]:
+            self._limpar(prefixo)
+            return
+
+        restantes = options["casais"]
+        lote_n = 0
+        casal_ids = []
+        while restantes > 0:
+            quantidade = min(options["chunk"], restantes)
+            with transaction.atomic():
+                casais = criar_casais(quantidade, options["membros"], prefixo=f"{prefixo}-{lote_n}")
+                lancamentos = criar_lancamentos(casais, options["lancamentos"], meses=options["meses"])
+                despesas = criar_despesas_modelo(casais, options["despesas"])
+                compras = criar_compras_cartao(casais, options["compras"], meses=options["meses"])
+                rateios = criar_rateios(casais)
+            casal_ids += [c.pk for c in casais]
+            restantes -= quantidade
+            lote_n += 1
+            self.stdout.write(
+                f"  {len(casal_ids)}/{options['casais']} grupos: +{lancamentos} lançamentos, "
+                f"+{despesas} despesas modelo, +{compras} compras, +{rateios} rateios"
+            )
+
+        if not options["sem_resumos"] and casal_ids:
+            call_command("rebuild_resumos", casal=casal_ids, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"{len(casal_ids)} grupo(s) '{prefixo}-*' criados."))
+
+    def _limpar(self, prefixo):
+        casais = Casal.objects.filter(nome__startswith=f"{prefixo}-")
+        usuarios = list(MembroCasal.objects.filter(casal__in=casais).values_list("usuario_id", flat=True))
+        with transaction.atomic():
+            # o grupo leva em cascata lançamentos, compras e categorias; depois saem os usuários sintéticos
+            total, _ = casais.delete()
+            get_user_model().objects.filter(id__in=usuarios, username__startswith=f"{prefixo}-").delete()
+        self.stdout.write(self.style.SUCCESS(f"{total} registro(s) removido(s)."))
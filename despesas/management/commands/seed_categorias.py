@@ -1,27 +1,40 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from despesas.models import Casal
-from despesas.services import criar_categorias_padrao_para_casal
+from despesas.services import criar_categorias_padrao_para_casais
 
 class Command(BaseCommand):
-    help = "Cria categorias e subcategorias padrão para um GRUPO (casal) específico."
+    help = "Cria categorias e subcategorias padrão para grupos (casais) que ainda não têm nenhuma."
 
     def add_arguments(self, parser):
-        parser.add_argument('casal_id', type=int, help='ID do grupo (casal) a popular com categorias padrão.')
+        parser.add_argument('casal_id', type=int, nargs='*', help='IDs dos grupos (casais) a popular com categorias padrão.')
+        parser.add_argument('--todos', action='store_true', help='Popula todos os grupos sem categorias.')
+        parser.add_argument('--chunk', type=int, default=500, help='Grupos por transação (padrão: 500).')
 
-    @transaction.atomic
     def handle(self, *args, **options):
-        casal_id = options['casal_id']
-        try:
-            casal = Casal.objects.get(pk=casal_id)
-        except Casal.DoesNotExist:
-            self.stdout.write(self.style.ERROR(f"Grupo com ID {casal_id} não encontrado."))
-            return
+        ids = options['casal_id']
+        if not ids and not options['todos']:
+            raise CommandError("Informe um ou mais IDs de grupo ou use --todos.")
+
+        qs = Casal.objects.order_by('id')
+        if ids:
+            qs = qs.filter(pk__in=ids)
+            faltando = set(ids) - set(qs.values_list('id', flat=True))
+            for casal_id in sorted(faltando):
+                self.stdout.write(self.style.ERROR(f"Grupo com ID {casal_id} não encontrado."))
+            com_categorias = qs.filter(categorias__isnull=False).distinct()
+            for casal in com_categorias:
+                self.stdout.write(self.style.WARNING(f"O grupo '{casal.nome}' (ID: {casal.pk}) já possui categorias."))
 
-        if casal.categorias.exists():
-            self.stdout.write(self.style.WARNING(f"O grupo '{casal.nome}' (ID: {casal_id}) já possui categorias."))
+        pendentes = list(qs.filter(categorias__isnull=True).values_list('id', flat=True))
+        if not pendentes:
+            self.stdout.write("Nenhum grupo a popular.")
             return
 
-        self.stdout.write(f"Criando categorias padrão para o grupo '{casal.nome}' (ID: {casal_id})...")
-        criar_categorias_padrao_para_casal(casal)
+        chunk = max(1, options['chunk'])
+        self.stdout.write(f"Criando categorias padrão para {len(pendentes)} grupo(s)...")
+        for i in range(0, len(pendentes), chunk):
+            with transaction.atomic():
+                criar_categorias_padrao_para_casais(pendentes[i:i + chunk])
+            self.stdout.write(f"  {min(i + chunk, len(pendentes))}/{len(pendentes)}")
         self.stdout.write(self.style.SUCCESS("Categorias padrão criadas com sucesso."))
@@ -0,0 +1,32 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from despesas.benchmark import geracao_concorrente
+
+
+class Command(BaseCommand):
+    help = (
+        "Roda várias gerações da competência atual ao mesmo tempo, em processos separados, sobre o mesmo banco "
+        "(SQLite temporário ou --database-url) e confere que nenhum lançamento foi duplicado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processos", type=int, default=4, help="Gerações simultâneas (padrão: 4).")
+        parser.add_argument("--grupos", type=int, default=20, help="Grupos sintéticos (padrão: 20).")
+        parser.add_argument("--despesas", type=int, default=5, help="Despesas modelo por grupo (padrão: 5).")
+        parser.add_argument(
+            "--database-url", help="Banco já migrado a usar (ex.: PostgreSQL de testes); os grupos criados são removidos.",
+        )
+        parser.add_argument("--saida", help="Salva o resultado em JSON.")
+
+    def handle(self, *args, **options):
+        r = geracao_concorrente(options["processos"], options["grupos"], options["despesas"], options["database_url"])
+        for chave, valor in r.items():
+            self.stdout.write(f"{chave:<16} {valor}")
+        if options["saida"]:
+            Path(options["saida"]).write_text(json.dumps(r, indent=2, ensure_ascii=False), encoding="utf-8")
+        if r["falhas"] or r["duplicados"] or r["sem_rateio"] or r["gerados"] != r["esperados"]:
+            raise CommandError("Geração concorrente inconsistente.")
+        self.stdout.write(self.style.SUCCESS("Nenhum lançamento duplicado."))
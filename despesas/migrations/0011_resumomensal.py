@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('despesas', '0010_tarefaprocessamento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('competencia', models.DateField(help_text='1º dia do mês.')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PAGO', 'Pago'), ('CANCELADO', 'Cancelado')], max_length=10)),
+                ('valor_pago', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('valor_envolvido', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('valor_rateado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantidade', models.PositiveIntegerField(default=0, help_text='Lançamentos pagos pelo membro.')),
+                ('casal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to='despesas.casal')),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to='despesas.categoria')),
+                ('membro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resumo mensal',
+                'verbose_name_plural': 'Resumos mensais',
+                'constraints': [models.UniqueConstraint(fields=('casal', 'competencia', 'categoria', 'membro', 'status'), name='resumo_mensal_unico')],
+            },
+        ),
+    ]
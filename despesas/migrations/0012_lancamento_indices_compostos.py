@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('despesas', '0011_resumomensal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['casal', '-competencia', 'data_vencimento', 'id'], name='lanc_casal_comp_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['casal', 'status', 'data_vencimento'], name='lanc_casal_status_venc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['casal', 'pagador', 'competencia'], name='lanc_casal_pagador_comp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['casal', 'escopo', 'competencia'], name='lanc_casal_escopo_comp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['casal', 'subcategoria', 'competencia'], name='lanc_casal_sub_comp_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('despesas', '0012_lancamento_indices_compostos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lancamento',
+            index=models.Index(fields=['casal', 'data_vencimento', 'valor_total'], name='lanc_casal_venc_valor_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('despesas', '0013_lancamento_indice_importacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoMembro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('saldo', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('casal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to='despesas.casal')),
+                ('membro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Saldo do membro',
+                'verbose_name_plural': 'Saldos dos membros',
+                'constraints': [models.UniqueConstraint(fields=('casal', 'membro'), name='saldo_membro_unico')],
+            },
+        ),
+    ]
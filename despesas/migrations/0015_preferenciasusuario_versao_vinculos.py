@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('despesas', '0014_saldomembro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='preferenciasusuario',
+            name='versao_vinculos',
+            field=models.PositiveIntegerField(default=0, help_text='Muda quando o grupo atual ou as participações mudam; invalida os tokens de acesso emitidos antes.'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('despesas', '0015_preferenciasusuario_versao_vinculos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartaocredito',
+            name='limite_utilizado',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Parcelas não pagas em todas as faturas; mantido por despesas.faturas.', max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='compracartao',
+            name='data_compra',
+            field=models.DateField(blank=True, help_text='Se informada, define a fatura da 1ª parcela pelo dia de fechamento do cartão.', null=True),
+        ),
+        migrations.CreateModel(
+            name='FaturaCartao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('competencia', models.DateField(help_text='1º dia do mês de vencimento.')),
+                ('data_fechamento', models.DateField()),
+                ('data_vencimento', models.DateField()),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('valor_pago', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('quantidade', models.PositiveIntegerField(default=0, help_text='Parcelas não canceladas.')),
+                ('cartao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='faturas', to='despesas.cartaocredito')),
+                ('casal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='faturas_cartao', to='despesas.casal')),
+            ],
+            options={
+                'verbose_name': 'Fatura do cartão',
+                'verbose_name_plural': 'Faturas do cartão',
+                'ordering': ['cartao', 'competencia'],
+            },
+        ),
+        migrations.AddField(
+            model_name='lancamento',
+            name='fatura',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='parcelas', to='despesas.faturacartao'),
+        ),
+        migrations.AddIndex(
+            model_name='faturacartao',
+            index=models.Index(fields=['casal', 'competencia'], name='fatura_casal_comp_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='faturacartao',
+            constraint=models.UniqueConstraint(fields=('cartao', 'competencia'), name='fatura_cartao_competencia_unica'),
+        ),
+    ]
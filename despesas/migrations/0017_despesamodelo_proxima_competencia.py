@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:27
+
+import despesas.models
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+
+def agendar_existentes(apps, schema_editor):
+    """Próxima competência das despesas já cadastradas, a partir do último mês gerado de cada uma."""
+    DespesaModelo = apps.get_model("despesas", "DespesaModelo")
+    Lancamento = apps.get_model("despesas", "Lancamento")
+    hoje = timezone.localdate().replace(day=1)
+    ultimas = dict(
+        Lancamento.objects.filter(despesa_modelo__isnull=False)
+        .values("despesa_modelo_id")
+        .annotate(ultima=Max("competencia"))
+        .values_list("despesa_modelo_id", "ultima")
+    )
+    despesas = []
+    for dm in DespesaModelo.objects.only("id", "periodicidade", "recorrente", "criado_em").iterator():
+        ultima = ultimas.get(dm.id)
+        ultima = ultima.replace(day=1) if ultima else None
+        if dm.periodicidade == "UNICA" or not dm.recorrente:
+            dm.proxima_competencia = None if ultima else hoje
+        elif dm.periodicidade == "ANUAL":
+            if ultima:
+                dm.proxima_competencia = ultima + relativedelta(years=1)
+            else:
+                # nunca gerada: próximo aniversário do mês de cadastro
+                proxima = timezone.localdate(dm.criado_em).replace(day=1)
+                while proxima < hoje:
+                    proxima += relativedelta(years=1)
+                dm.proxima_competencia = proxima
+        else:
+            dm.proxima_competencia = ultima + relativedelta(months=1) if ultima else hoje
+        despesas.append(dm)
+    DespesaModelo.objects.bulk_update(despesas, ["proxima_competencia"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('despesas', '0016_faturacartao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='despesamodelo',
+            name='proxima_competencia',
+            field=models.DateField(blank=True, default=despesas.models.mes_atual, help_text='1º dia do próximo mês a gerar; vazio quando não há mais o que gerar (única já gerada).', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='despesamodelo',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['proxima_competencia', 'casal'], name='despesa_modelo_agenda_idx'),
+        ),
+        migrations.RunPython(agendar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def desvincular_duplicados(apps, schema_editor):
+    """
+    Gerações concorrentes antigas podem ter lançado a mesma despesa duas vezes no mês. O mais antigo
+    continua ligado à despesa modelo; os demais viram lançamentos avulsos (nada é apagado).
+    """
+    Lancamento = apps.get_model("despesas", "Lancamento")
+    repetidos = (
+        Lancamento.objects.filter(despesa_modelo__isnull=False)
+        .values("casal_id", "despesa_modelo_id", "competencia")
+        .annotate(n=Count("id"), primeiro=Min("id"))
+        .filter(n__gt=1)
+    )
+    for grupo in repetidos:
+        Lancamento.objects.filter(
+            casal_id=grupo["casal_id"], despesa_modelo_id=grupo["despesa_modelo_id"], competencia=grupo["competencia"],
+        ).exclude(pk=grupo["primeiro"]).update(despesa_modelo=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('despesas', '0017_despesamodelo_proxima_competencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(desvincular_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='lancamento',
+            constraint=models.UniqueConstraint(condition=models.Q(('despesa_modelo__isnull', False)), fields=('casal', 'despesa_modelo', 'competencia'), name='lanc_modelo_competencia_unico', violation_error_message='Esta despesa modelo já foi lançada nesta competência.'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('despesas', '0018_lancamento_modelo_competencia_unico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='casal',
+            name='versao_lancamentos',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Muda a cada recálculo de mês do grupo; versão (ETag) de /api/lancamentos/.'),
+        ),
+    ]
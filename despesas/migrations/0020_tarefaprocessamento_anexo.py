@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('despesas', '0019_casal_versao_lancamentos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarefaprocessamento',
+            name='anexo',
+            field=models.BinaryField(blank=True, help_text='Arquivo enviado com a tarefa (ex.: extrato a importar); apagado ao terminar.', null=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.text import slugify
 
 User = get_user_model()
@@ -16,6 +17,10 @@ class Casal(CarimboTempo):
     Representa um GRUPO DOMÉSTICO (pessoas que moram na mesma casa).
     """
     nome = models.CharField("Nome do grupo (apelido)", max_length=100, blank=True, default="")
+    versao_lancamentos = models.PositiveBigIntegerField(
+        default=0, editable=False,
+        help_text="Muda a cada recálculo de mês do grupo; versão (ETag) de /api/lancamentos/.",
+    )
     class Meta:
         verbose_name = "Grupo doméstico"
         verbose_name_plural = "Grupos domésticos"
@@ -56,6 +61,10 @@ class PreferenciasUsuario(CarimboTempo):
         on_delete=models.SET_NULL,
         related_name="usuarios_atuais",
     )
+    versao_vinculos = models.PositiveIntegerField(
+        default=0,
+        help_text="Muda quando o grupo atual ou as participações mudam; invalida os tokens de acesso emitidos antes.",
+    )
     class Meta:
         verbose_name = "Preferências do usuário"
         verbose_name_plural = "Preferências dos usuários"
@@ -106,6 +115,9 @@ class Subcategoria(CarimboTempo):
     def __str__(self):
         return f"{self.categoria.nome} / {self.nome}"
 
+def mes_atual():
+    return timezone.localdate().replace(day=1)
+
 class DespesaModelo(CarimboTempo):
     casal = models.ForeignKey(Casal, related_name="despesas_modelo", on_delete=models.CASCADE)
     nome = models.CharField(max_length=120)
@@ -118,10 +130,21 @@ class DespesaModelo(CarimboTempo):
     periodicidade = models.CharField(max_length=10, choices=Periodicidade.choices, default=Periodicidade.MENSAL)
     regra_rateio = models.CharField(max_length=12, choices=RegraRateio.choices, default=RegraRateio.IGUAL, help_text="Como dividir valores quando gerar lançamentos.")
     ativo = models.BooleanField(default=True)
+    proxima_competencia = models.DateField(
+        null=True, blank=True, default=mes_atual,
+        help_text="1º dia do próximo mês a gerar; vazio quando não há mais o que gerar (única já gerada).",
+    )
     class Meta:
         verbose_name = "Despesa (modelo)"
         verbose_name_plural = "Despesas (modelo)"
         ordering = ["nome"]
+        indexes = [
+            # a geração mensal só lê as despesas vencidas
+            models.Index(
+                fields=["proxima_competencia", "casal"], name="despesa_modelo_agenda_idx",
+                condition=models.Q(ativo=True),
+            ),
+        ]
     def clean(self):
         if self.escopo == EscopoDespesa.PESSOAL and not self.dono_pessoal:
             raise ValidationError("Despesas pessoais exigem um dono_pessoal.")
@@ -185,6 +208,10 @@ class CartaoCredito(CarimboTempo):
     nome = models.CharField(max_length=80)
     bandeira = models.CharField(max_length=10, choices=BandeiraCartao.choices, default=BandeiraCartao.OUTRO)
     limite = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    limite_utilizado = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+        help_text="Parcelas não pagas em todas as faturas; mantido por despesas.faturas.",
+    )
     dia_fechamento = models.PositiveSmallIntegerField(default=1)
     dia_vencimento = models.PositiveSmallIntegerField(default=10)
     ativo = models.BooleanField(default=True)
@@ -194,6 +221,35 @@ class CartaoCredito(CarimboTempo):
         ordering = ["nome"]
     def __str__(self):
         return f"{self.nome}"
+    @property
+    def limite_disponivel(self):
+        return self.limite - self.limite_utilizado
+
+class FaturaCartao(CarimboTempo):
+    """
+    Fatura de um cartão, identificada pelo mês de vencimento. Os totais são um agregado das parcelas
+    (Lancamento.fatura) mantido por despesas.faturas a cada recálculo do mês.
+    """
+    casal = models.ForeignKey(Casal, related_name="faturas_cartao", on_delete=models.CASCADE)
+    cartao = models.ForeignKey(CartaoCredito, related_name="faturas", on_delete=models.CASCADE)
+    competencia = models.DateField(help_text="1º dia do mês de vencimento.")
+    data_fechamento = models.DateField()
+    data_vencimento = models.DateField()
+    valor_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor_pago = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantidade = models.PositiveIntegerField(default=0, help_text="Parcelas não canceladas.")
+    class Meta:
+        verbose_name = "Fatura do cartão"
+        verbose_name_plural = "Faturas do cartão"
+        ordering = ["cartao", "competencia"]
+        constraints = [
+            models.UniqueConstraint(fields=["cartao", "competencia"], name="fatura_cartao_competencia_unica"),
+        ]
+        indexes = [
+            models.Index(fields=["casal", "competencia"], name="fatura_casal_comp_idx"),
+        ]
+    def __str__(self):
+        return f"{self.cartao} - {self.competencia:%Y-%m}"
 
 class CompraCartao(CarimboTempo):
     casal = models.ForeignKey(Casal, related_name="compras_cartao", on_delete=models.CASCADE)
@@ -204,6 +260,10 @@ class CompraCartao(CarimboTempo):
     dono_pessoal = models.ForeignKey(User, related_name="compras_cartao_pessoais", on_delete=models.PROTECT, null=True, blank=True)
     valor_total = models.DecimalField(max_digits=12, decimal_places=2)
     parcelas_total = models.PositiveSmallIntegerField(default=1)
+    data_compra = models.DateField(
+        null=True, blank=True,
+        help_text="Se informada, define a fatura da 1ª parcela pelo dia de fechamento do cartão.",
+    )
     primeira_competencia = models.DateField(help_text="Competência da 1ª parcela (YYYY-MM-01)")
     primeiro_vencimento = models.DateField(help_text="Vencimento da 1ª parcela")
     pagador = models.ForeignKey(User, related_name="compras_cartao_pagador", on_delete=models.PROTECT)
@@ -228,6 +288,7 @@ class Lancamento(CarimboTempo):
     data_pagamento = models.DateField(null=True, blank=True)
     pagador = models.ForeignKey(User, related_name="pagamentos", on_delete=models.PROTECT)
     compra_cartao = models.ForeignKey(CompraCartao, related_name="parcelas", on_delete=models.SET_NULL, null=True, blank=True)
+    fatura = models.ForeignKey(FaturaCartao, related_name="parcelas", on_delete=models.SET_NULL, null=True, blank=True)
     parcela_numero = models.PositiveSmallIntegerField(null=True, blank=True)
     parcelas_total = models.PositiveSmallIntegerField(null=True, blank=True)
     criado_por = models.ForeignKey(User, related_name="lancamentos_criados", on_delete=models.PROTECT)
@@ -235,6 +296,24 @@ class Lancamento(CarimboTempo):
         verbose_name = "Lançamento"
         verbose_name_plural = "Lançamentos"
         ordering = ["-competencia", "data_vencimento", "id"]
+        # Índices compostos alinhados aos filtros/ordenações do LancamentoViewSet e dos relatórios
+        indexes = [
+            models.Index(fields=["casal", "-competencia", "data_vencimento", "id"], name="lanc_casal_comp_venc_idx"),
+            models.Index(fields=["casal", "status", "data_vencimento"], name="lanc_casal_status_venc_idx"),
+            models.Index(fields=["casal", "pagador", "competencia"], name="lanc_casal_pagador_comp_idx"),
+            models.Index(fields=["casal", "escopo", "competencia"], name="lanc_casal_escopo_comp_idx"),
+            models.Index(fields=["casal", "subcategoria", "competencia"], name="lanc_casal_sub_comp_idx"),
+            # deduplicação da importação de extratos (data, valor e descrição)
+            models.Index(fields=["casal", "data_vencimento", "valor_total"], name="lanc_casal_venc_valor_idx"),
+        ]
+        constraints = [
+            # um lançamento por despesa modelo e competência: gerações simultâneas não duplicam
+            models.UniqueConstraint(
+                fields=["casal", "despesa_modelo", "competencia"], name="lanc_modelo_competencia_unico",
+                condition=models.Q(despesa_modelo__isnull=False),
+                violation_error_message="Esta despesa modelo já foi lançada nesta competência.",
+            ),
+        ]
     def clean(self):
         if self.escopo == EscopoDespesa.PESSOAL and not self.dono_pessoal:
             raise ValidationError("Lançamentos pessoais exigem dono_pessoal.")
@@ -259,3 +338,83 @@ class RateioLancamento(CarimboTempo):
         if self.percentual is not None:
             return f"{base} ({self.percentual}% = R$ {self.valor})"
         return f"{base} (R$ {self.valor})"
+
+class ResumoMensal(CarimboTempo):
+    """
+    Agregado materializado por grupo/competência/categoria/membro/status, mantido por despesas.resumos
+    a cada alteração de Lançamento/RateioLancamento. Os relatórios leem daqui em vez de somar lançamentos.
+    - valor_pago: lançamentos em que o membro é o pagador
+    - valor_envolvido: lançamentos em que o membro é pagador ou dono_pessoal (filtro "por membro" do relatório)
+    - valor_rateado: parte do membro nos rateios
+    """
+    casal = models.ForeignKey(Casal, related_name="resumos_mensais", on_delete=models.CASCADE)
+    competencia = models.DateField(help_text="1º dia do mês.")
+    categoria = models.ForeignKey(Categoria, related_name="resumos_mensais", on_delete=models.CASCADE)
+    membro = models.ForeignKey(User, related_name="resumos_mensais", on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=StatusLancamento.choices)
+    valor_pago = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor_envolvido = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    valor_rateado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    quantidade = models.PositiveIntegerField(default=0, help_text="Lançamentos pagos pelo membro.")
+    class Meta:
+        verbose_name = "Resumo mensal"
+        verbose_name_plural = "Resumos mensais"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["casal", "competencia", "categoria", "membro", "status"], name="resumo_mensal_unico"
+            ),
+        ]
+    def __str__(self):
+        return f"{self.casal} {self.competencia:%Y-%m} {self.categoria} {self.membro} {self.status}"
+
+class SaldoMembro(CarimboTempo):
+    """
+    Saldo acumulado de cada membro no grupo, considerando só lançamentos pagos:
+    o que pagou menos a sua parte nos rateios. Positivo = tem a receber; negativo = deve.
+    Atualizado por diferença sempre que um mês de ResumoMensal é recalculado (despesas.acerto).
+    """
+    casal = models.ForeignKey(Casal, related_name="saldos", on_delete=models.CASCADE)
+    membro = models.ForeignKey(User, related_name="saldos", on_delete=models.CASCADE)
+    saldo = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    class Meta:
+        verbose_name = "Saldo do membro"
+        verbose_name_plural = "Saldos dos membros"
+        constraints = [
+            models.UniqueConstraint(fields=["casal", "membro"], name="saldo_membro_unico"),
+        ]
+    def __str__(self):
+        return f"{self.casal} {self.membro}: R$ {self.saldo}"
+
+class StatusTarefa(models.TextChoices):
+    PENDENTE = "PENDENTE", "Pendente"
+    EXECUTANDO = "EXECUTANDO", "Executando"
+    CONCLUIDA = "CONCLUIDA", "Concluída"
+    ERRO = "ERRO", "Erro"
+
+class TarefaProcessamento(CarimboTempo):
+    """
+    Processamento em segundo plano (ex.: gerar parcelas de uma compra longa).
+    O frontend consulta o status por /api/tarefas/{id}/.
+    """
+    casal = models.ForeignKey(Casal, related_name="tarefas", on_delete=models.CASCADE)
+    criado_por = models.ForeignKey(User, related_name="tarefas", on_delete=models.SET_NULL, null=True, blank=True)
+    tipo = models.CharField(max_length=40)
+    status = models.CharField(max_length=10, choices=StatusTarefa.choices, default=StatusTarefa.PENDENTE)
+    parametros = models.JSONField(default=dict, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    processados = models.PositiveIntegerField(default=0)
+    resultado = models.JSONField(default=dict, blank=True)
+    erro = models.TextField(blank=True, default="")
+    anexo = models.BinaryField(
+        null=True, blank=True, editable=False,
+        help_text="Arquivo enviado com a tarefa (ex.: extrato a importar); apagado ao terminar.",
+    )
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+    class Meta:
+        verbose_name = "Tarefa de processamento"
+        verbose_name_plural = "Tarefas de processamento"
+        ordering = ["-criado_em"]
+        indexes = [models.Index(fields=["status", "criado_em"], name="tarefa_status_criado_idx")]
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.get_status_display()})"
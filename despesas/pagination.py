@@ -0,0 +1,162 @@
+# despesas/pagination.py
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) sobre a ordenação completa, ex. (-competencia, data_vencimento, id).
+
+    O cursor guarda os valores da última linha da página; a próxima página é buscada com
+    `(campos) > (valores)` na ordem indicada, sem OFFSET. Assim o custo não cresce com a
+    profundidade e o cursor continua válido quando linhas entram ou saem antes dele.
+    A ordenação precisa terminar num campo único (id) e usar apenas campos não nulos.
+    """
+    ordering = ("-id",)
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Cursor inválido."
+
+    def __init__(self):
+        self.page_size = getattr(settings, "DESPESAS_PAGINACAO_TAMANHO", 50)
+
+    # --- API do DRF -------------------------------------------------------
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limite = self.get_page_size(request)
+        self.campos = [(f.lstrip("-"), f.startswith("-")) for f in self.get_ordering(request, queryset, view)]
+        self.model = queryset.model
+        posicao, reverso = self.decode_cursor(request)
+
+        if posicao is not None:
+            queryset = queryset.filter(self._q_depois(posicao, reverso))
+        ordem = [("-" if desc != reverso else "") + nome for nome, desc in self.campos]
+        resultados = list(queryset.order_by(*ordem)[: self.limite + 1])
+        tem_mais = len(resultados) > self.limite
+        resultados = resultados[: self.limite]
+        if reverso:
+            resultados.reverse()
+            self.tem_proxima, self.tem_anterior = True, tem_mais
+        else:
+            self.tem_proxima, self.tem_anterior = tem_mais, posicao is not None
+        self.pagina = resultados
+        return resultados
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {"name": self.cursor_query_param, "required": False, "in": "query",
+             "description": "Cursor da página (use os links next/previous).", "schema": {"type": "string"}},
+            {"name": self.page_size_query_param, "required": False, "in": "query",
+             "description": f"Itens por página (máx. {self.max_page_size}).", "schema": {"type": "integer"}},
+        ]
+
+    # --- Ordenação / tamanho ---------------------------------------------
+
+    def get_page_size(self, request):
+        try:
+            tamanho = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(tamanho, self.max_page_size))
+
+    def get_ordering(self, request, queryset, view):
+        """Usa ?ordering= do OrderingFilter da view, se houver; completa com id para desempate."""
+        ordering = tuple(self.ordering)
+        for backend in getattr(view, "filter_backends", []):
+            if issubclass(backend, OrderingFilter) and request.query_params.get(backend.ordering_param):
+                pedida = backend().get_ordering(request, queryset, view)
+                if pedida:
+                    ordering = tuple(pedida)
+        if not any(campo.lstrip("-") in ("id", "pk") for campo in ordering):
+            ordering += ("-id",) if ordering[-1].startswith("-") else ("id",)
+        return tuple(campo.replace("pk", "id") if campo.lstrip("-") == "pk" else campo for campo in ordering)
+
+    # --- Cursor -----------------------------------------------------------
+
+    def _q_depois(self, posicao, reverso):
+        """(a, b, c) > (x, y, z) respeitando a direção de cada campo."""
+        condicao = Q()
+        for i, (nome, desc) in enumerate(self.campos):
+            lookup = "lt" if desc != reverso else "gt"
+            termo = Q(**{f"{nome}__{lookup}": posicao[i]})
+            for j in range(i):
+                termo &= Q(**{self.campos[j][0]: posicao[j]})
+            condicao |= termo
+        return condicao
+
+    def decode_cursor(self, request):
+        bruto = request.query_params.get(self.cursor_query_param)
+        if not bruto:
+            return None, False
+        try:
+            dados = json.loads(base64.urlsafe_b64decode(bruto.encode("ascii")).decode("utf-8"))
+            valores = dados["p"]
+            if len(valores) != len(self.campos):
+                raise ValueError
+            posicao = [
+                self.model._meta.get_field(nome).to_python(valor)
+                for (nome, _), valor in zip(self.campos, valores)
+            ]
+            return posicao, bool(dados.get("r"))
+        except (TypeError, ValueError, KeyError, UnicodeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj, reverso):
+        valores = [self.model._meta.get_field(nome).value_to_string(obj) for nome, _ in self.campos]
+        bruto = json.dumps({"p": valores, "r": int(reverso)}, separators=(",", ":"))
+        cursor = base64.urlsafe_b64encode(bruto.encode("utf-8")).decode("ascii")
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.tem_proxima or not self.pagina:
+            return None
+        return self.encode_cursor(self.pagina[-1], reverso=False)
+
+    def get_previous_link(self):
+        if not self.tem_anterior:
+            return None
+        if not self.pagina:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.pagina[0], reverso=True)
+
+
+class LancamentoPagination(KeysetPagination):
+    ordering = ("-competencia", "data_vencimento", "id")
+
+
+class CompraCartaoPagination(KeysetPagination):
+    ordering = ("-criado_em", "-id")
+
+
+class DespesaModeloPagination(KeysetPagination):
+    ordering = ("nome", "id")
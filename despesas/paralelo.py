@@ -0,0 +1,53 @@
+# despesas/paralelo.py
+"""
+Consultas independentes em paralelo sob ASGI: seções de /api/dashboard/, agregados do relatório
+financeiro e das tendências.
+
+Cada consulta é uma função sem argumentos que devolve o resultado pronto. Sob WSGI (ou com
+settings.DESPESAS_CONSULTAS_PARALELAS = False) elas rodam uma após a outra, na conexão da requisição.
+Sob ASGI elas só leem e não dependem umas das outras, então rodam ao mesmo tempo, cada uma numa
+thread do executor com a própria conexão ao banco: a latência fica perto da consulta mais lenta em
+vez da soma de todas.
+
+As views continuam síncronas (o DRF não tem views assíncronas) e o ORM assíncrono do Django
+(aaggregate, alist...) não serve aqui: ele passa cada consulta para a mesma thread da requisição,
+então um asyncio.gather delas ainda roda uma de cada vez.
+
+As conexões das threads seguem o mesmo ciclo das requisições (close_old_connections antes e depois,
+respeitando CONN_MAX_AGE; no perfil ASGI ele é 0). As consultas feitas nelas não entram na contagem
+por view de backend.instrumentacao, que mede só a conexão da requisição.
+"""
+import asyncio
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+
+
+def em_paralelo(request) -> bool:
+    """Consultas em paralelo só quando a requisição veio do servidor ASGI."""
+    django_request = getattr(request, "_request", request)
+    return isinstance(django_request, ASGIRequest) and getattr(settings, "DESPESAS_CONSULTAS_PARALELAS", True)
+
+
+def _isolado(gerar):
+    def executar():
+        close_old_connections()
+        try:
+            return gerar()
+        finally:
+            close_old_connections()
+    return sync_to_async(executar, thread_sensitive=False)
+
+
+async def _todas(geradores: dict) -> dict:
+    resultados = await asyncio.gather(*(_isolado(gerar)() for gerar in geradores.values()))
+    return dict(zip(geradores, resultados))
+
+
+def coletar(geradores: dict, paralelo: bool = False) -> dict:
+    """Executa as consultas e devolve {nome: resultado} na ordem de `geradores`."""
+    if paralelo and len(geradores) > 1:
+        return async_to_sync(_todas)(geradores)
+    return {nome: gerar() for nome, gerar in geradores.items()}
@@ -1,6 +1,6 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from rest_framework.exceptions import PermissionDenied
-from .utils import get_casal_ativo_do_usuario
+from .utils import get_casal_ativo
 
 class IsAutenticadoNoSeuCasal(BasePermission):
     """
@@ -11,7 +11,7 @@ class IsAutenticadoNoSeuCasal(BasePermission):
     def has_permission(self, request, view):
         if request.method in SAFE_METHODS:
             return True  # leitura liberada; a view deve filtrar/vaziar
-        casal = get_casal_ativo_do_usuario(request.user)
+        casal = get_casal_ativo(request)
         return casal is not None
 
 class SomenteDoMeuCasal(BasePermission):
@@ -23,11 +23,15 @@ class SomenteDoMeuCasal(BasePermission):
         if request.method in SAFE_METHODS:
             return True
         # objetos principais têm 'casal' (grupo) relacionado
-        casal = getattr(obj, "casal", None) or getattr(getattr(obj, "categoria", None), "casal", None)
-        if casal is None:
+        casal_id = getattr(obj, "casal_id", None) or getattr(getattr(obj, "categoria", None), "casal_id", None)
+        if casal_id is None:
             return False
+        # o grupo ativo já teve a participação do usuário validada nesta request
+        casal_ativo = get_casal_ativo(request)
+        if casal_ativo is not None and casal_ativo.id == casal_id:
+            return True
         from .models import MembroCasal
-        return MembroCasal.objects.filter(casal=casal, usuario=request.user, ativo=True).exists()
+        return MembroCasal.objects.filter(casal_id=casal_id, usuario=request.user, ativo=True).exists()
 
 class CasalScopedQuerysetMixin:
     """
@@ -35,7 +39,7 @@ class CasalScopedQuerysetMixin:
     Se não existir grupo, retorna None; a view deve tratar (lista vazia; escrita bloqueada).
     """
     def get_casal_usuario(self):
-        return get_casal_ativo_do_usuario(self.request.user)
+        return get_casal_ativo(self.request)
 
     def filter_queryset_por_casal(self, qs):
         casal = self.get_casal_usuario()
@@ -0,0 +1,166 @@
+# despesas/projecao.py
+"""
+Projeção de caixa dos próximos meses, sem gerar lançamentos.
+
+Cada mês da janela soma:
+- o que já está lançado (parcelas de cartão, lançamentos gerados das despesas-modelo e avulsos),
+  exceto cancelados;
+- o previsto das despesas-modelo ativas nos meses em que a agenda delas (proxima_competencia,
+  avançada por services.proxima_competencia_apos) ainda vai gerar lançamento: MENSAL todo mês,
+  ANUAL no mês de aniversário e ÚNICA uma vez. Agenda atrasada cai no primeiro mês da janela,
+  como aconteceria na próxima geração.
+A parte de cada membro segue a regra de rateio da despesa (a mesma divisão de
+services.gerar_lancamentos_competencia_lote) e é comparada com o salario_mensal dele.
+
+São seis consultas qualquer que seja o tamanho da janela (membros, totais por origem, rateios,
+despesas-modelo, regras de rateio e meses já gerados); o rateio de cada despesa-modelo é calculado
+uma vez e aplicado aos meses em que ela cai. O resultado fica no cache do grupo
+(cache_referencia.PROJECAO), invalidado a cada recálculo de mês e quando despesas-modelo, rateios
+padrão ou membros mudam.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.core.exceptions import ValidationError
+from django.db.models import Case, CharField, Sum, Value, When
+from django.db.models.functions import TruncMonth
+
+from . import cache_referencia
+from .models import DespesaModelo, Lancamento, MembroCasal, RateioLancamento, StatusLancamento
+from .services import ratear_valor, regras_rateio_por_despesa, proxima_competencia_apos
+
+ZERO = Decimal("0.00")
+ORIGENS = ("recorrentes", "cartao", "avulsos")
+MAXIMO_MESES = 24
+
+# origem de um lançamento já gravado, a partir de um prefixo até o Lancamento
+def _origem(prefixo=""):
+    return Case(
+        When(**{f"{prefixo}compra_cartao__isnull": False}, then=Value("cartao")),
+        When(**{f"{prefixo}despesa_modelo__isnull": False}, then=Value("recorrentes")),
+        default=Value("avulsos"),
+        output_field=CharField(),
+    )
+
+
+def meses_do_modelo(dm: DespesaModelo, janela: list[date], gerados: set[date]) -> list[int]:
+    """Posições da janela em que a despesa-modelo ainda vai gerar lançamento, simulando a agenda."""
+    posicoes = []
+    proxima = dm.proxima_competencia
+    for i, mes in enumerate(janela):
+        if proxima is None:
+            break
+        if proxima <= mes:
+            if mes not in gerados:
+                posicoes.append(i)
+            proxima = proxima_competencia_apos(dm, mes, agendada=proxima)
+    return posicoes
+
+
+def calcular_projecao(casal_id: int, inicio: date, meses: int) -> dict:
+    inicio = inicio.replace(day=1)
+    janela = [inicio + relativedelta(months=i) for i in range(meses)]
+    fim = inicio + relativedelta(months=meses)
+    posicao = {mes: i for i, mes in enumerate(janela)}
+
+    membros = list(
+        MembroCasal.objects.filter(casal_id=casal_id, ativo=True).select_related("usuario").order_by("id")
+    )
+    coluna = {m.usuario_id: j for j, m in enumerate(membros)}
+    membros_ids = [m.usuario_id for m in membros]
+    renda = sum((m.salario_mensal for m in membros), ZERO)
+
+    # matrizes mês × origem e mês × membro
+    lancado = [dict.fromkeys(ORIGENS, ZERO) for _ in janela]
+    previsto = [ZERO for _ in janela]
+    por_membro = [[ZERO] * len(membros) for _ in janela]
+
+    base = Lancamento.objects.filter(casal_id=casal_id, competencia__gte=inicio, competencia__lt=fim).exclude(
+        status=StatusLancamento.CANCELADO
+    )
+    for linha in (
+        base.values(mes=TruncMonth("competencia"), origem=_origem()).annotate(total=Sum("valor_total")).order_by()
+    ):
+        lancado[posicao[linha["mes"]]][linha["origem"]] += linha["total"]
+    for linha in (
+        RateioLancamento.objects.filter(lancamento__in=base, membro_id__in=membros_ids)
+        .values("membro_id", mes=TruncMonth("lancamento__competencia"))
+        .annotate(total=Sum("valor"))
+        .order_by()
+    ):
+        por_membro[posicao[linha["mes"]]][coluna[linha["membro_id"]]] += linha["total"]
+
+    despesas = list(DespesaModelo.objects.filter(casal_id=casal_id, ativo=True).order_by("id"))
+    regras = regras_rateio_por_despesa([dm.id for dm in despesas])
+    # meses da janela já lançados (a geração pula esses e só avança a agenda)
+    gerados = defaultdict(set)
+    for dm_id, mes in (
+        base.filter(despesa_modelo__in=despesas)
+        .values_list("despesa_modelo_id", TruncMonth("competencia"))
+        .distinct()
+    ):
+        gerados[dm_id].add(mes)
+
+    avisos = []
+    for dm in despesas:
+        posicoes = meses_do_modelo(dm, janela, gerados[dm.id])
+        if not posicoes:
+            continue
+        try:
+            partes = ratear_valor(dm.valor_previsto, dm.regra_rateio, None, dm, membros=membros_ids, regras=regras.get(dm.id, []))
+        except ValidationError as exc:
+            avisos.append({"despesa_modelo": dm.id, "nome": dm.nome, "erro": "; ".join(exc.messages)})
+            partes = []
+        # rateio calculado uma vez por despesa, somado a todos os meses em que ela cai
+        vetor = [ZERO] * len(membros)
+        for membro_id, _, valor in partes:
+            if membro_id in coluna:
+                vetor[coluna[membro_id]] += valor
+        for i in posicoes:
+            previsto[i] += dm.valor_previsto
+            por_membro[i] = [a + b for a, b in zip(por_membro[i], vetor)]
+
+    competencias = []
+    for i, mes in enumerate(janela):
+        total = sum(lancado[i].values(), ZERO) + previsto[i]
+        competencias.append({
+            "competencia": f"{mes:%Y-%m}",
+            **{origem: float(valor) for origem, valor in lancado[i].items()},
+            "previsto": float(previsto[i]),
+            "total": float(total),
+            "renda": float(renda),
+            "saldo": float(renda - total),
+            "por_membro": [
+                {
+                    "membro": m.usuario_id,
+                    "total": float(por_membro[i][j]),
+                    "saldo": float(m.salario_mensal - por_membro[i][j]),
+                }
+                for j, m in enumerate(membros)
+            ],
+        })
+    return {
+        "inicio": f"{inicio:%Y-%m}",
+        "meses": meses,
+        "renda_mensal": float(renda),
+        "membros": [
+            {
+                "id": m.usuario_id,
+                "apelido": m.apelido or m.usuario.first_name or m.usuario.username,
+                "salario_mensal": float(m.salario_mensal),
+            }
+            for m in membros
+        ],
+        "competencias": competencias,
+        "avisos": avisos,
+    }
+
+
+def projecao(casal_id: int, inicio: date, meses: int) -> dict:
+    """calcular_projecao pelo cache do grupo."""
+    inicio = inicio.replace(day=1)
+    return cache_referencia.obter(
+        cache_referencia.PROJECAO, casal_id, f"{inicio:%Y-%m}:{meses}", lambda: calcular_projecao(casal_id, inicio, meses)
+    )
@@ -0,0 +1,173 @@
+# despesas/resumos.py
+"""
+Manutenção da tabela ResumoMensal (e, no mesmo recálculo, dos totais de FaturaCartao).
+
+Cada alteração de Lançamento/RateioLancamento marca o par (grupo, competência) como pendente;
+ao final da transação, o mês afetado é recalculado a partir das tabelas base (consultas agrupadas
+sobre um único mês de um único grupo). Os pares pendentes ficam num conjunto dividido pelos
+callbacks de on_commit da transação: se ela (ou os savepoints em que eles foram registrados) for
+desfeita, o Django descarta os callbacks e, com eles, os pares. Operações em lote
+(bulk_create/update) não disparam signals e devem chamar `agendar_recalculo` explicitamente.
+
+Cada recálculo também troca Casal.versao_lancamentos, a versão usada no GET condicional de
+/api/lancamentos/: toda alteração de lançamento passa por aqui.
+"""
+import threading
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from . import cache_referencia
+from .acerto import aplicar_variacao, saldos_de_linhas, saldos_do_resumo
+from .faturas import recalcular_faturas
+from .models import Casal, Lancamento, RateioLancamento, ResumoMensal
+
+_pendentes = threading.local()
+
+CAMPOS_VALOR = ("valor_pago", "valor_envolvido", "valor_rateado", "quantidade")
+
+
+def inicio_do_mes(d) -> date:
+    # instâncias criadas com strings (ex.: Lancamento(competencia="2025-01-01")) ainda não foram convertidas
+    if isinstance(d, str):
+        d = date.fromisoformat(d[:10])
+    return d.replace(day=1)
+
+
+class _Recalculo:
+    """Callback de on_commit; os callbacks de uma transação dividem o mesmo conjunto de meses."""
+
+    def __init__(self, chaves: set):
+        self.chaves = chaves
+
+    def __call__(self):
+        # o primeiro a rodar recalcula tudo; os demais encontram o conjunto vazio
+        pendentes = sorted(self.chaves)
+        self.chaves.clear()
+        for casal_id, competencia in pendentes:
+            recalcular_resumo(casal_id, competencia)
+
+
+def _pendentes_da_transacao(conexao):
+    """Meses já agendados nesta transação, ou None se ela terminou ou desfez todos os callbacks deles."""
+    chaves = getattr(_pendentes, "chaves", None)
+    if chaves is None or not conexao.in_atomic_block:
+        return None
+    if conexao.run_on_commit is not _pendentes.fila:
+        # commit e rollback (inclusive de savepoint) trocam a lista: confere se algum callback sobrou nela
+        if not any(getattr(func, "chaves", None) is chaves for _, func, _ in conexao.run_on_commit):
+            return None
+        _pendentes.fila = conexao.run_on_commit
+    return chaves
+
+
+def agendar_recalculo(casal_id: int, competencias) -> None:
+    """Marca os meses do grupo para recálculo quando a transação atual for confirmada."""
+    novas = {(casal_id, inicio_do_mes(c)) for c in competencias if c is not None}
+    if not novas:
+        return
+    conexao = transaction.get_connection()
+    chaves = _pendentes_da_transacao(conexao)
+    if chaves is None:
+        chaves = set()
+        if conexao.in_atomic_block:
+            _pendentes.chaves, _pendentes.fila = chaves, conexao.run_on_commit
+    chaves.update(novas)
+    # fora de transação o on_commit executa na hora
+    transaction.on_commit(_Recalculo(chaves))
+
+
+def trocar_versao_lancamentos(casal_id: int) -> None:
+    """Muda a versão dos lançamentos do grupo (ETag de /api/lancamentos/)."""
+    Casal.objects.filter(pk=casal_id).update(versao_lancamentos=F("versao_lancamentos") + 1)
+
+
+def calcular_resumo(casal_id: int, competencia: date) -> dict:
+    """Agrega o mês a partir de Lançamento/RateioLancamento: {(categoria, membro, status): valores}."""
+    inicio = inicio_do_mes(competencia)
+    fim = inicio + relativedelta(months=1)
+    linhas = defaultdict(lambda: dict.fromkeys(CAMPOS_VALOR, Decimal("0.00")))
+    base = Lancamento.objects.filter(casal_id=casal_id, competencia__gte=inicio, competencia__lt=fim)
+
+    por_pagador = (
+        base.values("subcategoria__categoria_id", "pagador_id", "status")
+        .annotate(total=Sum("valor_total"), qtd=Count("id"))
+        .order_by()
+    )
+    for row in por_pagador:
+        linha = linhas[(row["subcategoria__categoria_id"], row["pagador_id"], row["status"])]
+        linha["valor_pago"] += row["total"]
+        linha["valor_envolvido"] += row["total"]
+        linha["quantidade"] += row["qtd"]
+
+    por_dono = (
+        base.filter(dono_pessoal__isnull=False)
+        .exclude(dono_pessoal_id=F("pagador_id"))
+        .values("subcategoria__categoria_id", "dono_pessoal_id", "status")
+        .annotate(total=Sum("valor_total"))
+        .order_by()
+    )
+    for row in por_dono:
+        linhas[(row["subcategoria__categoria_id"], row["dono_pessoal_id"], row["status"])]["valor_envolvido"] += row["total"]
+
+    por_rateio = (
+        RateioLancamento.objects.filter(
+            lancamento__casal_id=casal_id, lancamento__competencia__gte=inicio, lancamento__competencia__lt=fim
+        )
+        .values("lancamento__subcategoria__categoria_id", "membro_id", "lancamento__status")
+        .annotate(total=Sum("valor"))
+        .order_by()
+    )
+    for row in por_rateio:
+        chave = (row["lancamento__subcategoria__categoria_id"], row["membro_id"], row["lancamento__status"])
+        linhas[chave]["valor_rateado"] += row["total"]
+
+    for linha in linhas.values():
+        linha["quantidade"] = int(linha["quantidade"])
+    return dict(linhas)
+
+
+def resumo_gravado(casal_id: int, competencia: date) -> dict:
+    qs = ResumoMensal.objects.filter(casal_id=casal_id, competencia=inicio_do_mes(competencia))
+    return {
+        (r["categoria_id"], r["membro_id"], r["status"]): {campo: r[campo] for campo in CAMPOS_VALOR}
+        for r in qs.values("categoria_id", "membro_id", "status", *CAMPOS_VALOR)
+    }
+
+
+@transaction.atomic
+def recalcular_resumo(casal_id: int, competencia: date) -> int:
+    """
+    Substitui as linhas de ResumoMensal do mês pelo agregado atual, repassa a diferença de saldo
+    de cada membro para SaldoMembro, atualiza as faturas de cartão do mês, troca a versão dos lançamentos
+    e descarta a projeção de caixa em cache do grupo. Retorna quantas linhas ficaram.
+
+    Começa travando a linha do grupo (select_for_update): recálculos simultâneos do mesmo grupo, do
+    mesmo mês ou de meses diferentes (que mexem nos mesmos SaldoMembro), rodam um depois do outro, e
+    cada um lê o "antes" já com o resultado do anterior gravado.
+    """
+    inicio = inicio_do_mes(competencia)
+    list(Casal.objects.select_for_update().filter(pk=casal_id).values_list("pk", flat=True))
+    trocar_versao_lancamentos(casal_id)
+    linhas = calcular_resumo(casal_id, inicio)
+    gravadas = ResumoMensal.objects.filter(casal_id=casal_id, competencia=inicio)
+    aplicar_variacao(casal_id, saldos_do_resumo(gravadas), saldos_de_linhas(linhas))
+    gravadas.delete()
+    ResumoMensal.objects.bulk_create([
+        ResumoMensal(
+            casal_id=casal_id,
+            competencia=inicio,
+            categoria_id=categoria_id,
+            membro_id=membro_id,
+            status=status,
+            **valores,
+        )
+        for (categoria_id, membro_id, status), valores in linhas.items()
+    ])
+    recalcular_faturas(casal_id, inicio)
+    cache_referencia.invalidar(casal_id, cache_referencia.PROJECAO)
+    return len(linhas)
@@ -1,12 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.utils import timezone
 
 from despesas.services import criar_categorias_padrao_para_casal
 
+from .autenticacao import TokenComVinculos
+from .faturas import competencia_da_compra, datas_da_fatura
+from .filters import LancamentoFilter
 from .models import (
     Casal, MembroCasal, Categoria, Subcategoria, Lancamento, DespesaModelo,
     RegraRateioPadrao, RateioLancamento, EscopoDespesa, RegraRateio, CartaoCredito, CompraCartao,
+    TarefaProcessamento, FaturaCartao, Periodicidade, mes_atual,
 )
 
 User = get_user_model()
@@ -37,7 +41,7 @@ class RegisterSerializer(serializers.Serializer):
             MembroCasal.objects.create(casal=casal, usuario=user, apelido=first_name or username, ativo=True)
             criar_categorias_padrao_para_casal(casal)
 
-        refresh = RefreshToken.for_user(user)
+        refresh = TokenComVinculos.for_user(user)
         return {
             "user": {"id": user.id, "username": user.username, "first_name": user.first_name, "email": user.email},
             "access": str(refresh.access_token),
@@ -84,9 +88,26 @@ class RateioLancamentoSerializer(serializers.ModelSerializer):
         read_only_fields = ("criado_em", "atualizado_em")
 
 class CartaoCreditoSerializer(serializers.ModelSerializer):
+    limite_disponivel = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
     class Meta:
         model = CartaoCredito
-        fields = ["id", "nome", "bandeira", "limite", "dia_fechamento", "dia_vencimento", "ativo"]
+        fields = ["id", "nome", "bandeira", "limite", "limite_utilizado", "limite_disponivel", "dia_fechamento",
+                  "dia_vencimento", "ativo"]
+        read_only_fields = ("limite_utilizado",)
+
+class FaturaCartaoSerializer(serializers.ModelSerializer):
+    situacao = serializers.SerializerMethodField()
+    class Meta:
+        model = FaturaCartao
+        fields = ["id", "competencia", "data_fechamento", "data_vencimento", "valor_total", "valor_pago", "quantidade",
+                  "situacao"]
+    def get_situacao(self, obj):
+        hoje = timezone.localdate()
+        if obj.valor_pago >= obj.valor_total:
+            return "paga"
+        if hoje < obj.data_fechamento:
+            return "aberta"
+        return "vencida" if hoje > obj.data_vencimento else "fechada"
 
 class CompraCartaoSerializer(serializers.ModelSerializer):
     cartao = CartaoCreditoSerializer(read_only=True)
@@ -100,9 +121,29 @@ class CompraCartaoSerializer(serializers.ModelSerializer):
     class Meta:
         model = CompraCartao
         fields = ["id", "casal", "cartao", "cartao_id", "descricao", "subcategoria", "subcategoria_id", "escopo", "dono_pessoal", "dono_pessoal_id",
-                  "valor_total", "parcelas_total", "primeira_competencia", "primeiro_vencimento", "pagador", "pagador_id", "criado_em", "atualizado_em"]
+                  "valor_total", "parcelas_total", "data_compra", "primeira_competencia", "primeiro_vencimento", "pagador", "pagador_id",
+                  "criado_em", "atualizado_em"]
         read_only_fields = ("casal", "criado_em", "atualizado_em")
+        # com data_compra, a 1ª fatura (competência e vencimento) sai do fechamento do cartão
+        extra_kwargs = {"primeira_competencia": {"required": False}, "primeiro_vencimento": {"required": False}}
+    def _primeira_fatura_pela_data(self, data, cartao):
+        """data_compra de onde sai a 1ª fatura, ou None se valem as datas informadas/gravadas."""
+        data_compra = data.get("data_compra", getattr(self.instance, "data_compra", None))
+        if not data_compra:
+            return None
+        # data ou cartão novos mudam a fatura mesmo que o formulário devolva a competência gravada
+        if self.instance is not None and (data_compra != self.instance.data_compra or cartao != self.instance.cartao):
+            return data_compra
+        return data_compra if "data_compra" in data and "primeira_competencia" not in data else None
+
     def validate(self, data):
+        cartao = data.get("cartao", getattr(self.instance, "cartao", None))
+        data_compra = self._primeira_fatura_pela_data(data, cartao)
+        if data_compra:
+            data["primeira_competencia"] = competencia_da_compra(cartao, data_compra)
+            data["primeiro_vencimento"] = datas_da_fatura(cartao, data["primeira_competencia"])[1]
+        elif self.instance is None and not (data.get("primeira_competencia") and data.get("primeiro_vencimento")):
+            raise serializers.ValidationError("Informe data_compra ou primeira_competencia e primeiro_vencimento.")
         escopo = data.get("escopo", getattr(self.instance, "escopo", None))
         dono = data.get("dono_pessoal", getattr(self.instance, "dono_pessoal", None))
         if escopo == EscopoDespesa.PESSOAL and not dono:
@@ -135,6 +176,35 @@ class LancamentoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Lançamentos pessoais exigem dono_pessoal.")
         if escopo == EscopoDespesa.COMPARTILHADA and dono:
             raise serializers.ValidationError("Lançamentos compartilhadas não devem ter dono_pessoal.")
+        despesa = data.get("despesa_modelo", getattr(self.instance, "despesa_modelo", None))
+        competencia = data.get("competencia", getattr(self.instance, "competencia", None))
+        if despesa and competencia:
+            # mesma regra da restrição lanc_modelo_competencia_unico, com erro 400 em vez de IntegrityError
+            repetido = Lancamento.objects.filter(casal_id=despesa.casal_id, despesa_modelo=despesa, competencia=competencia)
+            if self.instance is not None:
+                repetido = repetido.exclude(pk=self.instance.pk)
+            if repetido.exists():
+                raise serializers.ValidationError("Esta despesa modelo já foi lançada nesta competência.")
+        return data
+
+class QuitarSerializer(serializers.Serializer):
+    data_pagamento = serializers.DateField(required=False)
+    pagador_id = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), source="pagador", required=False)
+
+class QuitarLoteSerializer(QuitarSerializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    filtros = serializers.DictField(required=False, help_text="Mesmos filtros da listagem (ex.: competencia, cartao, status).")
+    def validate_filtros(self, value):
+        # o FilterSet ignora chaves desconhecidas: um erro de digitação quitaria o grupo inteiro
+        desconhecidos = sorted(set(value) - set(LancamentoFilter.base_filters))
+        if desconhecidos:
+            raise serializers.ValidationError(f"Filtros desconhecidos: {', '.join(desconhecidos)}.")
+        if not any(v not in (None, "") for v in value.values()):
+            raise serializers.ValidationError("Informe ao menos um filtro com valor.")
+        return value
+    def validate(self, data):
+        if not data.get("ids") and not data.get("filtros"):
+            raise serializers.ValidationError("Informe ids ou filtros.")
         return data
 
 class RegraRateioPadraoSerializer(serializers.ModelSerializer):
@@ -154,10 +224,21 @@ class DespesaModeloSerializer(serializers.ModelSerializer):
     class Meta:
         model = DespesaModelo
         fields = ("id", "casal", "nome", "categoria", "categoria_id", "escopo", "dono_pessoal", "dono_pessoal_id",
-                  "valor_previsto", "dia_vencimento", "recorrente", "periodicidade", "regra_rateio", "ativo", "rateios_padrao",
-                  "criado_em", "atualizado_em")
+                  "valor_previsto", "dia_vencimento", "recorrente", "periodicidade", "regra_rateio", "ativo",
+                  "proxima_competencia", "rateios_padrao", "criado_em", "atualizado_em")
         read_only_fields = ("casal", "criado_em", "atualizado_em")
+    def validate_dia_vencimento(self, value):
+        if not 1 <= value <= 31:
+            raise serializers.ValidationError("Use um dia entre 1 e 31.")
+        return value
     def validate(self, data):
+        if data.get("proxima_competencia"):
+            data["proxima_competencia"] = data["proxima_competencia"].replace(day=1)
+        elif self.instance is not None and "proxima_competencia" not in data and self.instance.proxima_competencia is None:
+            # única já gerada que volta a ser recorrente: reagenda a partir do mês atual
+            periodicidade = data.get("periodicidade", self.instance.periodicidade)
+            if periodicidade != Periodicidade.UNICA and data.get("recorrente", self.instance.recorrente):
+                data["proxima_competencia"] = mes_atual()
         escopo = data.get("escopo", getattr(self.instance, "escopo", None))
         dono = data.get("dono_pessoal", getattr(self.instance, "dono_pessoal", None))
         regra = data.get("regra_rateio", getattr(self.instance, "regra_rateio", RegraRateio.IGUAL))
@@ -194,6 +275,13 @@ class ResumoLancamentoSerializer(serializers.Serializer):
                     'status': 'PARCELADA'}
         return super().to_representation(instance)
 
+class TarefaProcessamentoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TarefaProcessamento
+        fields = ("id", "tipo", "status", "total", "processados", "resultado", "erro",
+                  "iniciada_em", "concluida_em", "criado_em", "atualizado_em")
+        read_only_fields = fields
+
 class ChangePasswordSerializer(serializers.Serializer):
     nova_senha = serializers.CharField(write_only=True, required=True, min_length=6)
     confirmacao_senha = serializers.CharField(write_only=True, required=True)
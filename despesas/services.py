@@ -1,13 +1,22 @@
 from datetime import date
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal, ROUND_DOWN
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import cache_referencia, tarefas
+from .faturas import faturas_do_cartao
+from .resumos import agendar_recalculo
+from .utils import dia_no_mes
 
 from .models import (
     Casal, CompraCartao, MembroCasal, DespesaModelo, Lancamento, RateioLancamento,
-    EscopoDespesa, RegraRateio, StatusLancamento, RegraRateioPadrao, Categoria, Subcategoria
+    EscopoDespesa, Periodicidade, RegraRateio, StatusLancamento, RegraRateioPadrao, Categoria, Subcategoria
 )
 
 User = get_user_model()
@@ -23,21 +32,83 @@ CATEGORIAS_PADRAO = {
     "Compras Pessoais": ["Roupas e Acessórios", "Cosméticos", "Eletrônicos", "Presentes"],
 }
 
+# slugs calculados uma vez, como Categoria.save()/Subcategoria.save() fariam (bulk_create não chama save)
+_SLUGS_PADRAO = {nome: slugify(nome) for cat, subs in CATEGORIAS_PADRAO.items() for nome in (cat, *subs)}
+
+@transaction.atomic
+def criar_categorias_padrao_para_casais(casais) -> int:
+    """
+    Cria as categorias/subcategorias padrão que faltam em vários grupos com dois bulk_create
+    (o SQLite/PostgreSQL devolvem os ids das categorias para ligar as subcategorias).
+    As que o grupo já tem (mesmo nome) são mantidas, então rodar de novo não duplica nada.
+    Retorna quantas categorias foram criadas.
+    """
+    casal_ids = [c.pk if isinstance(c, Casal) else c for c in casais]
+    existentes = {
+        (categoria.casal_id, categoria.nome): categoria
+        for categoria in Categoria.objects.filter(casal_id__in=casal_ids, nome__in=CATEGORIAS_PADRAO)
+        .only("id", "casal_id", "nome").order_by()
+    }
+    subcategorias_existentes = set()
+    if existentes:
+        subcategorias_existentes = set(
+            Subcategoria.objects.filter(categoria__in=existentes.values()).values_list("categoria_id", "nome").order_by()
+        )
+    novas = Categoria.objects.bulk_create([
+        Categoria(casal_id=casal_id, nome=nome, slug=_SLUGS_PADRAO[nome], ativa=True)
+        for casal_id in casal_ids
+        for nome in CATEGORIAS_PADRAO
+        if (casal_id, nome) not in existentes
+    ])
+    Subcategoria.objects.bulk_create([
+        Subcategoria(categoria=categoria, nome=nome, slug=_SLUGS_PADRAO[nome], ativa=True)
+        for categoria in [*existentes.values(), *novas]
+        for nome in CATEGORIAS_PADRAO[categoria.nome]
+        if (categoria.pk, nome) not in subcategorias_existentes
+    ])
+    # bulk_create não dispara signals
+    for casal_id in casal_ids:
+        cache_referencia.invalidar(casal_id, cache_referencia.CATEGORIAS, cache_referencia.SUBCATEGORIAS)
+    return len(novas)
+
 def criar_categorias_padrao_para_casal(casal: Casal):
-    for cat_nome, sub_nomes in CATEGORIAS_PADRAO.items():
-        categoria = Categoria.objects.create(casal=casal, nome=cat_nome, ativa=True)
-        for sub_nome in sub_nomes:
-            Subcategoria.objects.create(categoria=categoria, nome=sub_nome, ativa=True)
+    criar_categorias_padrao_para_casais([casal])
     return True
 
 def _membros_ativos_ids(casal: Casal) -> list[int]:
     return list(MembroCasal.objects.filter(casal=casal, ativo=True).values_list("usuario_id", flat=True))
 
-def _ratear_valor(valor_total: Decimal, regra: str, casal: Casal, despesa: DespesaModelo):
+def _membros_ativos_por_casal(casal_ids) -> dict[int, list[int]]:
+    membros = {casal_id: [] for casal_id in casal_ids}
+    qs = MembroCasal.objects.filter(casal_id__in=casal_ids, ativo=True).order_by("id")
+    for casal_id, usuario_id in qs.values_list("casal_id", "usuario_id"):
+        membros[casal_id].append(usuario_id)
+    return membros
+
+def regras_rateio_por_despesa(despesa_ids) -> dict[int, list[RegraRateioPadrao]]:
+    regras = {}
+    for regra in RegraRateioPadrao.objects.filter(despesa_modelo_id__in=despesa_ids).order_by("id"):
+        regras.setdefault(regra.despesa_modelo_id, []).append(regra)
+    return regras
+
+def _subcategoria_padrao_por_categoria(categoria_ids) -> dict[int, int]:
+    """Primeira subcategoria ativa (por nome) de cada categoria — DespesaModelo só guarda a categoria."""
+    padrao = {}
+    qs = Subcategoria.objects.filter(categoria_id__in=categoria_ids, ativa=True).order_by("categoria_id", "nome", "id")
+    for categoria_id, sub_id in qs.values_list("categoria_id", "id"):
+        padrao.setdefault(categoria_id, sub_id)
+    return padrao
+
+def ratear_valor(valor_total: Decimal, regra: str, casal: Casal, despesa: DespesaModelo, membros=None, regras=None):
+    """
+    Divide valor_total entre os membros. `membros` (ids de usuário ativos) e `regras`
+    (RegraRateioPadrao da despesa) podem vir pré-carregados para evitar consultas por despesa.
+    """
     if despesa.escopo == EscopoDespesa.PESSOAL:
         return [(despesa.dono_pessoal_id, Decimal("100.00"), valor_total)]
 
-    membros = _membros_ativos_ids(casal)
+    if membros is None:
+        membros = _membros_ativos_ids(casal)
     if not membros:
         raise ValidationError("Grupo sem membros ativos para rateio.")
 
@@ -53,8 +124,11 @@ def _ratear_valor(valor_total: Decimal, regra: str, casal: Casal, despesa: Despe
                 valores.append((uid, None, valor_total - acumulado))
         return valores
 
+    if regra in (RegraRateio.PERCENTUAL, RegraRateio.VALOR_FIXO) and regras is None:
+        regras = list(RegraRateioPadrao.objects.filter(despesa_modelo=despesa))
+
     if regra == RegraRateio.PERCENTUAL:
-        linhas = list(RegraRateioPadrao.objects.filter(despesa_modelo=despesa))
+        linhas = regras
         if not linhas:
             raise ValidationError("Defina rateio percentual padrão para a despesa.")
         soma = sum((l.percentual or 0) for l in linhas)
@@ -72,7 +146,7 @@ def _ratear_valor(valor_total: Decimal, regra: str, casal: Casal, despesa: Despe
         return out
 
     if regra == RegraRateio.VALOR_FIXO:
-        linhas = list(RegraRateioPadrao.objects.filter(despesa_modelo=despesa))
+        linhas = regras
         if not linhas:
             raise ValidationError("Defina rateio por valor fixo padrão para a despesa.")
         soma = sum((l.valor_fixo or 0) for l in linhas)
@@ -82,34 +156,215 @@ def _ratear_valor(valor_total: Decimal, regra: str, casal: Casal, despesa: Despe
 
     raise ValidationError("Regra de rateio inválida.")
 
-@transaction.atomic
-def gerar_lancamentos_competencia(casal: Casal, competencia: date, criado_por: User) -> list[Lancamento]:
+def mensagem_erro(exc: ValidationError) -> str:
+    return "; ".join(exc.messages)
+
+def proxima_competencia_apos(dm: DespesaModelo, competencia: date, agendada: date | None = None) -> date | None:
+    """
+    Próximo mês a gerar depois de gerar a despesa em `competencia`; None se ela não se repete.
+    `agendada`: a proxima_competencia antes da geração (padrão: a gravada na despesa).
+    """
+    if dm.periodicidade == Periodicidade.UNICA or not dm.recorrente:
+        return None
+    if dm.periodicidade == Periodicidade.ANUAL:
+        # mantém o mês de aniversário mesmo se a geração atrasar
+        proxima = agendada or dm.proxima_competencia or competencia
+        while proxima <= competencia:
+            proxima += relativedelta(years=1)
+        return proxima
+    return competencia + relativedelta(months=1)
+
+def filtro_despesas_a_gerar(competencia: date) -> Q:
+    """
+    Despesas modelo com algo a gerar ao pedir `competencia`: as vencidas (agenda no mês ou antes,
+    pelo índice despesa_modelo_agenda_idx) e, para refazer um mês passado, as recorrentes que já foram
+    lançadas alguma vez (uma despesa que ainda não começou não entra em meses anteriores à agenda).
+    """
+    return Q(ativo=True) & (
+        Q(proxima_competencia__lte=competencia)
+        | Q(
+            Exists(Lancamento.objects.filter(casal_id=OuterRef("casal_id"), despesa_modelo=OuterRef("pk"))),
+            proxima_competencia__gt=competencia, recorrente=True,
+            periodicidade__in=(Periodicidade.MENSAL, Periodicidade.ANUAL),
+        )
+    )
+
+def competencias_a_gerar(dm: DespesaModelo, competencia: date) -> list[date]:
+    """
+    Meses em que a despesa deve ser lançada ao pedir `competencia`.
+
+    Com a agenda no mês ou antes, todos os meses devidos da agenda até `competencia` (uma geração
+    atrasada não pula meses). Com a agenda já depois do mês (mês passado pedido de novo), só o próprio
+    mês, se for de uma ocorrência da despesa: todo mês para MENSAL, o mês de aniversário para ANUAL.
+    """
+    proxima = dm.proxima_competencia
+    if proxima is None:
+        return []
+    if competencia < proxima:
+        if dm.recorrente and (
+            dm.periodicidade == Periodicidade.MENSAL
+            or (dm.periodicidade == Periodicidade.ANUAL and competencia.month == proxima.month)
+        ):
+            return [competencia]
+        return []
+    meses = []
+    while proxima is not None and proxima <= competencia:
+        meses.append(proxima)
+        proxima = proxima_competencia_apos(dm, proxima, agendada=proxima)
+    return meses
+
+def gerar_lancamentos_competencia_lote(casais, competencia: date, criado_por: User | None = None):
+    """
+    Gera os lançamentos de uma competência para vários grupos de uma vez.
+
+    Entram as despesas modelo de filtro_despesas_a_gerar. Uma despesa vencida é lançada em todos os
+    meses devidos até a competência (competencias_a_gerar) e a agenda avança para depois dela conforme
+    a periodicidade (proxima_competencia_apos). Um mês anterior à agenda pode ser gerado de novo
+    (ex.: lançamento removido ou despesa cadastrada depois do mês) sem mexer na agenda.
+
+    Tudo roda numa transação que começa travando os grupos do lote (select_for_update, em ordem de id;
+    no SQLite o BEGIN IMMEDIATE já serializa as escritas), então gerações simultâneas do mesmo grupo
+    esperam uma pela outra e a segunda encontra a agenda já avançada; workers com lotes diferentes não
+    se bloqueiam. Os lançamentos entram com bulk_create(ignore_conflicts=True) sobre a restrição
+    lanc_modelo_competencia_unico, e só os que de fato entraram (ainda sem rateio) recebem rateios.
+
+    Despesas, membros, regras de rateio, subcategorias e lançamentos já existentes são
+    carregados com um número fixo de consultas por lote; lançamentos e rateios são
+    montados em memória e gravados em lote. Com criado_por=None, o primeiro
+    membro ativo de cada grupo é usado como criador/pagador.
+
+    Retorna (criados, erros): dicts por id do grupo. Um grupo com erro de validação
+    (ex.: rateio mal configurado) fica de fora sem impedir os demais.
+    """
     if competencia.day != 1:
         competencia = competencia.replace(day=1)
-    criados = []
-    despesas = DespesaModelo.objects.filter(casal=casal, ativo=True).select_related("categoria")
-    for dm in despesas:
-        if Lancamento.objects.filter(casal=casal, despesa_modelo=dm, competencia=competencia).exists():
-            continue
-        venc = competencia.replace(day=dm.dia_vencimento)
-        lanc = Lancamento.objects.create(
-            casal=casal,
-            despesa_modelo=dm,
-            subcategoria=None,  # se você usa categoria/subcategoria vinda do modelo, ajuste aqui
-            escopo=dm.escopo,
-            dono_pessoal=dm.dono_pessoal if dm.escopo == dm.EscopoDespesa.PESSOAL else None,
-            descricao=dm.nome,
-            competencia=competencia,
-            data_vencimento=venc,
-            valor_total=dm.valor_previsto,
-            status=StatusLancamento.PENDENTE,
-            pagador=criado_por,
-            criado_por=criado_por,
+    casal_ids = [c.pk if isinstance(c, Casal) else c for c in casais]
+    criados = {casal_id: [] for casal_id in casal_ids}
+    erros = {}
+    if not casal_ids:
+        return criados, erros
+
+    with transaction.atomic():
+        list(Casal.objects.select_for_update().filter(pk__in=casal_ids).order_by("pk").values_list("pk", flat=True))
+        despesas = list(
+            DespesaModelo.objects.filter(filtro_despesas_a_gerar(competencia), casal_id__in=casal_ids)
+            .select_related("categoria")
+            .order_by("casal_id", "id")
         )
-        for uid, perc, v in _ratear_valor(dm.valor_previsto, dm.regra_rateio, casal, dm):
-            RateioLancamento.objects.create(lancamento=lanc, membro_id=uid, percentual=perc, valor=v)
-        criados.append(lanc)
-    return criados
+        meses = {dm.id: competencias_a_gerar(dm, competencia) for dm in despesas}
+        despesas = [dm for dm in despesas if meses[dm.id]]
+        if not despesas:
+            return criados, erros
+        existentes = set(
+            Lancamento.objects.filter(
+                casal_id__in=casal_ids, despesa_modelo__in=despesas,
+                competencia__in={mes for dm in despesas for mes in meses[dm.id]},
+            )
+            .values_list("casal_id", "despesa_modelo_id", "competencia")
+        )
+        membros = _membros_ativos_por_casal(casal_ids)
+        regras = regras_rateio_por_despesa([dm.id for dm in despesas])
+        subcategorias = _subcategoria_padrao_por_categoria({dm.categoria_id for dm in despesas})
+
+        por_casal = {}
+        for dm in despesas:
+            por_casal.setdefault(dm.casal_id, []).append(dm)
+
+        pendentes = {}  # (casal, despesa, competência) -> (lancamento, partes do rateio)
+        agendadas = []  # despesas cuja proxima_competencia avança
+        for casal_id, despesas_casal in por_casal.items():
+            membros_casal = membros.get(casal_id, [])
+            autor_id = criado_por.pk if criado_por is not None else (membros_casal[0] if membros_casal else None)
+            try:
+                linhas = {}
+                for dm in despesas_casal:
+                    a_lancar = [mes for mes in meses[dm.id] if (casal_id, dm.id, mes) not in existentes]
+                    if not a_lancar:
+                        continue  # já lançada: só avança a agenda
+                    if autor_id is None:
+                        raise ValidationError("Grupo sem membros ativos para rateio.")
+                    sub_id = subcategorias.get(dm.categoria_id)
+                    if sub_id is None:
+                        raise ValidationError(f"Categoria '{dm.categoria.nome}' não possui subcategorias ativas.")
+                    partes = ratear_valor(
+                        dm.valor_previsto, dm.regra_rateio, None, dm,
+                        membros=membros_casal, regras=regras.get(dm.id, []),
+                    )
+                    for mes in a_lancar:
+                        lanc = Lancamento(
+                            casal_id=casal_id,
+                            despesa_modelo=dm,
+                            subcategoria_id=sub_id,
+                            escopo=dm.escopo,
+                            dono_pessoal_id=dm.dono_pessoal_id if dm.escopo == EscopoDespesa.PESSOAL else None,
+                            descricao=dm.nome,
+                            competencia=mes,
+                            data_vencimento=dia_no_mes(mes, dm.dia_vencimento),
+                            valor_total=dm.valor_previsto,
+                            status=StatusLancamento.PENDENTE,
+                            pagador_id=autor_id,
+                            criado_por_id=autor_id,
+                        )
+                        linhas[(casal_id, dm.id, mes)] = (lanc, partes)
+            except ValidationError as exc:
+                erros[casal_id] = mensagem_erro(exc)
+                continue
+            pendentes.update(linhas)
+            # mês passado pedido de novo não mexe na agenda
+            agendadas.extend(dm for dm in despesas_casal if dm.proxima_competencia <= competencia)
+
+        if not agendadas and not pendentes:
+            return criados, erros
+
+        inseridos = []
+        if pendentes:
+            Lancamento.objects.bulk_create(
+                [lanc for lanc, _ in pendentes.values()], batch_size=500, ignore_conflicts=True
+            )
+            # ignore_conflicts não devolve ids: relê os lançamentos dos meses que ainda não têm rateio
+            novos = (
+                Lancamento.objects.filter(
+                    casal_id__in=casal_ids, competencia__in={mes for _, _, mes in pendentes},
+                    despesa_modelo_id__in={dm_id for _, dm_id, _ in pendentes}, rateios__isnull=True,
+                )
+                .values_list("casal_id", "despesa_modelo_id", "competencia", "pk")
+            )
+            for casal_id, dm_id, mes, pk in novos:
+                if (casal_id, dm_id, mes) not in pendentes:
+                    continue  # lançamento anterior sem rateio, não é desta geração
+                lanc, partes = pendentes[(casal_id, dm_id, mes)]
+                lanc.pk = pk
+                lanc._state.adding, lanc._state.db = False, Lancamento.objects.db
+                inseridos.append((lanc, partes))
+            RateioLancamento.objects.bulk_create(
+                [
+                    RateioLancamento(lancamento=lanc, membro_id=uid, percentual=perc, valor=v)
+                    for lanc, partes in inseridos
+                    for uid, perc, v in partes
+                ],
+                batch_size=500,
+            )
+        agora = timezone.now()
+        for dm in agendadas:
+            dm.proxima_competencia = proxima_competencia_apos(dm, competencia)
+            dm.atualizado_em = agora
+        DespesaModelo.objects.bulk_update(agendadas, ["proxima_competencia", "atualizado_em"], batch_size=500)
+
+        for lanc, _ in inseridos:
+            criados[lanc.casal_id].append(lanc)
+        for casal_id in {dm.casal_id for dm in agendadas} | {lanc.casal_id for lanc, _ in inseridos}:
+            if criados[casal_id]:
+                agendar_recalculo(casal_id, {lanc.competencia for lanc in criados[casal_id]})
+            else:
+                # sem lançamento novo não há recálculo; a projeção depende da agenda
+                cache_referencia.invalidar(casal_id, cache_referencia.PROJECAO)
+    return criados, erros
+
+def gerar_lancamentos_competencia(casal: Casal, competencia: date, criado_por: User) -> list[Lancamento]:
+    criados, erros = gerar_lancamentos_competencia_lote([casal], competencia, criado_por=criado_por)
+    if casal.pk in erros:
+        raise ValidationError(erros[casal.pk])
+    return criados[casal.pk]
 
 @transaction.atomic
 def quitar_lancamento(lancamento: Lancamento, data_pagamento=None, pagador: User | None = None) -> Lancamento:
@@ -119,7 +374,6 @@ def quitar_lancamento(lancamento: Lancamento, data_pagamento=None, pagador: User
     if data_pagamento:
         lancamento.data_pagamento = data_pagamento
     else:
-        from django.utils import timezone
         lancamento.data_pagamento = timezone.localdate()
     if pagador:
         lancamento.pagador = pagador
@@ -127,59 +381,205 @@ def quitar_lancamento(lancamento: Lancamento, data_pagamento=None, pagador: User
     return lancamento
 
 @transaction.atomic
-def criar_rateios_para_lancamento(lancamento: Lancamento):
-    lancamento.rateios.all().delete()
-    casal = lancamento.casal
-    valor_total = lancamento.valor_total
+def quitar_lancamentos_lote(queryset, data_pagamento=None, pagador: User | None = None) -> int:
+    """
+    Quita de uma vez os lançamentos PENDENTES do queryset, com um único UPDATE (sem signals).
+    Os meses afetados são agendados para recálculo do ResumoMensal/saldos. Retorna quantos foram quitados.
+    """
+    linhas = list(
+        queryset.filter(status=StatusLancamento.PENDENTE).select_for_update()
+        .order_by().values_list("id", "casal_id", "competencia")
+    )
+    if not linhas:
+        return 0
+    campos = {
+        "status": StatusLancamento.PAGO,
+        "data_pagamento": data_pagamento or timezone.localdate(),
+        "atualizado_em": timezone.now(),
+    }
+    if pagador:
+        campos["pagador"] = pagador
+    quitados = Lancamento.objects.filter(id__in=[id_ for id_, _, _ in linhas]).update(**campos)
+    por_casal = {}
+    for _, casal_id, competencia in linhas:
+        por_casal.setdefault(casal_id, set()).add(competencia)
+    for casal_id, competencias in por_casal.items():
+        agendar_recalculo(casal_id, competencias)
+    return quitados
+
+def dividir_em_partes(valor_total: Decimal, quantidade: int) -> list[Decimal]:
+    """Divide em partes arredondadas para baixo (centavos); a sobra fica na última parte."""
+    valor_base = (valor_total / quantidade).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
+    partes = [valor_base] * quantidade
+    diferenca = valor_total - sum(partes)
+    if diferenca > 0:
+        partes[-1] += diferenca
+    return partes
+
+def rateios_do_lancamento(lancamento: Lancamento, membros_ids: list[int] | None) -> list[RateioLancamento]:
+    """Monta (sem gravar) os rateios de um lançamento; membros_ids só é usado se compartilhado."""
     if lancamento.escopo == EscopoDespesa.PESSOAL:
-        if not lancamento.dono_pessoal:
+        if not lancamento.dono_pessoal_id:
             raise ValidationError("Lançamento pessoal precisa de um dono.")
-        RateioLancamento.objects.create(lancamento=lancamento, membro=lancamento.dono_pessoal, valor=valor_total)
-        return
+        return [RateioLancamento(lancamento=lancamento, membro_id=lancamento.dono_pessoal_id, valor=lancamento.valor_total)]
     if lancamento.escopo == EscopoDespesa.COMPARTILHADA:
-        membros_ids = _membros_ativos_ids(casal)
         if not membros_ids:
             raise ValidationError("Grupo sem membros ativos para rateio.")
-        num_membros = len(membros_ids)
-        valor_base = (valor_total / num_membros).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
-        valores_rateio = [valor_base] * num_membros
-        soma_arredondada = sum(valores_rateio)
-        diferenca = valor_total - soma_arredondada
-        if diferenca > 0:
-            valores_rateio[-1] += diferenca
-        for i, membro_id in enumerate(membros_ids):
-            RateioLancamento.objects.create(lancamento=lancamento, membro_id=membro_id, valor=valores_rateio[i])
+        valores = dividir_em_partes(lancamento.valor_total, len(membros_ids))
+        return [
+            RateioLancamento(lancamento=lancamento, membro_id=membro_id, valor=valor)
+            for membro_id, valor in zip(membros_ids, valores)
+        ]
+    return []
 
 @transaction.atomic
-def gerar_lancamentos_da_compra(compra: "CompraCartao", criado_por):
-    valor_total_compra = compra.valor_total
+def criar_rateios_para_lancamento(lancamento: Lancamento):
+    lancamento.rateios.all().delete()
+    membros_ids = None
+    if lancamento.escopo == EscopoDespesa.COMPARTILHADA:
+        membros_ids = _membros_ativos_ids(lancamento.casal)
+    RateioLancamento.objects.bulk_create(rateios_do_lancamento(lancamento, membros_ids))
+    agendar_recalculo(lancamento.casal_id, [lancamento.competencia])
+
+def _planejar_parcelas(compra: "CompraCartao", criado_por, faturas: dict) -> list[Lancamento]:
+    """Parcelas (não gravadas) da compra com os dados atuais, uma por número de parcela."""
     total_parcelas = compra.parcelas_total
-    valor_parcela_padrao = (valor_total_compra / total_parcelas).quantize(Decimal("0.01"), rounding=ROUND_DOWN)
-    valores_parcelas = [valor_parcela_padrao] * total_parcelas
-    diferenca = valor_total_compra - sum(valores_parcelas)
-    if diferenca > 0:
-        valores_parcelas[-1] += diferenca
+    valores_parcelas = dividir_em_partes(compra.valor_total, total_parcelas)
+    parcelas = []
     competencia = compra.primeira_competencia
     venc = compra.primeiro_vencimento
     for i in range(total_parcelas):
-        lanc = Lancamento.objects.create(
-            casal=compra.casal,
+        fatura = faturas[competencia.replace(day=1)]
+        if compra.data_compra:
+            # compra com data: cada parcela vence com a sua fatura
+            venc = fatura.data_vencimento
+        parcelas.append(Lancamento(
+            casal_id=compra.casal_id,
             despesa_modelo=None,
-            subcategoria=compra.subcategoria,
+            subcategoria_id=compra.subcategoria_id,
             escopo=compra.escopo,
-            dono_pessoal=compra.dono_pessoal,
+            dono_pessoal_id=compra.dono_pessoal_id,
             descricao=f"{compra.descricao or 'Compra no cartão'} ({i + 1}/{total_parcelas})",
             competencia=competencia,
             data_vencimento=venc,
             valor_total=valores_parcelas[i],
             status=StatusLancamento.PENDENTE,
             data_pagamento=None,
-            pagador=compra.pagador,
+            pagador_id=compra.pagador_id,
             criado_por=criado_por,
             compra_cartao=compra,
+            fatura=fatura,
             parcela_numero=i + 1,
             parcelas_total=total_parcelas,
-        )
-        criar_rateios_para_lancamento(lanc)
+        ))
         competencia = (competencia + relativedelta(months=+1)).replace(day=1)
         venc = venc + relativedelta(months=+1)
+    return parcelas
+
+
+def _faturas_da_compra(compra: "CompraCartao") -> dict:
+    primeira = compra.primeira_competencia.replace(day=1)
+    return faturas_do_cartao(compra.cartao, [primeira + relativedelta(months=i) for i in range(compra.parcelas_total)])
+
+
+def _membros_da_compra(compra: "CompraCartao"):
+    if compra.escopo == EscopoDespesa.COMPARTILHADA:
+        return _membros_ativos_por_casal([compra.casal_id])[compra.casal_id]
+    return None
+
+
+@transaction.atomic
+def gerar_lancamentos_da_compra(compra: "CompraCartao", criado_por) -> list[Lancamento]:
+    """
+    Gera as parcelas (Lançamentos) da compra e seus rateios em lote: uma consulta de membros,
+    duas para garantir as faturas do cartão, um bulk_create de parcelas e outro de rateios.
+    A sobra do arredondamento fica na última parcela e, dentro de cada parcela, no último membro.
+    """
+    membros_ids = _membros_da_compra(compra)
+    parcelas = _planejar_parcelas(compra, criado_por, _faturas_da_compra(compra))
+    rateios = [r for lanc in parcelas for r in rateios_do_lancamento(lanc, membros_ids)]
+    Lancamento.objects.bulk_create(parcelas, batch_size=500)
+    RateioLancamento.objects.bulk_create(rateios, batch_size=500)
+    agendar_recalculo(compra.casal_id, [p.competencia for p in parcelas])
+    return parcelas
+
+# campos que a compra define em cada parcela; status/pagamento/criado_por são da parcela
+CAMPOS_DA_PARCELA = (
+    "subcategoria", "escopo", "dono_pessoal", "descricao", "competencia", "data_vencimento", "valor_total",
+    "fatura", "parcelas_total",
+)
+# atributos a copiar do planejado: o id das FKs, sem carregar o objeto relacionado a cada parcela
+_ATRIBUTOS_DA_PARCELA = tuple(Lancamento._meta.get_field(campo).attname for campo in CAMPOS_DA_PARCELA)
+
+@transaction.atomic
+def sincronizar_parcelas_da_compra(compra: CompraCartao, criado_por) -> list[Lancamento]:
+    """
+    Ajusta as parcelas da compra aos dados atuais (após criar ou editar), casando pelo número da parcela:
+    as existentes são atualizadas no lugar (mesmo id; status, pagamento e, nas já quitadas, o pagador
+    são mantidos), as que faltam são criadas e as que sobram (menos parcelas) são removidas.
+    Os rateios das parcelas são refeitos.
+    """
+    membros_ids = _membros_da_compra(compra)
+    planejadas = _planejar_parcelas(compra, criado_por, _faturas_da_compra(compra))
+    existentes = {}
+    sobras = []
+    for lanc in compra.parcelas.order_by("parcela_numero", "id"):
+        if lanc.parcela_numero in existentes or not 1 <= (lanc.parcela_numero or 0) <= len(planejadas):
+            sobras.append(lanc)
+        else:
+            existentes[lanc.parcela_numero] = lanc
+    competencias = [lanc.competencia for lanc in [*existentes.values(), *sobras]]
+
+    agora = timezone.now()
+    parcelas, novas, alteradas = [], [], []
+    for plano in planejadas:
+        lanc = existentes.get(plano.parcela_numero)
+        if lanc is None:
+            novas.append(plano)
+            parcelas.append(plano)
+            continue
+        for campo in _ATRIBUTOS_DA_PARCELA:
+            setattr(lanc, campo, getattr(plano, campo))
+        if lanc.status == StatusLancamento.PENDENTE:
+            lanc.pagador_id = plano.pagador_id
+        lanc.atualizado_em = agora
+        alteradas.append(lanc)
+        parcelas.append(lanc)
+
+    if sobras:
+        Lancamento.objects.filter(id__in=[lanc.id for lanc in sobras]).delete()
+    if alteradas:
+        Lancamento.objects.bulk_update(alteradas, [*CAMPOS_DA_PARCELA, "pagador", "atualizado_em"], batch_size=500)
+        RateioLancamento.objects.filter(lancamento__in=alteradas).delete()
+    Lancamento.objects.bulk_create(novas, batch_size=500)
+    RateioLancamento.objects.bulk_create(
+        [r for lanc in parcelas for r in rateios_do_lancamento(lanc, membros_ids)], batch_size=500
+    )
+    agendar_recalculo(compra.casal_id, competencias + [p.competencia for p in parcelas])
+    return parcelas
+
+@transaction.atomic
+def remover_compra_cartao(compra: CompraCartao) -> None:
+    # parcelas usam SET_NULL na compra; removemos explicitamente para não deixar órfãs
+    compra.parcelas.all().delete()
+    compra.delete()
+
+@tarefas.registrar("sincronizar_parcelas_compra")
+def _tarefa_sincronizar_parcelas(tarefa, compra_id: int):
+    compra = CompraCartao.objects.filter(id=compra_id, casal_id=tarefa.casal_id).first()
+    if compra is None:
+        return {"parcelas": 0, "detail": "Compra removida antes do processamento."}
+    parcelas = sincronizar_parcelas_da_compra(compra, tarefa.criado_por or compra.pagador)
+    tarefas.atualizar_progresso(tarefa, len(parcelas), total=len(parcelas))
+    return {"parcelas": len(parcelas)}
+
+def agendar_sincronizacao_parcelas(compra: CompraCartao, criado_por):
+    """
+    Mantém as parcelas da compra em dia. Planos curtos são gerados na hora (retorna None);
+    planos acima de settings.DESPESAS_PARCELAS_LIMITE_SINCRONO viram uma TarefaProcessamento.
+    """
+    limite = getattr(settings, "DESPESAS_PARCELAS_LIMITE_SINCRONO", 12)
+    if compra.parcelas_total <= limite:
+        sincronizar_parcelas_da_compra(compra, criado_por)
+        return None
+    return tarefas.enfileirar(compra.casal, "sincronizar_parcelas_compra", criado_por=criado_por, compra_id=compra.id)
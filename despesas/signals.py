@@ -0,0 +1,214 @@
+# despesas/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import cache_referencia
+from .autenticacao import trocar_versao_vinculos
+from .faturas import atualizar_datas_das_faturas, faturas_do_cartao
+from .models import (
+    Casal, Categoria, Subcategoria, CartaoCredito, MembroCasal, PreferenciasUsuario, Lancamento, RateioLancamento,
+    DespesaModelo, RegraRateioPadrao,
+)
+from .resumos import agendar_recalculo, inicio_do_mes, trocar_versao_lancamentos
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=Lancamento)
+def _lancamento_guardar_chave_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Se grupo/competência mudarem, o mês antigo também precisa ser recalculado.
+    instance._chave_resumo_anterior = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {"casal", "competencia"} & set(update_fields):
+        instance._chave_resumo_anterior = (instance.casal_id, instance.competencia)
+        return
+    instance._chave_resumo_anterior = (
+        Lancamento.objects.filter(pk=instance.pk).values_list("casal_id", "competencia").first()
+    )
+
+
+@receiver(pre_save, sender=Lancamento)
+def _parcela_acompanha_fatura(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Parcela de cartão que muda de mês passa para a fatura do novo mês (roda depois do receiver acima).
+    if raw or instance.compra_cartao_id is None:
+        return
+    if update_fields is not None and "fatura" not in update_fields:
+        return
+    anterior = instance._chave_resumo_anterior
+    if instance.fatura_id is not None and (
+        instance.pk is None or (anterior and inicio_do_mes(anterior[1]) == inicio_do_mes(instance.competencia))
+    ):
+        return
+    cartao = CartaoCredito.objects.filter(compras=instance.compra_cartao_id).first()
+    if cartao is not None:
+        competencia = inicio_do_mes(instance.competencia)
+        instance.fatura = faturas_do_cartao(cartao, [competencia])[competencia]
+
+
+@receiver(post_save, sender=Lancamento)
+def _lancamento_salvo(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, "_chave_resumo_anterior", None)
+    if anterior and anterior[0] != instance.casal_id:
+        agendar_recalculo(anterior[0], [anterior[1]])
+        anterior = None
+    agendar_recalculo(instance.casal_id, [instance.competencia, anterior and anterior[1]])
+
+
+@receiver(post_delete, sender=Lancamento)
+def _lancamento_removido(sender, instance, **kwargs):
+    agendar_recalculo(instance.casal_id, [instance.competencia])
+
+
+@receiver(post_save, sender=RateioLancamento)
+@receiver(post_delete, sender=RateioLancamento)
+def _rateio_alterado(sender, instance, raw=False, origin=None, **kwargs):
+    if raw:
+        return
+    # Em cascata (remoção do lançamento/grupo), o post_delete do próprio lançamento já agenda o mês.
+    if isinstance(origin, (Lancamento, Casal)) or getattr(origin, "model", None) in (Lancamento, Casal):
+        return
+    lancamento = instance._state.fields_cache.get("lancamento")
+    if lancamento is not None:
+        chave = (lancamento.casal_id, lancamento.competencia)
+    else:
+        chave = Lancamento.objects.filter(pk=instance.lancamento_id).values_list("casal_id", "competencia").first()
+    if chave:
+        agendar_recalculo(chave[0], [chave[1]])
+
+
+# --- Cache de dados de referência (despesas.cache_referencia) ---
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def _categoria_alterada(sender, instance, created=False, **kwargs):
+    # subcategorias trazem a categoria aninhada
+    cache_referencia.invalidar(instance.casal_id, cache_referencia.CATEGORIAS, cache_referencia.SUBCATEGORIAS)
+    if not created:
+        trocar_versao_lancamentos(instance.casal_id)  # lançamentos também trazem a categoria
+
+
+@receiver(post_save, sender=Subcategoria)
+@receiver(post_delete, sender=Subcategoria)
+def _subcategoria_alterada(sender, instance, created=False, origin=None, **kwargs):
+    if isinstance(origin, Categoria):
+        return  # a remoção da categoria já invalida
+    categoria = instance._state.fields_cache.get("categoria")
+    if categoria is not None:
+        casal_id = categoria.casal_id
+    else:
+        casal_id = Categoria.objects.filter(pk=instance.categoria_id).values_list("casal_id", flat=True).first()
+    cache_referencia.invalidar(casal_id, cache_referencia.SUBCATEGORIAS)
+    if not created and casal_id is not None:
+        trocar_versao_lancamentos(casal_id)
+
+
+@receiver(post_save, sender=CartaoCredito)
+@receiver(post_delete, sender=CartaoCredito)
+def _cartao_alterado(sender, instance, **kwargs):
+    cache_referencia.invalidar(instance.casal_id, cache_referencia.CARTOES)
+
+
+# --- Faturas dos cartões (despesas.faturas) ---
+
+@receiver(pre_save, sender=CartaoCredito)
+def _cartao_guardar_dias_anteriores(sender, instance, raw=False, **kwargs):
+    instance._dias_anteriores = None
+    if not raw and instance.pk is not None:
+        instance._dias_anteriores = (
+            CartaoCredito.objects.filter(pk=instance.pk).values_list("dia_fechamento", "dia_vencimento").first()
+        )
+
+
+@receiver(post_save, sender=CartaoCredito)
+def _cartao_salvo(sender, instance, raw=False, **kwargs):
+    anterior = getattr(instance, "_dias_anteriores", None)
+    if not raw and anterior and anterior != (instance.dia_fechamento, instance.dia_vencimento):
+        atualizar_datas_das_faturas(instance)
+
+
+@receiver(post_save, sender=MembroCasal)
+@receiver(post_delete, sender=MembroCasal)
+def _membro_alterado(sender, instance, **kwargs):
+    # a projeção usa salário e apelido dos membros
+    cache_referencia.invalidar(instance.casal_id, cache_referencia.MEMBROS, cache_referencia.PROJECAO)
+
+
+@receiver(post_save, sender=User)
+def _usuario_alterado(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # nome/e-mail aparecem na listagem de membros de cada grupo do usuário; login só muda last_login
+    if created or raw or (update_fields is not None and set(update_fields) <= {"last_login"}):
+        return
+    for casal_id in MembroCasal.objects.filter(usuario=instance).values_list("casal_id", flat=True):
+        cache_referencia.invalidar(casal_id, cache_referencia.MEMBROS, cache_referencia.PROJECAO)
+
+
+@receiver(post_save, sender=DespesaModelo)
+@receiver(post_delete, sender=DespesaModelo)
+def _despesa_modelo_alterada(sender, instance, **kwargs):
+    cache_referencia.invalidar(instance.casal_id, cache_referencia.PROJECAO)
+
+
+@receiver(post_save, sender=RegraRateioPadrao)
+@receiver(post_delete, sender=RegraRateioPadrao)
+def _rateio_padrao_alterado(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, DespesaModelo):
+        return  # a remoção da despesa já invalida
+    despesa = instance._state.fields_cache.get("despesa_modelo")
+    if despesa is not None:
+        casal_id = despesa.casal_id
+    else:
+        casal_id = DespesaModelo.objects.filter(pk=instance.despesa_modelo_id).values_list("casal_id", flat=True).first()
+    cache_referencia.invalidar(casal_id, cache_referencia.PROJECAO)
+
+
+# --- Versão dos vínculos dos tokens (despesas.autenticacao) ---
+
+_CAMPOS_DO_VINCULO = ("casal_id", "usuario_id", "ativo")
+
+
+@receiver(pre_save, sender=MembroCasal)
+def _participacao_guardar_vinculo_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Só grupo, usuário e `ativo` entram no token; apelido/salário não invalidam o acesso.
+    instance._vinculo_anterior = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not {"casal", "usuario", "ativo"} & set(update_fields):
+        instance._vinculo_anterior = tuple(getattr(instance, campo) for campo in _CAMPOS_DO_VINCULO)
+        return
+    instance._vinculo_anterior = (
+        MembroCasal.objects.filter(pk=instance.pk).values_list(*_CAMPOS_DO_VINCULO).first()
+    )
+
+
+@receiver(post_save, sender=MembroCasal)
+def _participacao_salva(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, "_vinculo_anterior", None)
+    if created or anterior is None:
+        trocar_versao_vinculos(instance.usuario_id)
+    elif anterior != tuple(getattr(instance, campo) for campo in _CAMPOS_DO_VINCULO):
+        trocar_versao_vinculos(*{anterior[1], instance.usuario_id})
+
+
+@receiver(post_delete, sender=MembroCasal)
+def _participacao_removida(sender, instance, **kwargs):
+    trocar_versao_vinculos(instance.usuario_id)
+
+
+@receiver(post_save, sender=PreferenciasUsuario)
+def _grupo_atual_alterado(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw or created:
+        return
+    if update_fields is None or "grupo_atual" in update_fields:
+        trocar_versao_vinculos(instance.usuario_id)
+
+
+@receiver(post_save, sender=User)
+def _usuario_desativado(sender, instance, created=False, raw=False, **kwargs):
+    if not (created or raw) and not instance.is_active:
+        trocar_versao_vinculos(instance.pk)
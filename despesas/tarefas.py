@@ -0,0 +1,120 @@
+# despesas/tarefas.py
+"""
+Fila simples de tarefas em segundo plano, persistida em TarefaProcessamento.
+
+Modos (settings.DESPESAS_TAREFAS_MODO):
+- "thread"   (padrão): executa num ThreadPoolExecutor local após o commit da transação.
+- "fila":     só grava a tarefa; `manage.py executar_tarefas` consome as pendentes.
+- "sincrono": executa na hora, dentro da própria request (útil em testes).
+
+Arquivos enviados com a tarefa ficam no banco (TarefaProcessamento.anexo), não no disco de quem
+recebeu a request: no modo "fila" o worker pode estar em outro host.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import TarefaProcessamento, StatusTarefa
+
+logger = logging.getLogger(__name__)
+
+_HANDLERS = {}
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def registrar(tipo: str):
+    """Decorator: registra a função que processa tarefas do `tipo` informado."""
+    def decorator(func):
+        _HANDLERS[tipo] = func
+        return func
+    return decorator
+
+
+def _modo() -> str:
+    return getattr(settings, "DESPESAS_TAREFAS_MODO", "thread")
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "DESPESAS_TAREFAS_MAX_WORKERS", 2),
+                thread_name_prefix="despesas-tarefas",
+            )
+        return _executor
+
+
+def _executar_em_thread(tarefa_id: int) -> None:
+    try:
+        executar(tarefa_id)
+    finally:
+        connection.close()
+
+
+def enfileirar(casal, tipo: str, criado_por=None, anexo: bytes | None = None, **parametros) -> TarefaProcessamento:
+    if tipo not in _HANDLERS:
+        raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+    tarefa = TarefaProcessamento.objects.create(
+        casal=casal,
+        criado_por=criado_por,
+        tipo=tipo,
+        parametros=parametros,
+        anexo=anexo,
+    )
+    tarefa.anexo = None  # não fica em memória; o handler lê com ler_anexo
+    modo = _modo()
+    if modo == "sincrono":
+        executar(tarefa.id)
+        tarefa.refresh_from_db()
+    elif modo == "thread":
+        transaction.on_commit(lambda: _get_executor().submit(_executar_em_thread, tarefa.id))
+    return tarefa
+
+
+def executar(tarefa_id: int) -> bool:
+    """
+    Executa uma tarefa pendente. A transição PENDENTE -> EXECUTANDO é um UPDATE condicional,
+    então dois workers nunca processam a mesma tarefa. Retorna False se outro já a pegou.
+    """
+    agora = timezone.now()
+    pegou = TarefaProcessamento.objects.filter(id=tarefa_id, status=StatusTarefa.PENDENTE).update(
+        status=StatusTarefa.EXECUTANDO, iniciada_em=agora, atualizado_em=agora
+    )
+    if not pegou:
+        return False
+    tarefa = TarefaProcessamento.objects.defer("anexo").get(id=tarefa_id)
+    try:
+        resultado = _HANDLERS[tarefa.tipo](tarefa, **tarefa.parametros)
+    except Exception as exc:
+        logger.exception("Falha na tarefa %s", tarefa_id)
+        tarefa.status = StatusTarefa.ERRO
+        tarefa.erro = str(exc)
+    else:
+        tarefa.status = StatusTarefa.CONCLUIDA
+        if resultado is not None:
+            tarefa.resultado = resultado
+    tarefa.concluida_em = timezone.now()
+    tarefa.anexo = None
+    tarefa.save(update_fields=["status", "erro", "resultado", "anexo", "concluida_em", "atualizado_em"])
+    return True
+
+
+def ler_anexo(tarefa: TarefaProcessamento) -> bytes:
+    """Conteúdo do arquivo enviado com a tarefa (vazio se não houver)."""
+    anexo = TarefaProcessamento.objects.filter(pk=tarefa.pk).values_list("anexo", flat=True).first()
+    return bytes(anexo or b"")
+
+
+def atualizar_progresso(tarefa: TarefaProcessamento, processados: int, total: int | None = None) -> None:
+    tarefa.processados = processados
+    campos = ["processados", "atualizado_em"]
+    if total is not None:
+        tarefa.total = total
+        campos.append("total")
+    tarefa.save(update_fields=campos)
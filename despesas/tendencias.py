@@ -0,0 +1,103 @@
+# despesas/tendencias.py
+"""
+Tendência dos gastos do grupo nos últimos meses, lida de ResumoMensal com o mesmo critério do
+relatório financeiro "geral" (valor_pago): o total de cada mês bate com /api/relatorio-financeiro/
+?competencia=YYYY-MM.
+
+- competencias: total do mês e variação (%) sobre o mês anterior;
+- categorias: cada categoria mês a mês, da que mais gastou para a que menos gastou;
+- membros: por membro ativo, o que pagou e a parte dele nos rateios, mês a mês.
+
+São três consultas independentes qualquer que seja a janela; sob ASGI rodam em paralelo
+(despesas.paralelo).
+"""
+from datetime import date
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Sum
+
+from .models import MembroCasal, ResumoMensal
+from .paralelo import coletar
+
+ZERO = Decimal("0.00")
+MAXIMO_MESES = 36
+
+
+def _variacao(atual: Decimal, anterior: Decimal | None):
+    if not anterior:
+        return None
+    return round(float((atual - anterior) / anterior * 100), 1)
+
+
+def calcular_tendencias(casal_id: int, fim: date, meses: int, paralelo: bool = False) -> dict:
+    fim = fim.replace(day=1)
+    janela = [fim - relativedelta(months=meses - 1 - i) for i in range(meses)]
+    posicao = {mes: i for i, mes in enumerate(janela)}
+    base = ResumoMensal.objects.filter(casal_id=casal_id, competencia__gte=janela[0], competencia__lte=fim)
+
+    dados = coletar({
+        "categorias": lambda: list(
+            base.exclude(valor_pago=0)
+            .values("competencia", "categoria_id", "categoria__nome")
+            .annotate(total=Sum("valor_pago"))
+            .order_by()
+        ),
+        "por_membro": lambda: list(
+            base.values("competencia", "membro_id")
+            .annotate(pago=Sum("valor_pago"), parte=Sum("valor_rateado"))
+            .order_by()
+        ),
+        "membros": lambda: list(
+            MembroCasal.objects.filter(casal_id=casal_id, ativo=True).select_related("usuario").order_by("id")
+        ),
+    }, paralelo)
+
+    totais = [ZERO] * meses
+    categorias = {}
+    for linha in dados["categorias"]:
+        i = posicao[linha["competencia"]]
+        categoria = categorias.setdefault(
+            linha["categoria_id"], {"id": linha["categoria_id"], "nome": linha["categoria__nome"], "valores": [ZERO] * meses}
+        )
+        categoria["valores"][i] += linha["total"]
+        totais[i] += linha["total"]
+
+    membros = {
+        m.usuario_id: {
+            "id": m.usuario_id,
+            "apelido": m.apelido or m.usuario.first_name or m.usuario.username,
+            "pago": [ZERO] * meses,
+            "parte": [ZERO] * meses,
+        }
+        for m in dados["membros"]
+    }
+    for linha in dados["por_membro"]:
+        membro = membros.get(linha["membro_id"])
+        if membro is not None:
+            i = posicao[linha["competencia"]]
+            membro["pago"][i] += linha["pago"]
+            membro["parte"][i] += linha["parte"]
+
+    return {
+        "inicio": f"{janela[0]:%Y-%m}",
+        "fim": f"{fim:%Y-%m}",
+        "meses": meses,
+        "media_mensal": float(sum(totais, ZERO) / meses),
+        "competencias": [
+            {
+                "competencia": f"{mes:%Y-%m}",
+                "total": float(totais[i]),
+                "variacao": _variacao(totais[i], totais[i - 1] if i else None),
+            }
+            for i, mes in enumerate(janela)
+        ],
+        "categorias": [
+            {**c, "total": float(sum(c["valores"], ZERO)), "valores": [float(v) for v in c["valores"]]}
+            for c in sorted(categorias.values(), key=lambda c: (-sum(c["valores"], ZERO), c["nome"]))
+        ],
+        "membros": [
+            {**m, "pago": [float(v) for v in m["pago"]], "parte": [float(v) for v in m["parte"]]}
+            for m in membros.values()
+        ],
+    }
@@ -1,3 +1,1742 @@
-from django.test import TestCase
+import csv
+import io
+import tempfile
+import unittest
+from unittest import mock
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.text import slugify
+from rest_framework.test import APIRequestFactory, APITestCase, APITransactionTestCase, force_authenticate
+
+from backend.instrumentacao import estatisticas
+
+from .models import (
+    Casal, MembroCasal, PreferenciasUsuario, Categoria, Subcategoria, CartaoCredito, CompraCartao,
+    DespesaModelo, RegraRateioPadrao, Lancamento, RateioLancamento, EscopoDespesa, RegraRateio, StatusLancamento,
+    TarefaProcessamento, StatusTarefa, SaldoMembro, ResumoMensal, FaturaCartao,
+)
+from . import cache_referencia, tarefas
+from .acerto import transferencias_para_quitar
+from .autenticacao import TokenComVinculos
+from .benchmark import carga_wsgi_asgi, escrita_concorrente, executar_suite, geracao_concorrente, perfis_de_escrita
+from .dados_sinteticos import criar_casais, criar_compras_cartao, criar_despesas_modelo, criar_lancamentos, criar_rateios
+from .faturas import competencia_da_compra, datas_da_fatura
+from .pagination import DespesaModeloPagination
+from .paralelo import _isolado
+from .projecao import calcular_projecao
+from .resumos import calcular_resumo, resumo_gravado
+from .services import (
+    CATEGORIAS_PADRAO, criar_categorias_padrao_para_casais, criar_categorias_padrao_para_casal,
+    criar_rateios_para_lancamento, gerar_lancamentos_competencia, gerar_lancamentos_competencia_lote,
+    gerar_lancamentos_da_compra, quitar_lancamentos_lote, sincronizar_parcelas_da_compra,
+)
+from .utils import get_casal_ativo, get_casal_ativo_do_usuario
+from .views import CasalViewSet, CurrentUserView
+
+User = get_user_model()
+
+
+class BaseCasalTestCase(APITestCase):
+    """Grupo com dois membros, categorias padrão e o primeiro membro autenticado."""
+
+    def setUp(self):
+        # ids se repetem entre testes; o cache de referência não pode atravessá-los
+        cache.clear()
+        cache_referencia.limpar_estatisticas()
+        self.user = User.objects.create_user(username="ana", password="123456")
+        self.outro = User.objects.create_user(username="bia", password="123456")
+        self.casal = Casal.objects.create(nome="Casa")
+        MembroCasal.objects.create(casal=self.casal, usuario=self.user)
+        MembroCasal.objects.create(casal=self.casal, usuario=self.outro)
+        PreferenciasUsuario.objects.create(usuario=self.user, grupo_atual=self.casal)
+        criar_categorias_padrao_para_casal(self.casal)
+        self.subcategoria = Subcategoria.objects.filter(categoria__casal=self.casal).first()
+        self.client.force_authenticate(self.user)
+
+    def contar_consultas(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(ctx.captured_queries)
+
+
+class ConsultasConstantesTest(BaseCasalTestCase):
+    """
+    As listagens devem fazer o mesmo número de consultas com 1 ou muitas linhas;
+    uma relação aninhada sem select_related/prefetch_related faz este teste falhar.
+    """
+    ENDPOINTS = [
+        "/api/lancamentos/",
+        "/api/compras-cartao/",
+        "/api/despesas-modelo/",
+        "/api/rateios-padrao/",
+        "/api/moradores/",
+        "/api/categorias/",
+        "/api/subcategorias/",
+        "/api/cartoes/",
+        "/api/grupos/",
+        "/api/grupos/meu/",
+    ]
+
+    def criar_linhas(self, quantidade):
+        categoria = self.subcategoria.categoria
+        for i in range(quantidade):
+            novo = User.objects.create_user(username=f"extra-{User.objects.count()}")
+            MembroCasal.objects.create(casal=self.casal, usuario=novo)
+            cartao = CartaoCredito.objects.create(casal=self.casal, nome=f"Cartão {novo.pk}")
+            pessoal = i % 2 == 0
+            CompraCartao.objects.create(
+                casal=self.casal, cartao=cartao, subcategoria=self.subcategoria,
+                escopo=EscopoDespesa.PESSOAL if pessoal else EscopoDespesa.COMPARTILHADA,
+                dono_pessoal=novo if pessoal else None, valor_total=Decimal("100.00"), parcelas_total=2,
+                primeira_competencia=date(2025, 1, 1), primeiro_vencimento=date(2025, 1, 10), pagador=novo,
+            )
+            Lancamento.objects.create(
+                casal=self.casal, subcategoria=self.subcategoria,
+                escopo=EscopoDespesa.PESSOAL if pessoal else EscopoDespesa.COMPARTILHADA,
+                dono_pessoal=novo if pessoal else None, competencia=date(2025, 1, 1),
+                data_vencimento=date(2025, 1, 10), valor_total=Decimal("10.00"), pagador=novo, criado_por=novo,
+            )
+            despesa = DespesaModelo.objects.create(
+                casal=self.casal, nome=f"Despesa {novo.pk}", categoria=categoria,
+                regra_rateio=RegraRateio.PERCENTUAL, valor_previsto=Decimal("50.00"),
+            )
+            RegraRateioPadrao.objects.create(despesa_modelo=despesa, membro=novo, percentual=Decimal("50"))
+            RegraRateioPadrao.objects.create(despesa_modelo=despesa, membro=self.user, percentual=Decimal("50"))
+
+    def contar_consultas(self, url, **params):
+        cache.clear()  # mede a listagem, não o cache de referência
+        return super().contar_consultas(url, **params)
+
+    def test_listagens_com_numero_constante_de_consultas(self):
+        self.criar_linhas(1)
+        poucas = {url: self.contar_consultas(url) for url in self.ENDPOINTS}
+        self.criar_linhas(5)
+        for url in self.ENDPOINTS:
+            with self.subTest(url=url):
+                self.assertEqual(self.contar_consultas(url), poucas[url])
+
+
+class InstrumentacaoTest(BaseCasalTestCase):
+    def setUp(self):
+        super().setUp()
+        estatisticas.limpar()
+
+    def test_server_timing_e_estatisticas_por_view(self):
+        response = self.client.get("/api/lancamentos/")
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertEqual(estatisticas.resumo()["LancamentoViewSet.list"]["requisicoes"], 1)
+
+    @override_settings(INSTRUMENTACAO_ORCAMENTOS={"LancamentoViewSet.list": 0})
+    def test_aviso_quando_excede_orcamento(self):
+        with self.assertLogs("backend.instrumentacao", level="WARNING") as logs:
+            self.client.get("/api/lancamentos/")
+        self.assertIn("LancamentoViewSet.list", logs.output[0])
+        self.assertEqual(estatisticas.resumo()["LancamentoViewSet.list"]["acima_orcamento"], 1)
+
+    def test_endpoint_de_estatisticas_so_para_admin(self):
+        self.assertEqual(self.client.get("/api/instrumentacao/").status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get("/api/categorias/")
+        response = self.client.get("/api/instrumentacao/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("CategoriaViewSet.list", response.data)
+
+
+class OrcamentoConsultasTest(BaseCasalTestCase):
+    """Cada view com orçamento em INSTRUMENTACAO_ORCAMENTOS fica dentro dele, com o cache frio."""
+    URLS = [
+        "/api/lancamentos/", "/api/compras-cartao/", "/api/despesas-modelo/", "/api/grupos/", "/api/grupos/meu/",
+        "/api/relatorio-financeiro/?competencia=2025-03", "/api/lancamentos-resumo/",
+        "/api/dashboard/?competencia=2025-03", "/api/tendencias/?fim=2025-03&meses=6",
+        "/api/projecao/?inicio=2025-03&meses=12",
+        "/api/acerto-contas/?competencia=2025-03",
+    ]
+
+    def setUp(self):
+        super().setUp()
+        cartao = CartaoCredito.objects.create(casal=self.casal, nome="Cartão")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/compras-cartao/", {
+                "cartao_id": cartao.id, "subcategoria_id": self.subcategoria.id, "escopo": EscopoDespesa.COMPARTILHADA,
+                "valor_total": "300.00", "parcelas_total": 3, "primeira_competencia": "2025-03-01",
+                "primeiro_vencimento": "2025-03-10", "pagador_id": self.user.id,
+            }, format="json")
+            DespesaModelo.objects.create(
+                casal=self.casal, nome="Aluguel", categoria=self.subcategoria.categoria,
+                valor_previsto=Decimal("100.00"), proxima_competencia=date(2025, 3, 1),
+            )
+            gerar_lancamentos_competencia(self.casal, date(2025, 3, 1), self.user)
+        self.client.force_authenticate(None)
+        self.access = self.client.post(
+            "/api/token/", {"username": "ana", "password": "123456"}, format="json"
+        ).json()["access"]
+
+    def medir(self, sem_preferencias=False):
+        estatisticas.limpar()
+        with self.assertNoLogs("backend.instrumentacao", level="WARNING"):
+            for url in self.URLS:
+                cache.clear()
+                if sem_preferencias:
+                    # primeiro acesso: o grupo ativo sai do fallback e as preferências são criadas
+                    PreferenciasUsuario.objects.filter(usuario=self.user).delete()
+                    self.client.force_authenticate(self.user)
+                    response = self.client.get(url)
+                else:
+                    response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {self.access}")
+                self.assertEqual(response.status_code, 200, (url, response.content))
+        medidas = estatisticas.resumo()
+        for nome, orcamento in settings.INSTRUMENTACAO_ORCAMENTOS.items():
+            views = [v for v in medidas if v == nome or v.startswith(f"{nome}.")]
+            self.assertTrue(views, f"{nome} não foi exercitada")
+            for view in views:
+                self.assertLessEqual(medidas[view]["consultas_max"], orcamento, view)
+
+    def test_views_dentro_do_orcamento(self):
+        self.medir()
+
+    @override_settings(DESPESAS_JWT_SEM_CONSULTA=False)
+    def test_views_dentro_do_orcamento_sem_jwt_sem_consulta(self):
+        self.medir()
+
+    def test_views_dentro_do_orcamento_sem_preferencias(self):
+        self.medir(sem_preferencias=True)
+
+
+class CategoriasPadraoTest(BaseCasalTestCase):
+    """O seed em lote cria o mesmo que o caminho por grupo e pode rodar de novo sem duplicar."""
+
+    def catalogo(self, casal):
+        return sorted(
+            Subcategoria.objects.filter(categoria__casal=casal)
+            .values_list("categoria__nome", "categoria__slug", "categoria__ativa", "nome", "slug", "ativa")
+        )
+
+    def test_lote_igual_ao_grupo_e_idempotente(self):
+        # self.casal veio de criar_categorias_padrao_para_casal (setUp)
+        lote = [Casal.objects.create(nome=f"Lote {i}") for i in range(2)]
+        self.assertEqual(criar_categorias_padrao_para_casais(lote), 2 * len(CATEGORIAS_PADRAO))
+        esperado = sorted(
+            (categoria, slugify(categoria), True, sub, slugify(sub), True)
+            for categoria, subs in CATEGORIAS_PADRAO.items()
+            for sub in subs
+        )
+        for casal in (self.casal, *lote):
+            self.assertEqual(self.catalogo(casal), esperado)
+
+        ids = sorted(Subcategoria.objects.values_list("id", flat=True))
+        # de novo: só as duas leituras, nada gravado
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(criar_categorias_padrao_para_casais([self.casal, *lote]), 0)
+        sql = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(len(sql), 2, sql)
+        self.assertTrue(all(q.startswith("SELECT") and "JOIN" not in q for q in sql), sql)
+        self.assertEqual(sorted(Subcategoria.objects.values_list("id", flat=True)), ids)
+
+        # grupo com parte do catálogo removida recebe só o que falta
+        Categoria.objects.filter(casal=lote[0], nome="Saúde").delete()
+        Subcategoria.objects.filter(categoria__casal=lote[0], nome="Delivery").delete()
+        self.assertEqual(criar_categorias_padrao_para_casais(lote), 1)
+        self.assertEqual(self.catalogo(lote[0]), esperado)
+        self.assertEqual(self.catalogo(lote[1]), esperado)
+
+    def test_comando_rodando_duas_vezes(self):
+        novo = Casal.objects.create(nome="Novo")
+        for esperado in ("Criando categorias padrão para 1 grupo(s)", "Nenhum grupo a popular."):
+            saida = io.StringIO()
+            call_command("seed_categorias", "--todos", stdout=saida)
+            self.assertIn(esperado, saida.getvalue())
+        self.assertEqual(Categoria.objects.filter(casal=novo).count(), len(CATEGORIAS_PADRAO))
+
+
+class GrupoAtivoTest(BaseCasalTestCase):
+    """get_casal_ativo resolve o grupo uma vez por request; set_casal_ativo troca o valor já resolvido."""
+
+    def test_resolvido_uma_vez_por_request(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lancamento = Lancamento.objects.create(
+                casal=self.casal, subcategoria=self.subcategoria, competencia=date(2025, 3, 1),
+                data_vencimento=date(2025, 3, 5), valor_total=Decimal("80.00"), pagador=self.user, criado_por=self.user,
+            )
+        url = f"/api/lancamentos/{lancamento.id}/"
+        for metodo, dados in (("get", None), ("patch", {"descricao": "Mercado"})):
+            with mock.patch("despesas.utils.get_casal_ativo_do_usuario", wraps=get_casal_ativo_do_usuario) as resolver:
+                with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+                    response = getattr(self.client, metodo)(url, dados, format="json")
+            self.assertEqual(response.status_code, 200, response.content)
+            # permissões, get_queryset e perform_update leem o mesmo valor da request
+            resolver.assert_called_once()
+            resolucoes = [q for q in ctx.captured_queries if "despesas_preferenciasusuario" in q["sql"]]
+            self.assertEqual(len(resolucoes), 1, metodo)
+
+    def test_troca_de_grupo_atualiza_a_request(self):
+        outro_grupo = Casal.objects.create(nome="Praia")
+        MembroCasal.objects.create(casal=outro_grupo, usuario=self.user)
+        request = APIRequestFactory().post("/api/users/me/", {"grupo_id": outro_grupo.id}, format="json")
+        force_authenticate(request, self.user)
+        # resolvido antes da view (como faria um middleware ou permissão)
+        request.user = self.user
+        self.assertEqual(get_casal_ativo(request), self.casal)
+
+        response = CurrentUserView.as_view()(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_casal_ativo(request), outro_grupo)
+        # e a próxima request já resolve o grupo novo pelas preferências
+        self.assertEqual(self.client.get("/api/grupos/meu/").data["id"], outro_grupo.id)
+
+    def test_criar_grupo_atualiza_a_request(self):
+        request = APIRequestFactory().post("/api/grupos/", {"nome": "Sítio"}, format="json")
+        force_authenticate(request, self.user)
+        # resolvido antes da view (como faria um middleware ou permissão)
+        request.user = self.user
+        self.assertEqual(get_casal_ativo(request), self.casal)
+
+        response = CasalViewSet.as_view({"post": "create"})(request)
+        self.assertEqual(response.status_code, 201, response.data)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_casal_ativo(request).id, response.data["id"])
+
+
+class BenchmarkSuiteTest(APITestCase):
+    def test_suite_roda_sobre_dados_sinteticos(self):
+        casais = criar_casais(3, prefixo="teste")
+        criar_lancamentos(casais, 20, meses=6)
+        criar_despesas_modelo(casais, 3)
+        criar_compras_cartao(casais, 4, meses=6)
+        criar_rateios(casais)
+
+        # usuários sem PreferenciasUsuario: o fallback do grupo ativo também cabe nos orçamentos
+        with self.assertNoLogs("backend.instrumentacao", level="WARNING"):
+            resultados = executar_suite(repeticoes=1, prefixo="teste")
+
+        self.assertEqual(len(resultados), 9)
+        for nome, r in resultados.items():
+            with self.subTest(caso=nome):
+                self.assertGreater(r["consultas"], 0)
+        # os casos que gravam são desfeitos
+        self.assertFalse(Lancamento.objects.filter(despesa_modelo__isnull=False).exists())
+
+
+class ExportacaoLancamentosTest(BaseCasalTestCase):
+    def criar_lancamento(self, status, valor):
+        lanc = Lancamento.objects.create(
+            casal=self.casal, subcategoria=self.subcategoria, escopo=EscopoDespesa.COMPARTILHADA,
+            competencia=date(2025, 3, 1), data_vencimento=date(2025, 3, 10), valor_total=Decimal(valor),
+            status=status, pagador=self.user, criado_por=self.user,
+        )
+        criar_rateios_para_lancamento(lanc)
+        return lanc
+
+    def ler_csv(self, response):
+        conteudo = b"".join(response.streaming_content).decode("utf-8-sig")
+        return list(csv.DictReader(io.StringIO(conteudo)))
+
+    def test_exporta_com_filtros_e_rateio_por_membro(self):
+        pago = self.criar_lancamento(StatusLancamento.PAGO, "100.01")
+        self.criar_lancamento(StatusLancamento.PENDENTE, "50.00")
+
+        response = self.client.get("/api/lancamentos/exportar/", {"status": StatusLancamento.PAGO, "competencia": "2025-03"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        linhas = self.ler_csv(response)
+        self.assertEqual([int(l["id"]) for l in linhas], [pago.id])
+        self.assertEqual(linhas[0]["categoria"], self.subcategoria.categoria.nome)
+        self.assertEqual(linhas[0]["rateio ana"], "50.00")
+        self.assertEqual(linhas[0]["rateio bia"], "50.01")
+
+    def test_consultas_nao_crescem_com_o_historico(self):
+        self.criar_lancamento(StatusLancamento.PAGO, "10.00")
+        with CaptureQueriesContext(connection) as poucas:
+            self.ler_csv(self.client.get("/api/lancamentos/exportar/"))
+        for _ in range(5):
+            self.criar_lancamento(StatusLancamento.PAGO, "10.00")
+        with CaptureQueriesContext(connection) as muitas:
+            self.ler_csv(self.client.get("/api/lancamentos/exportar/"))
+        self.assertEqual(len(poucas), len(muitas))
+
+
+@override_settings(DESPESAS_TAREFAS_MODO="sincrono")
+class ImportacaoLancamentosTest(BaseCasalTestCase):
+    CSV = (
+        "Data;Descrição;Valor;Subcategoria;Pagador\n"
+        "05/03/2025;Mercado do mês;-1.234,56;Supermercado;bia\n"
+        "06/03/2025;Padaria;-12,00;;\n"
+        "07/03/2025;Sem valor;;Supermercado;\n"
+        "08/03/2025;Cinema;-30,00;Inexistente;\n"
+        "05/03/2025;Mercado  do mês;-1234.56;Supermercado;bia\n"
+        "09/03/2025;Estorno;50,00;Inexistente;\n"
+    )
+
+    def enviar(self, conteudo, nome="extrato.csv", **dados):
+        arquivo = SimpleUploadedFile(nome, conteudo.encode("utf-8"))
+        return self.client.post("/api/lancamentos/importar/", {"arquivo": arquivo, **dados}, format="multipart")
+
+    def test_importa_csv_com_erros_por_linha_e_duplicatas(self):
+        response = self.enviar(self.CSV, subcategoria_id=self.subcategoria.id)
+
+        self.assertEqual(response.status_code, 202)
+        tarefa = TarefaProcessamento.objects.get(pk=response.data["id"])
+        self.assertEqual(tarefa.status, StatusTarefa.CONCLUIDA)
+        self.assertEqual(tarefa.resultado["importadas"], 2)
+        self.assertEqual(tarefa.resultado["duplicadas"], 1)
+        self.assertEqual(tarefa.resultado["ignoradas"], 1)  # crédito, nem validado
+        self.assertEqual([e["linha"] for e in tarefa.resultado["erros"]], [4, 5])
+        self.assertIsNone(TarefaProcessamento.objects.values_list("anexo", flat=True).get(pk=tarefa.pk))
+
+        mercado = Lancamento.objects.get(descricao="Mercado do mês")
+        self.assertEqual(mercado.valor_total, Decimal("1234.56"))
+        self.assertEqual(mercado.pagador, self.outro)
+        self.assertEqual(mercado.competencia, date(2025, 3, 1))
+        self.assertEqual(mercado.rateios.count(), 2)
+        padaria = Lancamento.objects.get(descricao="Padaria")
+        self.assertEqual(padaria.subcategoria, self.subcategoria)
+        self.assertEqual(padaria.pagador, self.user)
+
+        # reenviar o mesmo arquivo não duplica nada
+        response = self.enviar(self.CSV, subcategoria_id=self.subcategoria.id)
+        self.assertEqual(TarefaProcessamento.objects.get(pk=response.data["id"]).resultado["duplicadas"], 3)
+        self.assertEqual(Lancamento.objects.count(), 2)
+
+    def test_importa_so_debitos_do_ofx(self):
+        ofx = (
+            "OFXHEADER:100\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>\n"
+            "<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250310120000[-3:BRT]<TRNAMT>-89.90<FITID>1<MEMO>Farmácia</STMTTRN>\n"
+            "<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250311<TRNAMT>5000.00<FITID>2<MEMO>Salário</STMTTRN>\n"
+            "</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n"
+        )
+        response = self.enviar(ofx, nome="extrato.ofx", subcategoria_id=self.subcategoria.id)
+
+        tarefa = TarefaProcessamento.objects.get(pk=response.data["id"])
+        self.assertEqual(tarefa.resultado["importadas"], 1)
+        lanc = Lancamento.objects.get()
+        self.assertEqual((lanc.descricao, lanc.valor_total, lanc.data_vencimento), ("Farmácia", Decimal("89.90"), date(2025, 3, 10)))
+
+    def test_sinal_das_despesas_vale_para_os_dois_formatos(self):
+        planilha = "data;descricao;valor\n05/03/2025;Luz;150,00\n06/03/2025;Reembolso;-40,00\n"
+        response = self.enviar(planilha, subcategoria_id=self.subcategoria.id, sinal="positivo")
+        resultado = TarefaProcessamento.objects.get(pk=response.data["id"]).resultado
+        self.assertEqual((resultado["importadas"], resultado["ignoradas"]), (1, 1))
+        self.assertEqual(Lancamento.objects.get().valor_total, Decimal("150.00"))
+
+        ofx = "<STMTTRN><DTPOSTED>20250310<TRNAMT>-89.90<MEMO>Farmácia</STMTTRN>\n"
+        response = self.enviar(ofx, nome="extrato.ofx", subcategoria_id=self.subcategoria.id, sinal="positivo")
+        self.assertEqual(TarefaProcessamento.objects.get(pk=response.data["id"]).resultado["ignoradas"], 1)
+        self.assertEqual(self.enviar(planilha, sinal="credito").status_code, 400)
+
+    @override_settings(DESPESAS_TAREFAS_MODO="fila")
+    def test_fila_le_o_arquivo_do_banco_sem_o_autor(self):
+        response = self.enviar(self.CSV, subcategoria_id=self.subcategoria.id)
+        tarefa = TarefaProcessamento.objects.get(pk=response.data["id"])
+        self.assertEqual(tarefa.status, StatusTarefa.PENDENTE)
+        self.assertEqual(bytes(tarefa.anexo), self.CSV.encode("utf-8"))
+        # o autor saiu do grupo e apagou a conta antes do worker pegar a tarefa
+        User.objects.filter(pk=self.user.pk).delete()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("executar_tarefas", stdout=io.StringIO())
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, StatusTarefa.CONCLUIDA, tarefa.erro)
+        self.assertEqual(tarefa.resultado["importadas"], 2)
+        self.assertIsNone(tarefa.anexo)
+        self.assertEqual(set(Lancamento.objects.values_list("criado_por", flat=True)), {self.outro.id})
+
+    def test_formato_invalido(self):
+        self.assertEqual(self.enviar("x", nome="extrato.pdf").status_code, 400)
+
+
+class AcertoContasTest(BaseCasalTestCase):
+    def lancar(self, valor, competencia="2025-03-01", **extra):
+        dados = {
+            "subcategoria_id": self.subcategoria.id, "escopo": EscopoDespesa.COMPARTILHADA, "competencia": competencia,
+            "data_vencimento": competencia, "valor_total": valor, "status": StatusLancamento.PAGO, "pagador_id": self.user.id,
+            **extra,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/lancamentos/", dados, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data["id"]
+
+    def saldos(self, response):
+        return {linha["membro"]["id"]: linha["saldo"] for linha in response.data["saldos"]}
+
+    def test_saldos_e_transferencias(self):
+        self.lancar("100.00")
+        self.lancar("30.00", escopo=EscopoDespesa.PESSOAL, dono_pessoal_id=self.outro.id)
+        self.lancar("40.00", status=StatusLancamento.PENDENTE)  # não entra no acerto
+        self.lancar("20.00", competencia="2025-04-01", pagador_id=self.outro.id)
+
+        response = self.client.get("/api/acerto-contas/")
+        self.assertEqual(self.saldos(response), {self.user.id: 70.0, self.outro.id: -70.0})
+        self.assertEqual(response.data["transferencias"], [
+            {"de": self.outro.id, "de_nome": "bia", "para": self.user.id, "para_nome": "ana", "valor": 70.0},
+        ])
+
+        response = self.client.get("/api/acerto-contas/", {"competencia": "2025-04"})
+        self.assertEqual(self.saldos(response), {self.user.id: -10.0, self.outro.id: 10.0})
+
+    def test_saldo_acompanha_edicao_e_exclusao(self):
+        lancamento_id = self.lancar("100.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f"/api/lancamentos/{lancamento_id}/", {"valor_total": "60.00"}, format="json")
+        self.assertEqual(SaldoMembro.objects.get(casal=self.casal, membro=self.user).saldo, Decimal("30.00"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/lancamentos/{lancamento_id}/")
+        self.assertFalse(SaldoMembro.objects.exclude(saldo=0).exists())
+
+    def test_transferencias_minimas(self):
+        saldos = {1: Decimal("50"), 2: Decimal("-30"), 3: Decimal("-20"), 4: Decimal("0")}
+        self.assertEqual(transferencias_para_quitar(saldos), [(2, 1, Decimal("30")), (3, 1, Decimal("20"))])
+
+
+class QuitacaoTest(BaseCasalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cartao = CartaoCredito.objects.create(casal=self.casal, nome="Cartão")
+        compra = CompraCartao.objects.create(
+            casal=self.casal, cartao=self.cartao, subcategoria=self.subcategoria, valor_total=Decimal("300.00"),
+            parcelas_total=3, primeira_competencia=date(2025, 3, 1), primeiro_vencimento=date(2025, 3, 10),
+            pagador=self.user,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.parcelas = gerar_lancamentos_da_compra(compra, self.user)
+            self.avulso = Lancamento.objects.create(
+                casal=self.casal, subcategoria=self.subcategoria, escopo=EscopoDespesa.COMPARTILHADA,
+                competencia=date(2025, 3, 1), data_vencimento=date(2025, 3, 5), valor_total=Decimal("80.00"),
+                pagador=self.user, criado_por=self.user,
+            )
+
+    def test_quitar_preenche_data_e_pagador(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/api/lancamentos/{self.avulso.id}/quitar/",
+                {"data_pagamento": "2025-03-06", "pagador_id": self.outro.id}, format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.avulso.refresh_from_db()
+        self.assertEqual(
+            (self.avulso.status, self.avulso.data_pagamento, self.avulso.pagador),
+            (StatusLancamento.PAGO, date(2025, 3, 6), self.outro),
+        )
+
+    def test_quitar_lote_por_filtro_mantem_resumo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(
+                    "/api/lancamentos/quitar-lote/", {"filtros": {"competencia": "2025-03", "cartao": self.cartao.id}},
+                    format="json",
+                )
+        self.assertEqual(response.data, {"quitados": 1})
+        self.assertEqual(sum(1 for q in ctx.captured_queries if q["sql"].startswith('UPDATE "despesas_lancamento"')), 1)
+        self.assertEqual(
+            list(Lancamento.objects.filter(status=StatusLancamento.PAGO).values_list("id", flat=True)), [self.parcelas[0].id]
+        )
+        self.assertEqual(resumo_gravado(self.casal.id, date(2025, 3, 1)), calcular_resumo(self.casal.id, date(2025, 3, 1)))
+
+    def test_quitar_lote_por_ids_ignora_outro_grupo(self):
+        outro_casal = Casal.objects.create(nome="Outra casa")
+        MembroCasal.objects.create(casal=outro_casal, usuario=self.outro)
+        criar_categorias_padrao_para_casal(outro_casal)
+        alheio = Lancamento.objects.create(
+            casal=outro_casal, subcategoria=Subcategoria.objects.filter(categoria__casal=outro_casal).first(),
+            escopo=EscopoDespesa.COMPARTILHADA, competencia=date(2025, 3, 1), data_vencimento=date(2025, 3, 5),
+            valor_total=Decimal("10.00"), pagador=self.outro, criado_por=self.outro,
+        )
+        ids = [p.id for p in self.parcelas] + [alheio.id]
+        response = self.client.post("/api/lancamentos/quitar-lote/", {"ids": ids}, format="json")
+        self.assertEqual(response.data, {"quitados": 3})
+        alheio.refresh_from_db()
+        self.assertEqual(alheio.status, StatusLancamento.PENDENTE)
+
+    def test_quitar_lote_exige_ids_ou_filtros(self):
+        self.assertEqual(self.client.post("/api/lancamentos/quitar-lote/", {}, format="json").status_code, 400)
+
+    def test_quitar_lote_recusa_filtro_desconhecido_ou_vazio(self):
+        for filtros in ({"competnecia": "2025-03"}, {"competencia": ""}, {}):
+            with self.subTest(filtros=filtros):
+                response = self.client.post("/api/lancamentos/quitar-lote/", {"filtros": filtros}, format="json")
+                self.assertEqual(response.status_code, 400, response.content)
+        self.assertFalse(Lancamento.objects.filter(status=StatusLancamento.PAGO).exists())
+
+
+class FiltroCompetenciaTest(BaseCasalTestCase):
+    """?competencia, ?de e ?ate (YYYY ou YYYY-MM) nas listagens e relatórios; formato inválido responde 400."""
+    VALORES = {date(2024, 12, 1): "10.00", date(2025, 1, 1): "20.00", date(2025, 2, 1): "40.00", date(2025, 3, 1): "80.00"}
+
+    def setUp(self):
+        super().setUp()
+        self.cartao = CartaoCredito.objects.create(casal=self.casal, nome="Cartão")
+        with self.captureOnCommitCallbacks(execute=True):
+            for competencia, valor in self.VALORES.items():
+                Lancamento.objects.create(
+                    casal=self.casal, subcategoria=self.subcategoria, escopo=EscopoDespesa.COMPARTILHADA,
+                    competencia=competencia, data_vencimento=competencia.replace(day=10), valor_total=Decimal(valor),
+                    status=StatusLancamento.PAGO, data_pagamento=competencia.replace(day=10),
+                    pagador=self.user, criado_por=self.user,
+                )
+
+    def test_intervalos(self):
+        casos = [
+            ({"competencia": "2025-02"}, [date(2025, 2, 1)]),
+            ({"competencia": "2025"}, [date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)]),
+            ({"de": "2025-02"}, [date(2025, 2, 1), date(2025, 3, 1)]),
+            # "ate" inclui o mês informado
+            ({"ate": "2025-01"}, [date(2024, 12, 1), date(2025, 1, 1)]),
+            ({"de": "2025-01", "ate": "2025-02"}, [date(2025, 1, 1), date(2025, 2, 1)]),
+            ({"de": "2025-04"}, []),
+        ]
+        for params, meses in casos:
+            with self.subTest(**params):
+                response = self.client.get("/api/lancamentos/", params)
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(sorted(l["competencia"] for l in response.json()["results"]), [f"{m}" for m in meses])
+
+                total = float(sum((Decimal(self.VALORES[m]) for m in meses), Decimal("0")))
+                self.assertEqual(self.client.get("/api/relatorio-financeiro/", params).json()["total_gasto"], total)
+                dashboard = self.client.get("/api/dashboard/", {**params, "secoes": "relatorio"}).json()
+                self.assertEqual(dashboard["relatorio"]["total_gasto"], total)
+
+    def test_formato_invalido_responde_400(self):
+        urls = [
+            "/api/lancamentos/", "/api/relatorio-financeiro/", "/api/dashboard/", "/api/acerto-contas/",
+            f"/api/cartoes/{self.cartao.id}/faturas/",
+        ]
+        for url in urls:
+            for campo, valor in (("competencia", "2025-13"), ("de", "03/2025"), ("ate", "2025-1")):
+                with self.subTest(url=url, campo=campo):
+                    response = self.client.get(url, {campo: valor})
+                    self.assertEqual(response.status_code, 400, response.content)
+                    self.assertIn(campo, response.json())
+
+
+class PaginacaoTest(BaseCasalTestCase):
+    def setUp(self):
+        super().setUp()
+        categoria = self.subcategoria.categoria
+        # nomes repetidos: o desempate por id precisa manter a ordem estável entre páginas
+        for nome in ["Luz", "Água", "Luz", "Gás", "Água", "Internet", "Luz"]:
+            DespesaModelo.objects.create(casal=self.casal, nome=nome, categoria=categoria, valor_previsto=Decimal("10.00"))
+        for dia in [5, 5, 10, 1, 10]:
+            Lancamento.objects.create(
+                casal=self.casal, subcategoria=self.subcategoria, escopo=EscopoDespesa.COMPARTILHADA,
+                competencia=date(2025, 3, 1), data_vencimento=date(2025, 3, dia), valor_total=Decimal("1.00"),
+                pagador=self.user, criado_por=self.user,
+            )
+
+    def percorrer(self, url, **params):
+        ids, paginas = [], []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200, response.content)
+            paginas.append(response.json())
+            ids += [item["id"] for item in response.json()["results"]]
+            if not response.json()["next"]:
+                return ids, paginas
+            response = self.client.get(response.json()["next"])
+
+    def test_ordem_estavel_entre_paginas(self):
+        casos = [
+            ("/api/despesas-modelo/", list(DespesaModelo.objects.order_by("nome", "id").values_list("id", flat=True))),
+            ("/api/lancamentos/", list(
+                Lancamento.objects.order_by("-competencia", "data_vencimento", "id").values_list("id", flat=True)
+            )),
+        ]
+        for url, esperado in casos:
+            with self.subTest(url=url):
+                ids, paginas = self.percorrer(url, page_size=2)
+                self.assertEqual(ids, esperado)
+                self.assertEqual(len(paginas), (len(esperado) + 1) // 2)
+                # voltar a partir da última página devolve a penúltima
+                anterior = self.client.get(paginas[-1]["previous"]).json()
+                self.assertEqual(anterior["results"], paginas[-2]["results"])
+
+    def test_page_size_limitado(self):
+        def tamanho(valor):
+            return len(self.client.get("/api/despesas-modelo/", {"page_size": valor}).json()["results"])
+        self.assertEqual(tamanho(0), 1)
+        self.assertEqual(tamanho(-5), 1)
+        self.assertEqual(tamanho("abc"), 7)  # volta ao padrão (50)
+        with mock.patch.object(DespesaModeloPagination, "max_page_size", 4):
+            self.assertEqual(tamanho(1000), 4)
+
+    def test_cursor_invalido(self):
+        for cursor in ["lixo", "eyJwIjpbMV19", "eyJwIjpbIngiLCJ5Il19"]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get("/api/despesas-modelo/", {"cursor": cursor})
+                self.assertEqual(response.status_code, 404, response.content)
+
+
+class CacheReferenciaTest(BaseCasalTestCase):
+    def test_segunda_listagem_vem_do_cache(self):
+        primeira = self.contar_consultas("/api/categorias/")
+        # só restam a consulta do grupo ativo e a da versão (GET condicional)
+        self.assertEqual(self.contar_consultas("/api/categorias/"), 2)
+        self.assertGreater(primeira, 2)
+        stats = cache_referencia.estatisticas()["categorias"]
+        self.assertEqual((stats["acertos"], stats["faltas"]), (1, 1))
+
+    def test_filtros_tem_entradas_separadas(self):
+        todas = self.client.get("/api/subcategorias/").json()
+        categoria = self.subcategoria.categoria_id
+        filtradas = self.client.get("/api/subcategorias/", {"categoria": categoria}).json()
+        self.assertLess(len(filtradas), len(todas))
+        self.assertTrue(all(s["categoria"]["id"] == categoria for s in filtradas))
+
+    def test_alteracoes_invalidam(self):
+        self.client.get("/api/categorias/")
+        self.client.get("/api/subcategorias/")
+        self.client.get("/api/moradores/")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/categorias/", {"nome": "Pets", "ativa": True})
+        self.assertEqual(response.status_code, 201, response.content)
+        nomes = [c["nome"] for c in self.client.get("/api/categorias/").json()]
+        self.assertIn("Pets", nomes)
+
+        self.subcategoria.nome = "Renomeada"
+        self.subcategoria.save()
+        nomes = [s["nome"] for s in self.client.get("/api/subcategorias/").json()]
+        self.assertIn("Renomeada", nomes)
+
+        self.outro.first_name = "Beatriz"
+        self.outro.save()
+        moradores = self.client.get("/api/moradores/").json()
+        self.assertIn("Beatriz", str(moradores))
+
+    def test_grupos_nao_compartilham_cache(self):
+        self.client.get("/api/cartoes/")
+        outro_casal = Casal.objects.create(nome="Outra")
+        MembroCasal.objects.create(casal=outro_casal, usuario=self.outro)
+        CartaoCredito.objects.create(casal=outro_casal, nome="Só da outra")
+        PreferenciasUsuario.objects.create(usuario=self.outro, grupo_atual=outro_casal)
+        self.client.force_authenticate(self.outro)
+        nomes = [c["nome"] for c in self.client.get("/api/cartoes/").json()]
+        self.assertEqual(nomes, ["Só da outra"])
+
+    def test_estatisticas_somente_admin(self):
+        self.assertEqual(self.client.get("/api/instrumentacao/cache/").status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get("/api/cartoes/")
+        response = self.client.get("/api/instrumentacao/cache/")
+        self.assertEqual(response.json()["cartoes"]["faltas"], 1)
+        self.assertEqual(self.client.delete("/api/instrumentacao/cache/").status_code, 204)
+        self.assertEqual(cache_referencia.estatisticas(), {})
+
+
+class ResumoMensalTest(BaseCasalTestCase):
+    MESES = (date(2025, 3, 1), date(2025, 4, 1))
+
+    def assertResumoEmDia(self):
+        for mes in self.MESES:
+            self.assertEqual(resumo_gravado(self.casal.id, mes), calcular_resumo(self.casal.id, mes), mes)
+
+    def test_resumo_acompanha_lancamentos_e_rateios(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lanc = Lancamento.objects.create(
+                casal=self.casal, subcategoria=self.subcategoria, escopo=EscopoDespesa.COMPARTILHADA,
+                competencia=date(2025, 3, 1), data_vencimento=date(2025, 3, 10), valor_total=Decimal("90.00"),
+                status=StatusLancamento.PAGO, pagador=self.user, criado_por=self.user,
+            )
+            criar_rateios_para_lancamento(lanc)
+        self.assertNotEqual(resumo_gravado(self.casal.id, date(2025, 3, 1)), {})
+        self.assertResumoEmDia()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lanc.valor_total = Decimal("120.00")
+            lanc.competencia = date(2025, 4, 1)
+            lanc.save()
+        self.assertEqual(resumo_gravado(self.casal.id, date(2025, 3, 1)), {})
+        self.assertResumoEmDia()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rateio = lanc.rateios.get(membro=self.outro)
+            rateio.valor = Decimal("80.00")
+            rateio.save()
+        self.assertResumoEmDia()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rateio.delete()
+        self.assertResumoEmDia()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            lanc.delete()
+        self.assertEqual(resumo_gravado(self.casal.id, date(2025, 4, 1)), {})
+        self.assertResumoEmDia()
+
+    def test_transacao_desfeita_nao_deixa_mes_pendente(self):
+        def lancar(competencia):
+            return Lancamento.objects.create(
+                casal=self.casal, subcategoria=self.subcategoria, escopo=EscopoDespesa.COMPARTILHADA,
+                competencia=competencia, data_vencimento=competencia, valor_total=Decimal("10.00"),
+                pagador=self.user, criado_por=self.user,
+            )
+
+        with mock.patch("despesas.resumos.recalcular_resumo") as recalcular:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    lancar(date(2025, 3, 1))
+                    raise IntegrityError("desfaz")
+            self.assertEqual(recalcular.call_count, 0)
+
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                lancar(date(2025, 4, 1))
+                lancar(date(2025, 4, 1))
+        # os callbacks dividem os meses: só o confirmado, uma vez
+        self.assertEqual(len(callbacks), 2)
+        recalcular.assert_called_once_with(self.casal.id, date(2025, 4, 1))
+
+
+class GetCondicionalTest(BaseCasalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.lancamento = Lancamento.objects.create(
+            casal=self.casal, subcategoria=self.subcategoria, escopo=EscopoDespesa.COMPARTILHADA,
+            competencia=date(2025, 5, 1), data_vencimento=date(2025, 5, 10), valor_total=Decimal("90.00"),
+            pagador=self.user, criado_por=self.user,
+        )
+
+    def etag(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response["ETag"]
+
+    def test_listagem_responde_304_sem_serializar(self):
+        response = self.client.get("/api/lancamentos/")
+        self.assertIn("no-cache", response["Cache-Control"])
+        with CaptureQueriesContext(connection) as ctx:
+            repetida = self.client.get("/api/lancamentos/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida["ETag"], response["ETag"])
+        self.assertEqual(repetida.content, b"")
+        # grupo ativo + versão do grupo, por chave primária e sem varrer os lançamentos
+        self.assertEqual(len(ctx.captured_queries), 2)
+        versao = ctx.captured_queries[-1]["sql"]
+        self.assertIn('FROM "despesas_casal"', versao)
+        self.assertNotIn("JOIN", versao)
+        self.assertNotIn("despesas_lancamento", versao)
+        # as listagens pequenas seguem com Last-Modified do agregado
+        self.assertTrue(self.client.get("/api/categorias/").has_header("Last-Modified"))
+
+    def test_alteracoes_trocam_etag(self):
+        etags = {self.etag("/api/lancamentos/")}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lancamento.descricao = "Mercado"
+            self.lancamento.save()
+        etags.add(self.etag("/api/lancamentos/"))
+        categoria = self.subcategoria.categoria
+        categoria.nome = "Outro nome"
+        categoria.save()
+        etags.add(self.etag("/api/lancamentos/"))
+        self.subcategoria.nome = "Outra subcategoria"
+        self.subcategoria.save()
+        etags.add(self.etag("/api/lancamentos/"))
+        with self.captureOnCommitCallbacks(execute=True):
+            quitar_lancamentos_lote(Lancamento.objects.filter(pk=self.lancamento.pk))
+        etags.add(self.etag("/api/lancamentos/"))
+        with self.captureOnCommitCallbacks(execute=True):
+            Lancamento.objects.filter(pk=self.lancamento.pk).delete()
+        etags.add(self.etag("/api/lancamentos/"))
+        self.assertEqual(len(etags), 6)
+
+    def test_filtros_e_grupos_tem_etags_distintas(self):
+        todas = self.etag("/api/lancamentos/")
+        self.assertNotEqual(self.etag("/api/lancamentos/", status=StatusLancamento.PAGO), todas)
+        outro_casal = Casal.objects.create(nome="Outra")
+        MembroCasal.objects.create(casal=outro_casal, usuario=self.outro)
+        PreferenciasUsuario.objects.create(usuario=self.outro, grupo_atual=outro_casal)
+        self.client.force_authenticate(self.outro)
+        self.assertNotEqual(self.etag("/api/lancamentos/"), todas)
+
+    def test_detalhe_e_grupo_atual(self):
+        url = f"/api/lancamentos/{self.lancamento.id}/"
+        etag = self.etag(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertFalse(self.client.get("/api/lancamentos/999999/").has_header("ETag"))
+
+        etag = self.etag("/api/grupos/meu/")
+        self.assertEqual(self.client.get("/api/grupos/meu/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        membro = MembroCasal.objects.get(casal=self.casal, usuario=self.outro)
+        membro.apelido = "Bia"
+        membro.save()
+        self.assertEqual(self.client.get("/api/grupos/meu/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class JWTSemConsultaTest(BaseCasalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+
+    def tokens(self):
+        response = self.client.post("/api/token/", {"username": "ana", "password": "123456"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def get(self, url, access):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_request_nao_consulta_usuario_nem_grupo(self):
+        access = self.tokens()["access"]
+        self.get("/api/categorias/", access)  # aquece a versão no cache
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get("/api/lancamentos/", access)
+        self.assertEqual(response.status_code, 200)
+        # só a versão (GET condicional) e a página de lançamentos
+        self.assertEqual(len(ctx.captured_queries), 2)
+        tabelas = " ".join(q["sql"] for q in ctx.captured_queries)
+        for tabela in ("auth_user", "despesas_preferenciasusuario", "despesas_membrocasal"):
+            self.assertNotIn(f'FROM "{tabela}"', tabelas)
+        me = self.get("/api/users/me/", access).json()
+        self.assertEqual((me["id"], me["username"]), (self.user.id, "ana"))
+
+    def test_troca_de_grupo_invalida_o_token(self):
+        tokens = self.tokens()
+        outro_casal = Casal.objects.create(nome="Outra")
+        MembroCasal.objects.create(casal=outro_casal, usuario=self.user)
+        self.assertEqual(self.get("/api/grupos/meu/", tokens["access"]).status_code, 401)
+
+        access = self.client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json").json()["access"]
+        response = self.client.post(
+            "/api/users/me/", {"grupo_id": outro_casal.id}, format="json", HTTP_AUTHORIZATION=f"Bearer {access}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get("/api/grupos/meu/", access).status_code, 401)
+
+        access = self.client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json").json()["access"]
+        self.assertEqual(self.get("/api/grupos/meu/", access).json()["nome"], "Outra")
+
+    def test_desativar_participacao_invalida_o_token(self):
+        access = self.tokens()["access"]
+        membro = MembroCasal.objects.get(casal=self.casal, usuario=self.user)
+        membro.ativo = False
+        membro.save()
+        self.assertEqual(self.get("/api/lancamentos/", access).status_code, 401)
+
+    def test_editar_apelido_ou_salario_mantem_o_token(self):
+        access = self.tokens()["access"]
+        membro = MembroCasal.objects.get(casal=self.casal, usuario=self.user)
+        membro.apelido = "Aninha"
+        membro.salario_mensal = Decimal("5000.00")
+        membro.save()
+        membro.save(update_fields=["apelido"])
+        self.assertEqual(self.get("/api/lancamentos/", access).status_code, 200)
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_cache_local_le_versao_do_banco(self):
+        # com cache por processo, a troca feita em outro worker não apaga este cache: vale o banco
+        access = self.tokens()["access"]
+        self.assertEqual(self.get("/api/lancamentos/", access).status_code, 200)
+        PreferenciasUsuario.objects.filter(usuario=self.user).update(versao_vinculos=F("versao_vinculos") + 1)
+        self.assertEqual(self.get("/api/lancamentos/", access).status_code, 401)
+
+    @override_settings(DESPESAS_JWT_SEM_CONSULTA=False)
+    def test_modo_padrao_carrega_usuario(self):
+        access = self.tokens()["access"]
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.get("/api/lancamentos/", access).status_code, 200)
+        self.assertIn('FROM "auth_user"', " ".join(q["sql"] for q in ctx.captured_queries))
+
+
+class SincronizacaoParcelasTest(BaseCasalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cartao = CartaoCredito.objects.create(casal=self.casal, nome="Cartão")
+
+    def salvar(self, metodo, url, **dados):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, metodo)(url, dados, format="json")
+        self.assertIn(response.status_code, (200, 201), response.content)
+        return response.json()
+
+    def comprar(self, parcelas=3, valor="300.00"):
+        return self.salvar(
+            "post", "/api/compras-cartao/", cartao_id=self.cartao.id, subcategoria_id=self.subcategoria.id,
+            escopo=EscopoDespesa.COMPARTILHADA, valor_total=valor, parcelas_total=parcelas,
+            primeira_competencia="2025-03-01", primeiro_vencimento="2025-03-10", pagador_id=self.user.id,
+        )
+
+    def parcelas(self, compra):
+        return list(Lancamento.objects.filter(compra_cartao_id=compra["id"]).order_by("parcela_numero"))
+
+    def test_edicao_atualiza_no_lugar(self):
+        compra = self.comprar()
+        antes = self.parcelas(compra)
+        self.salvar("post", f"/api/lancamentos/{antes[0].id}/quitar/", pagador_id=self.outro.id)
+
+        self.salvar("patch", f"/api/compras-cartao/{compra['id']}/", valor_total="600.00", parcelas_total=4,
+                    pagador_id=self.outro.id)
+        depois = self.parcelas(compra)
+        self.assertEqual([p.id for p in depois[:3]], [p.id for p in antes])
+        self.assertEqual([p.valor_total for p in depois], [Decimal("150.00")] * 4)
+        self.assertEqual([p.parcelas_total for p in depois], [4] * 4)
+        # a quitada mantém status e pagador; as pendentes passam ao novo pagador
+        self.assertEqual((depois[0].status, depois[0].pagador_id), (StatusLancamento.PAGO, self.outro.id))
+        self.assertEqual({p.pagador_id for p in depois[1:]}, {self.outro.id})
+        self.assertTrue(all(d.atualizado_em > a.atualizado_em for a, d in zip(antes, depois)))
+        self.assertEqual(
+            [sum(r.valor for r in p.rateios.all()) for p in depois], [Decimal("150.00")] * 4
+        )
+        for mes in (3, 4, 5, 6):
+            self.assertEqual(resumo_gravado(self.casal.id, date(2025, mes, 1)), calcular_resumo(self.casal.id, date(2025, mes, 1)))
+
+    def test_sincronizar_nao_carrega_relacoes_por_parcela(self):
+        compra = CompraCartao.objects.get(pk=self.comprar(parcelas=6)["id"])
+        compra.subcategoria = Subcategoria.objects.filter(categoria__casal=self.casal).last()
+        compra.save()
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            sincronizar_parcelas_da_compra(compra, self.user)
+        # copia os ids das FKs planejadas em vez de buscar subcategoria/fatura de cada parcela
+        self.assertFalse([q for q in ctx.captured_queries if 'FROM "despesas_subcategoria"' in q["sql"]])
+        self.assertEqual({p.subcategoria_id for p in self.parcelas({"id": compra.id})}, {compra.subcategoria_id})
+
+    def test_menos_parcelas_remove_so_a_diferenca(self):
+        compra = self.comprar(parcelas=4, valor="400.00")
+        antes = self.parcelas(compra)
+        self.salvar("patch", f"/api/compras-cartao/{compra['id']}/", parcelas_total=2)
+        depois = self.parcelas(compra)
+        self.assertEqual([p.id for p in depois], [p.id for p in antes[:2]])
+        self.assertEqual([p.valor_total for p in depois], [Decimal("200.00")] * 2)
+        self.assertEqual(resumo_gravado(self.casal.id, date(2025, 6, 1)), {})
+
+    @override_settings(DESPESAS_PARCELAS_LIMITE_SINCRONO=2, DESPESAS_TAREFAS_MODO="fila")
+    def test_plano_longo_vira_tarefa(self):
+        compra = self.comprar(parcelas=6, valor="600.00")
+        tarefa = compra["tarefa"]
+        self.assertEqual((tarefa["status"], self.parcelas(compra)), (StatusTarefa.PENDENTE, []))
+        self.assertEqual(self.client.get(f"/api/tarefas/{tarefa['id']}/").json()["status"], StatusTarefa.PENDENTE)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("executar_tarefas", stdout=io.StringIO())
+        dados = self.client.get(f"/api/tarefas/{tarefa['id']}/").json()
+        self.assertEqual((dados["status"], dados["processados"], dados["total"]), (StatusTarefa.CONCLUIDA, 6, 6))
+        self.assertEqual(len(self.parcelas(compra)), 6)
+        # concluída não é executada de novo
+        self.assertFalse(tarefas.executar(tarefa["id"]))
+
+    @override_settings(DESPESAS_TAREFAS_MODO="fila")
+    def test_tarefa_com_erro_e_escopo_do_grupo(self):
+        tarefa = TarefaProcessamento.objects.create(
+            casal=self.casal, tipo="sincronizar_parcelas_compra", parametros={"compra_id": 1, "inesperado": True},
+        )
+        with self.assertLogs("despesas.tarefas", "ERROR"):
+            self.assertTrue(tarefas.executar(tarefa.id))
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, StatusTarefa.ERRO)
+        self.assertIn("inesperado", tarefa.erro)
+        self.assertIsNotNone(tarefa.concluida_em)
+
+        outro_casal = Casal.objects.create(nome="Outra casa")
+        alheia = TarefaProcessamento.objects.create(casal=outro_casal, tipo="sincronizar_parcelas_compra")
+        ids = [t["id"] for t in self.client.get("/api/tarefas/").json()]
+        self.assertIn(tarefa.id, ids)
+        self.assertNotIn(alheia.id, ids)
+        self.assertEqual(self.client.get(f"/api/tarefas/{alheia.id}/").status_code, 404)
+
+
+class ArredondamentoTest(BaseCasalTestCase):
+    """Parcelas e rateios somam exatamente o valor_total, com a sobra dos centavos na última parte."""
+
+    def setUp(self):
+        super().setUp()
+        self.terceiro = User.objects.create_user(username="caio")
+        MembroCasal.objects.create(casal=self.casal, usuario=self.terceiro)
+
+    def assertRateiosFecham(self, lancamentos):
+        for lanc in lancamentos:
+            valores = list(lanc.rateios.order_by("id").values_list("valor", flat=True))
+            self.assertEqual(len(valores), 3)
+            self.assertEqual(sum(valores), lanc.valor_total, lanc.descricao)
+
+    def test_compra_em_tres_parcelas_para_tres_membros(self):
+        compra = CompraCartao.objects.create(
+            casal=self.casal, cartao=CartaoCredito.objects.create(casal=self.casal, nome="Cartão"),
+            subcategoria=self.subcategoria, valor_total=Decimal("100.00"), parcelas_total=3,
+            primeira_competencia=date(2025, 3, 1), primeiro_vencimento=date(2025, 3, 10), pagador=self.user,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            parcelas = gerar_lancamentos_da_compra(compra, self.user)
+        self.assertEqual([p.valor_total for p in parcelas], [Decimal("33.33"), Decimal("33.33"), Decimal("33.34")])
+        self.assertRateiosFecham(parcelas)
+        por_membro = dict(
+            RateioLancamento.objects.filter(lancamento__compra_cartao=compra)
+            .values("membro_id").annotate(total=Sum("valor")).values_list("membro_id", "total")
+        )
+        self.assertEqual(
+            por_membro,
+            {self.user.id: Decimal("33.33"), self.outro.id: Decimal("33.33"), self.terceiro.id: Decimal("33.34")},
+        )
+        self.assertEqual(sum(
+            ResumoMensal.objects.filter(casal=self.casal).values_list("valor_rateado", flat=True)
+        ), Decimal("100.00"))
+
+        # poucos centavos: as primeiras partes zeram e a última leva tudo
+        compra.valor_total = Decimal("0.05")
+        compra.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            parcelas = sincronizar_parcelas_da_compra(compra, self.user)
+        self.assertEqual([p.valor_total for p in parcelas], [Decimal("0.01"), Decimal("0.01"), Decimal("0.03")])
+        self.assertRateiosFecham(parcelas)
+
+    def test_rateio_de_lancamento_e_de_despesa_modelo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            avulso = Lancamento.objects.create(
+                casal=self.casal, subcategoria=self.subcategoria, escopo=EscopoDespesa.COMPARTILHADA,
+                competencia=date(2025, 3, 1),
+                data_vencimento=date(2025, 3, 5), valor_total=Decimal("100.00"), pagador=self.user, criado_por=self.user,
+            )
+            criar_rateios_para_lancamento(avulso)
+        self.assertEqual(
+            list(avulso.rateios.order_by("id").values_list("valor", flat=True)),
+            [Decimal("33.33"), Decimal("33.33"), Decimal("33.34")],
+        )
+
+        categoria = self.subcategoria.categoria
+        igual = DespesaModelo.objects.create(
+            casal=self.casal, nome="Internet", categoria=categoria, valor_previsto=Decimal("100.00"),
+            proxima_competencia=date(2025, 3, 1),
+        )
+        percentual = DespesaModelo.objects.create(
+            casal=self.casal, nome="Aluguel", categoria=categoria, valor_previsto=Decimal("100.00"),
+            regra_rateio=RegraRateio.PERCENTUAL, proxima_competencia=date(2025, 3, 1),
+        )
+        for membro, perc in ((self.user, "33.33"), (self.outro, "33.33"), (self.terceiro, "33.34")):
+            RegraRateioPadrao.objects.create(despesa_modelo=percentual, membro=membro, percentual=Decimal(perc))
+        with self.captureOnCommitCallbacks(execute=True):
+            criados = gerar_lancamentos_competencia(self.casal, date(2025, 3, 1), self.user)
+        self.assertEqual({l.despesa_modelo_id for l in criados}, {igual.id, percentual.id})
+        self.assertRateiosFecham(Lancamento.objects.filter(pk__in=[l.pk for l in criados]))
+        resumo = calcular_resumo(self.casal.id, date(2025, 3, 1))
+        self.assertEqual(resumo_gravado(self.casal.id, date(2025, 3, 1)), resumo)
+
+
+class FaturaCartaoTest(BaseCasalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cartao = CartaoCredito.objects.create(
+            casal=self.casal, nome="Cartão", limite=Decimal("1000.00"), dia_fechamento=3, dia_vencimento=10,
+        )
+
+    def comprar(self, data_compra, valor="300.00", parcelas=3):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/compras-cartao/", {
+                "cartao_id": self.cartao.id, "subcategoria_id": self.subcategoria.id, "valor_total": valor,
+                "parcelas_total": parcelas, "data_compra": data_compra, "pagador_id": self.user.id,
+            }, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def test_datas_pelo_fechamento(self):
+        # fecha dia 3, vence dia 10 do mesmo mês
+        self.assertEqual(competencia_da_compra(self.cartao, date(2025, 3, 2)), date(2025, 3, 1))
+        self.assertEqual(competencia_da_compra(self.cartao, date(2025, 3, 3)), date(2025, 4, 1))
+        # fecha dia 25, vence dia 5 do mês seguinte; dia 31 cai no fim de fevereiro
+        virada = CartaoCredito(casal=self.casal, dia_fechamento=25, dia_vencimento=5)
+        self.assertEqual(competencia_da_compra(virada, date(2025, 1, 24)), date(2025, 2, 1))
+        self.assertEqual(competencia_da_compra(virada, date(2025, 1, 25)), date(2025, 3, 1))
+        self.assertEqual(datas_da_fatura(virada, date(2025, 3, 1)), (date(2025, 2, 25), date(2025, 3, 5)))
+        fim = CartaoCredito(casal=self.casal, dia_fechamento=31, dia_vencimento=10)
+        self.assertEqual(datas_da_fatura(fim, date(2025, 3, 1)), (date(2025, 2, 28), date(2025, 3, 10)))
+
+    def test_editar_data_da_compra_muda_a_primeira_fatura(self):
+        compra = self.comprar("2025-03-05")
+        # PUT como o do formulário: devolve a competência e o vencimento gravados junto com a data nova
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(f"/api/compras-cartao/{compra['id']}/", {
+                "cartao_id": self.cartao.id, "subcategoria_id": self.subcategoria.id, "valor_total": "300.00",
+                "parcelas_total": 3, "data_compra": "2025-05-01", "primeira_competencia": compra["primeira_competencia"],
+                "primeiro_vencimento": compra["primeiro_vencimento"], "pagador_id": self.user.id,
+            }, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            (response.json()["primeira_competencia"], response.json()["primeiro_vencimento"]), ("2025-05-01", "2025-05-10")
+        )
+        parcelas = Lancamento.objects.filter(compra_cartao_id=compra["id"]).order_by("parcela_numero")
+        self.assertEqual([p.fatura.competencia for p in parcelas], [date(2025, m, 1) for m in (5, 6, 7)])
+
+        # mesma data: a competência informada continua valendo
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/compras-cartao/{compra['id']}/",
+                {"data_compra": "2025-05-01", "primeira_competencia": "2025-06-01", "primeiro_vencimento": "2025-06-10"},
+                format="json",
+            )
+        self.assertEqual(response.json()["primeira_competencia"], "2025-06-01")
+
+        # outro cartão, mesma data: a fatura segue o fechamento do novo cartão
+        virada = CartaoCredito.objects.create(casal=self.casal, nome="Virada", dia_fechamento=25, dia_vencimento=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f"/api/compras-cartao/{compra['id']}/", {"cartao_id": virada.id}, format="json")
+        self.assertEqual(
+            (response.json()["primeira_competencia"], response.json()["primeiro_vencimento"]), ("2025-06-01", "2025-06-05")
+        )
+
+    def test_compra_distribui_parcelas_e_atualiza_limite(self):
+        compra = self.comprar("2025-03-05")
+        self.assertEqual((compra["primeira_competencia"], compra["primeiro_vencimento"]), ("2025-04-01", "2025-04-10"))
+        parcelas = Lancamento.objects.filter(compra_cartao_id=compra["id"]).order_by("parcela_numero")
+        self.assertEqual(
+            [(p.fatura.competencia, p.data_vencimento) for p in parcelas],
+            [(date(2025, m, 1), date(2025, m, 10)) for m in (4, 5, 6)],
+        )
+        self.cartao.refresh_from_db()
+        self.assertEqual((self.cartao.limite_utilizado, self.cartao.limite_disponivel), (Decimal("300.00"), Decimal("700.00")))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/lancamentos/{parcelas[0].id}/quitar/", {}, format="json")
+        fatura = parcelas[0].fatura
+        fatura.refresh_from_db()
+        self.cartao.refresh_from_db()
+        self.assertEqual((fatura.valor_total, fatura.valor_pago, fatura.quantidade), (Decimal("100.00"), Decimal("100.00"), 1))
+        self.assertEqual(self.cartao.limite_utilizado, Decimal("200.00"))
+
+    def test_endpoint_le_faturas_sem_varrer_parcelas(self):
+        self.comprar("2025-03-01", valor="90.00", parcelas=1)
+        self.comprar("2025-03-02", valor="60.00", parcelas=2)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/api/cartoes/{self.cartao.id}/faturas/", {"competencia": "2025-03"})
+        dados = response.json()
+        self.assertEqual(dados["limite_disponivel"], 850.0)
+        self.assertEqual(
+            [(f["competencia"], f["valor_total"], f["quantidade"]) for f in dados["faturas"]],
+            [("2025-03-01", "120.00", 2)],
+        )
+        self.assertNotIn('"despesas_lancamento"', " ".join(q["sql"] for q in ctx.captured_queries))
+
+    def test_parcela_que_muda_de_mes_muda_de_fatura(self):
+        compra = self.comprar("2025-03-05", parcelas=2)
+        primeira, segunda = Lancamento.objects.filter(compra_cartao_id=compra["id"]).order_by("parcela_numero")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/lancamentos/{primeira.id}/", {"competencia": "2025-07-01", "data_vencimento": "2025-07-10"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        primeira.refresh_from_db()
+        self.assertEqual(primeira.fatura.competencia, date(2025, 7, 1))
+        totais = {
+            f.competencia.month: (f.valor_total, f.quantidade)
+            for f in FaturaCartao.objects.filter(cartao=self.cartao)
+        }
+        self.assertEqual(totais, {
+            4: (Decimal("0.00"), 0), 5: (Decimal("150.00"), 1), 7: (Decimal("150.00"), 1),
+        })
+        self.assertEqual(segunda.fatura.competencia, date(2025, 5, 1))
+
+    def test_mudar_dias_do_cartao_regrava_faturas_em_aberto(self):
+        hoje = timezone.localdate()
+        self.comprar("2025-03-05", valor="100.00", parcelas=1)
+        self.comprar(f"{hoje:%Y-%m-%d}", valor="100.00", parcelas=2)
+        antigas = {f.pk: (f.data_fechamento, f.data_vencimento) for f in FaturaCartao.objects.filter(competencia__lt=hoje.replace(day=1))}
+        response = self.client.patch(
+            f"/api/cartoes/{self.cartao.id}/", {"dia_fechamento": 20, "dia_vencimento": 28}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.cartao.refresh_from_db()
+        abertas = FaturaCartao.objects.filter(competencia__gte=hoje.replace(day=1))
+        self.assertEqual(abertas.count(), 2)
+        for fatura in abertas:
+            self.assertEqual((fatura.data_fechamento, fatura.data_vencimento), datas_da_fatura(self.cartao, fatura.competencia))
+            self.assertEqual(fatura.data_vencimento.day, 28)
+        self.assertEqual(
+            {f.pk: (f.data_fechamento, f.data_vencimento) for f in FaturaCartao.objects.filter(pk__in=antigas)}, antigas
+        )
+
+    def test_rebuild_liga_parcelas_antigas(self):
+        compra = CompraCartao.objects.create(
+            casal=self.casal, cartao=self.cartao, subcategoria=self.subcategoria, valor_total=Decimal("50.00"),
+            parcelas_total=1, primeira_competencia=date(2025, 5, 1), primeiro_vencimento=date(2025, 5, 10),
+            pagador=self.user,
+        )
+        gerar_lancamentos_da_compra(compra, self.user)
+        Lancamento.objects.update(fatura=None)
+        CartaoCredito.objects.update(limite_utilizado=0)
+        call_command("rebuild_resumos", stdout=io.StringIO())
+        self.cartao.refresh_from_db()
+        self.assertEqual(self.cartao.limite_utilizado, Decimal("50.00"))
+        self.assertEqual(self.cartao.faturas.get().valor_total, Decimal("50.00"))
+        call_command("rebuild_resumos", "--verificar", stdout=io.StringIO())
+
+
+class ProjecaoTest(BaseCasalTestCase):
+    def setUp(self):
+        super().setUp()
+        MembroCasal.objects.filter(usuario=self.user).update(salario_mensal=Decimal("3000.00"))
+        MembroCasal.objects.filter(usuario=self.outro).update(salario_mensal=Decimal("2000.00"))
+        categoria = self.subcategoria.categoria
+        self.mensal = DespesaModelo.objects.create(
+            casal=self.casal, nome="Aluguel", categoria=categoria, valor_previsto=Decimal("1000.00"),
+            proxima_competencia=date(2025, 3, 1),
+        )
+        DespesaModelo.objects.create(
+            casal=self.casal, nome="IPVA", categoria=categoria, valor_previsto=Decimal("1200.00"), periodicidade="ANUAL",
+            proxima_competencia=date(2025, 5, 1),
+        )
+        DespesaModelo.objects.create(
+            casal=self.casal, nome="Curso", categoria=categoria, valor_previsto=Decimal("300.00"), periodicidade="UNICA",
+            escopo=EscopoDespesa.PESSOAL, dono_pessoal=self.user, proxima_competencia=date(2025, 3, 1),
+        )
+        cartao = CartaoCredito.objects.create(casal=self.casal, nome="Cartão")
+        compra = CompraCartao.objects.create(
+            casal=self.casal, cartao=cartao, subcategoria=self.subcategoria, valor_total=Decimal("300.00"),
+            parcelas_total=3, primeira_competencia=date(2025, 3, 1), primeiro_vencimento=date(2025, 3, 10),
+            pagador=self.user,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            gerar_lancamentos_da_compra(compra, self.user)
+
+    def projecao(self, **params):
+        response = self.client.get("/api/projecao/", {"inicio": "2025-03", **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_combina_modelos_e_parcelas_por_mes_e_membro(self):
+        meses = self.projecao(meses=4)["competencias"]
+        self.assertEqual(
+            [(m["competencia"], m["cartao"], m["previsto"], m["total"], m["saldo"]) for m in meses],
+            [
+                ("2025-03", 100.0, 1300.0, 1400.0, 3600.0),
+                ("2025-04", 100.0, 1000.0, 1100.0, 3900.0),
+                ("2025-05", 100.0, 2200.0, 2300.0, 2700.0),
+                ("2025-06", 0.0, 1000.0, 1000.0, 4000.0),
+            ],
+        )
+        self.assertEqual(
+            [(p["membro"], p["total"], p["saldo"]) for p in meses[0]["por_membro"]],
+            [(self.user.id, 850.0, 2150.0), (self.outro.id, 550.0, 1450.0)],
+        )
+        self.assertFalse(Lancamento.objects.filter(despesa_modelo__isnull=False).exists())
+
+    def test_mes_gerado_usa_o_lancamento(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lanc = Lancamento.objects.create(
+                casal=self.casal, despesa_modelo=self.mensal, subcategoria=self.subcategoria, competencia=date(2025, 3, 1),
+                data_vencimento=date(2025, 3, 5), valor_total=Decimal("1100.00"), pagador=self.user, criado_por=self.user,
+            )
+            criar_rateios_para_lancamento(lanc)
+        marco = self.projecao(meses=1)["competencias"][0]
+        self.assertEqual((marco["recorrentes"], marco["previsto"], marco["total"]), (1100.0, 300.0, 1500.0))
+
+    def test_consultas_constantes_e_cache(self):
+        consultas = []
+        for meses in (1, 24):
+            cache.clear()
+            consultas.append(self.contar_consultas("/api/projecao/", inicio="2025-03", meses=meses))
+        self.assertEqual(consultas[0], consultas[1])
+        self.assertEqual(self.contar_consultas("/api/projecao/", inicio="2025-03", meses=24), 1)
+        for meses in (1, 24):
+            with self.assertNumQueries(6):
+                calcular_projecao(self.casal.id, date(2025, 3, 1), meses)
+
+        self.assertEqual(self.projecao(meses=1)["competencias"][0]["avulsos"], 0.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Lancamento.objects.create(
+                casal=self.casal, subcategoria=self.subcategoria, competencia=date(2025, 3, 1),
+                data_vencimento=date(2025, 3, 5), valor_total=Decimal("80.00"), pagador=self.user, criado_por=self.user,
+            )
+        self.assertEqual(self.projecao(meses=1)["competencias"][0]["avulsos"], 80.0)
+
+    def test_valida_meses(self):
+        self.assertEqual(self.client.get("/api/projecao/", {"meses": 30}).status_code, 400)
+        self.assertEqual(self.client.get("/api/projecao/", {"meses": "x"}).status_code, 400)
+
+
+class AgendaDespesasTest(BaseCasalTestCase):
+    def despesa(self, nome, proxima, **campos):
+        return DespesaModelo.objects.create(
+            casal=self.casal, nome=nome, categoria=self.subcategoria.categoria, valor_previsto=Decimal("100.00"),
+            proxima_competencia=proxima, **campos,
+        )
+
+    def gerar(self, competencia):
+        with self.captureOnCommitCallbacks(execute=True):
+            criados = gerar_lancamentos_competencia(self.casal, competencia, self.user)
+        return sorted(l.descricao for l in criados)
+
+    def test_periodicidades_e_fim_do_mes(self):
+        mensal = self.despesa("Aluguel", date(2025, 2, 1), dia_vencimento=31)
+        anual = self.despesa("IPVA", date(2025, 5, 1), periodicidade="ANUAL")
+        unica = self.despesa("Curso", date(2025, 2, 1), periodicidade="UNICA")
+        avulsa = self.despesa("Conserto", date(2025, 2, 1), recorrente=False)
+        self.despesa("Inativa", date(2025, 2, 1), ativo=False)
+
+        self.assertEqual(self.gerar(date(2025, 2, 1)), ["Aluguel", "Conserto", "Curso"])
+        self.assertEqual(
+            Lancamento.objects.get(despesa_modelo=mensal).data_vencimento, date(2025, 2, 28)
+        )
+        self.assertEqual(self.gerar(date(2025, 3, 1)), ["Aluguel"])
+        # geração atrasada lança os meses devidos; a anual mantém o mês de aniversário
+        self.assertEqual(self.gerar(date(2025, 7, 1)), ["Aluguel"] * 4 + ["IPVA"])
+        self.assertEqual(Lancamento.objects.get(despesa_modelo=anual).competencia, date(2025, 5, 1))
+        for dm in (mensal, anual, unica, avulsa):
+            dm.refresh_from_db()
+        self.assertEqual(
+            [dm.proxima_competencia for dm in (mensal, anual, unica, avulsa)],
+            [date(2025, 8, 1), date(2026, 5, 1), None, None],
+        )
+
+    def test_mes_ja_lancado_so_avanca_a_agenda(self):
+        mensal = self.despesa("Aluguel", date(2025, 2, 1))
+        Lancamento.objects.create(
+            casal=self.casal, despesa_modelo=mensal, subcategoria=self.subcategoria, competencia=date(2025, 2, 1),
+            data_vencimento=date(2025, 2, 5), valor_total=Decimal("90.00"), pagador=self.user, criado_por=self.user,
+        )
+        self.assertEqual(self.gerar(date(2025, 2, 1)), [])
+        mensal.refresh_from_db()
+        self.assertEqual(mensal.proxima_competencia, date(2025, 3, 1))
+
+    def test_geracao_atrasada_nao_pula_meses(self):
+        mensal = self.despesa("Aluguel", date(2025, 2, 1))
+        self.assertEqual(self.gerar(date(2025, 5, 1)), ["Aluguel"] * 4)
+        self.assertEqual(
+            list(Lancamento.objects.filter(despesa_modelo=mensal).order_by("competencia").values_list("competencia", flat=True)),
+            [date(2025, 2, 1), date(2025, 3, 1), date(2025, 4, 1), date(2025, 5, 1)],
+        )
+        self.assertEqual(
+            list(ResumoMensal.objects.filter(casal=self.casal).values_list("competencia", flat=True).distinct().order_by("competencia")),
+            [date(2025, 2, 1), date(2025, 3, 1), date(2025, 4, 1), date(2025, 5, 1)],
+        )
+        mensal.refresh_from_db()
+        self.assertEqual(mensal.proxima_competencia, date(2025, 6, 1))
+
+    def test_mes_passado_pode_ser_gerado_de_novo(self):
+        mensal = self.despesa("Aluguel", date(2025, 2, 1))
+        anual = self.despesa("IPVA", date(2025, 3, 1), periodicidade="ANUAL")
+        self.despesa("Curso", date(2025, 2, 1), periodicidade="UNICA")
+        self.gerar(date(2025, 3, 1))
+        self.despesa("Futura", date(2025, 6, 1))  # ainda não começou: não entra em meses passados
+        with self.captureOnCommitCallbacks(execute=True):
+            Lancamento.objects.filter(competencia=date(2025, 2, 1)).delete()
+
+        # única não se repete; fevereiro não é o mês da anual
+        self.assertEqual(self.gerar(date(2025, 2, 1)), ["Aluguel"])
+        saida = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("gerar_competencia", "--competencia", "2024-03", stdout=saida)
+        self.assertIn("2 lançamento(s) criado(s)", saida.getvalue())
+        self.assertEqual(
+            sorted(Lancamento.objects.filter(competencia=date(2024, 3, 1)).values_list("descricao", flat=True)),
+            ["Aluguel", "IPVA"],
+        )
+        for dm in (mensal, anual):
+            dm.refresh_from_db()
+        # a agenda não volta
+        self.assertEqual((mensal.proxima_competencia, anual.proxima_competencia), (date(2025, 4, 1), date(2026, 3, 1)))
+
+    def test_comando_so_processa_grupos_com_despesa_vencida(self):
+        self.despesa("Aluguel", date(2025, 2, 1))
+        outro = Casal.objects.create(nome="Outra casa")
+        MembroCasal.objects.create(casal=outro, usuario=self.outro)
+        criar_categorias_padrao_para_casal(outro)
+        DespesaModelo.objects.create(
+            casal=outro, nome="Futura", categoria=outro.categorias.first(), proxima_competencia=date(2025, 6, 1),
+        )
+        saida = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("gerar_competencia", "--competencia", "2025-02", stdout=saida)
+        self.assertIn("para 1 grupo(s)", saida.getvalue())
+        self.assertEqual(Lancamento.objects.filter(despesa_modelo__isnull=False).count(), 1)
+
+    def test_reagenda_unica_que_volta_a_ser_recorrente(self):
+        unica = self.despesa("Curso", None, periodicidade="UNICA")
+        response = self.client.patch(f"/api/despesas-modelo/{unica.id}/", {"periodicidade": "MENSAL"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        unica.refresh_from_db()
+        self.assertIsNotNone(unica.proxima_competencia)
+
+
+class GeracaoIdempotenteTest(BaseCasalTestCase):
+    def despesas(self, quantidade, proxima=date(2025, 2, 1)):
+        return [
+            DespesaModelo.objects.create(
+                casal=self.casal, nome=f"Despesa {i}", categoria=self.subcategoria.categoria,
+                valor_previsto=Decimal("100.00"), proxima_competencia=proxima,
+            )
+            for i in range(quantidade)
+        ]
+
+    def test_consultas_nao_crescem_com_as_despesas(self):
+        consultas = []
+        for quantidade, competencia in ((2, date(2025, 2, 1)), (6, date(2025, 3, 1))):
+            DespesaModelo.objects.all().delete()
+            self.despesas(quantidade, competencia)
+            with CaptureQueriesContext(connection) as ctx:
+                criados, _ = gerar_lancamentos_competencia_lote([self.casal], competencia, self.user)
+            self.assertEqual(len(criados[self.casal.id]), quantidade)
+            consultas.append(len(ctx.captured_queries))
+        self.assertEqual(consultas[0], consultas[1])
+
+    def test_restricao_impede_duplicar_despesa_no_mes(self):
+        dm = self.despesas(1)[0]
+        gerar_lancamentos_competencia_lote([self.casal], date(2025, 2, 1), self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Lancamento.objects.create(
+                casal=self.casal, despesa_modelo=dm, subcategoria=self.subcategoria, competencia=date(2025, 2, 1),
+                data_vencimento=date(2025, 2, 5), valor_total=Decimal("1.00"), pagador=self.user, criado_por=self.user,
+            )
+        response = self.client.post("/api/lancamentos/", {
+            "despesa_modelo": dm.id, "subcategoria_id": self.subcategoria.id, "escopo": EscopoDespesa.COMPARTILHADA,
+            "descricao": "Repetida", "competencia": "2025-02-01", "data_vencimento": "2025-02-05",
+            "valor_total": "1.00", "pagador_id": self.user.id,
+        }, format="json")
+        self.assertEqual(response.status_code, 400, response.content)
+
+    def test_agenda_desatualizada_nao_duplica(self):
+        # uma segunda geração que leu a agenda antes da primeira avançar
+        dm = self.despesas(1)[0]
+        gerar_lancamentos_competencia_lote([self.casal], date(2025, 2, 1), self.user)
+        DespesaModelo.objects.filter(pk=dm.pk).update(proxima_competencia=date(2025, 2, 1))
+        criados, erros = gerar_lancamentos_competencia_lote([self.casal], date(2025, 2, 1), self.user)
+        self.assertEqual((criados[self.casal.id], erros), ([], {}))
+        self.assertEqual(Lancamento.objects.filter(despesa_modelo=dm).count(), 1)
+
+    def test_grupo_com_erro_nao_impede_os_demais(self):
+        self.despesas(2)
+        grupos = {}
+        for nome, regra in (("Sem rateio", RegraRateio.PERCENTUAL), ("Vizinhos", RegraRateio.IGUAL)):
+            grupo = grupos[nome] = Casal.objects.create(nome=nome)
+            MembroCasal.objects.create(casal=grupo, usuario=self.outro)
+            criar_categorias_padrao_para_casal(grupo)
+            DespesaModelo.objects.create(
+                casal=grupo, nome="Condomínio", categoria=grupo.categorias.first(), regra_rateio=regra,
+                valor_previsto=Decimal("100.00"), proxima_competencia=date(2025, 2, 1),
+            )
+        # o grupo problemático fica no meio do lote
+        ids = [self.casal.id, grupos["Sem rateio"].id, grupos["Vizinhos"].id]
+        with self.captureOnCommitCallbacks(execute=True):
+            criados, erros = gerar_lancamentos_competencia_lote(ids, date(2025, 2, 1))
+        self.assertEqual(list(erros), [grupos["Sem rateio"].id])
+        self.assertIn("rateio percentual", erros[grupos["Sem rateio"].id])
+        self.assertEqual(
+            {casal_id: len(lancs) for casal_id, lancs in criados.items()},
+            {self.casal.id: 2, grupos["Sem rateio"].id: 0, grupos["Vizinhos"].id: 1},
+        )
+        # a agenda do grupo com erro não avança: a próxima geração tenta de novo
+        self.assertEqual(
+            DespesaModelo.objects.get(casal=grupos["Sem rateio"]).proxima_competencia, date(2025, 2, 1)
+        )
+        self.assertEqual(ResumoMensal.objects.filter(casal=grupos["Vizinhos"]).count(), 1)
+
+        # pelo comando, com um grupo por lote e num lote só
+        for chunk in ("1", "200"):
+            DespesaModelo.objects.update(proxima_competencia=date(2025, 3, 1))
+            saida = io.StringIO()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command("gerar_competencia", "--competencia", "2025-03", "--chunk", chunk, stdout=saida)
+            self.assertIn(f"Grupo {grupos['Sem rateio'].id}: ", saida.getvalue())
+            self.assertIn("3 lançamento(s) criado(s). 1 grupo(s) com erro.", saida.getvalue())
+            Lancamento.objects.filter(competencia=date(2025, 3, 1)).delete()
+
+
+class DashboardTest(BaseCasalTestCase):
+    SECOES = {
+        "grupo": "/api/grupos/meu/",
+        "moradores": "/api/moradores/",
+        "lancamentos_resumo": "/api/lancamentos-resumo/",
+        "relatorio": "/api/relatorio-financeiro/",
+        "categorias": "/api/categorias/",
+    }
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            lanc = Lancamento.objects.create(
+                casal=self.casal, subcategoria=self.subcategoria, competencia=date(2025, 3, 1),
+                data_vencimento=date(2025, 3, 5), valor_total=Decimal("80.00"), pagador=self.user, criado_por=self.user,
+            )
+            criar_rateios_para_lancamento(lanc)
+
+    def test_secoes_iguais_aos_endpoints(self):
+        response = self.client.get("/api/dashboard/", {"competencia": "2025-03"})
+        self.assertEqual(response.status_code, 200, response.content)
+        dados = response.json()
+        self.assertEqual(list(dados), list(self.SECOES))
+        for secao, url in self.SECOES.items():
+            original = self.client.get(url, {"competencia": "2025-03"} if secao == "relatorio" else {})
+            self.assertEqual(dados[secao], original.json(), secao)
+        self.assertEqual(dados["relatorio"]["total_gasto"], 80.0)
+
+    def test_escolhe_secoes(self):
+        dados = self.client.get("/api/dashboard/", {"secoes": "categorias,grupo"}).json()
+        self.assertEqual(list(dados), ["categorias", "grupo"])
+        response = self.client.get("/api/dashboard/", {"secoes": "grupo,saldo"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secoes", response.json())
+
+    def test_sem_grupo(self):
+        sozinho = User.objects.create_user(username="caio", password="123456")
+        self.client.force_authenticate(sozinho)
+        dados = self.client.get("/api/dashboard/").json()
+        self.assertIsNone(dados["grupo"])
+        self.assertEqual((dados["moradores"], dados["categorias"]), ([], []))
+        self.assertEqual(dados["relatorio"]["total_gasto"], 0)
+
+    def test_consultas_fixas(self):
+        antes = self.contar_consultas("/api/dashboard/")
+        cache.clear()
+        for i in range(5):
+            Lancamento.objects.create(
+                casal=self.casal, subcategoria=self.subcategoria, competencia=date(2025, 4, 1),
+                data_vencimento=date(2025, 4, 5), valor_total=Decimal("10.00"), pagador=self.outro, criado_por=self.user,
+            )
+            MembroCasal.objects.create(casal=self.casal, usuario=User.objects.create_user(username=f"m{i}"))
+        self.assertEqual(self.contar_consultas("/api/dashboard/"), antes)
+        # moradores e categorias vêm do cache de referência na segunda leitura
+        self.assertLess(self.contar_consultas("/api/dashboard/"), antes)
+
+
+class TendenciasTest(BaseCasalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.outra_sub = Subcategoria.objects.filter(categoria__casal=self.casal).exclude(
+            categoria=self.subcategoria.categoria
+        ).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            for mes, sub, pagador, valor in [
+                (1, self.subcategoria, self.user, "100.00"),
+                (2, self.subcategoria, self.outro, "150.00"),
+                (2, self.outra_sub, self.user, "50.00"),
+                (4, self.outra_sub, self.outro, "40.00"),
+            ]:
+                lanc = Lancamento.objects.create(
+                    casal=self.casal, subcategoria=sub, escopo=EscopoDespesa.COMPARTILHADA, competencia=date(2025, mes, 1),
+                    data_vencimento=date(2025, mes, 5), valor_total=Decimal(valor), pagador=pagador, criado_por=self.user,
+                )
+                criar_rateios_para_lancamento(lanc)
+
+    def tendencias(self, **params):
+        response = self.client.get("/api/tendencias/", {"fim": "2025-04", "meses": 4, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_totais_batem_com_o_relatorio(self):
+        dados = self.tendencias()
+        self.assertEqual((dados["inicio"], dados["fim"]), ("2025-01", "2025-04"))
+        self.assertEqual(
+            [(c["competencia"], c["total"], c["variacao"]) for c in dados["competencias"]],
+            [("2025-01", 100.0, None), ("2025-02", 200.0, 100.0), ("2025-03", 0.0, -100.0), ("2025-04", 40.0, None)],
+        )
+        for c in dados["competencias"]:
+            relatorio = self.client.get("/api/relatorio-financeiro/", {"competencia": c["competencia"]}).json()
+            self.assertEqual(c["total"], relatorio["total_gasto"])
+        self.assertEqual(dados["media_mensal"], 85.0)
+
+    def test_categorias_e_membros(self):
+        dados = self.tendencias()
+        self.assertEqual(
+            [(c["nome"], c["valores"], c["total"]) for c in dados["categorias"]],
+            [
+                (self.subcategoria.categoria.nome, [100.0, 150.0, 0.0, 0.0], 250.0),
+                (self.outra_sub.categoria.nome, [0.0, 50.0, 0.0, 40.0], 90.0),
+            ],
+        )
+        membros = {m["id"]: m for m in dados["membros"]}
+        self.assertEqual(membros[self.user.id]["pago"], [100.0, 50.0, 0.0, 0.0])
+        self.assertEqual(membros[self.user.id]["parte"], [50.0, 100.0, 0.0, 20.0])
+
+    def test_fim_define_a_janela(self):
+        for fim, esperado in (("2025-02", [("2025-01", 100.0), ("2025-02", 200.0)]),
+                              ("2025-03", [("2025-02", 200.0), ("2025-03", 0.0)])):
+            dados = self.tendencias(fim=fim, meses=2)
+            self.assertEqual(dados["fim"], fim)
+            self.assertEqual([(c["competencia"], c["total"]) for c in dados["competencias"]], esperado)
+        # sem fim, a janela termina no mês atual
+        dados = self.client.get("/api/tendencias/", {"meses": 2}).json()
+        self.assertEqual(dados["fim"], f"{timezone.localdate():%Y-%m}")
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get("/api/tendencias/", {"meses": 0}).status_code, 400)
+        self.assertEqual(self.client.get("/api/tendencias/", {"meses": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/tendencias/", {"fim": "abril"}).status_code, 400)
+
+
+@override_settings(DESPESAS_CONSULTAS_PARALELAS=True)
+class ConsultasParalelasAsgiTest(APITransactionTestCase):
+    # sob ASGI as consultas rodam em threads com conexões próprias; precisa de dados já gravados
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="ana", password="123456")
+        self.outro = User.objects.create_user(username="bia", password="123456")
+        self.casal = Casal.objects.create(nome="Casa")
+        MembroCasal.objects.create(casal=self.casal, usuario=self.user, salario_mensal=Decimal("3000.00"))
+        MembroCasal.objects.create(casal=self.casal, usuario=self.outro)
+        PreferenciasUsuario.objects.create(usuario=self.user, grupo_atual=self.casal)
+        criar_categorias_padrao_para_casal(self.casal)
+        lanc = Lancamento.objects.create(
+            casal=self.casal, subcategoria=Subcategoria.objects.filter(categoria__casal=self.casal).first(),
+            competencia=date(2025, 3, 1), data_vencimento=date(2025, 3, 5), valor_total=Decimal("80.00"),
+            pagador=self.user, criado_por=self.user,
+        )
+        criar_rateios_para_lancamento(lanc)
+        self.token = str(TokenComVinculos.for_user(self.user).access_token)
+        self.client.force_authenticate(self.user)
+
+    def get_asgi(self, url, params):
+        return async_to_sync(AsyncClient().get)(url, params, headers={"Authorization": f"Bearer {self.token}"})
+
+    def test_mesmo_resultado_que_sob_wsgi(self):
+        casos = [
+            ("/api/dashboard/", {"competencia": "2025-03"}),
+            ("/api/relatorio-financeiro/", {"competencia": "2025-03"}),
+            ("/api/tendencias/", {"fim": "2025-03", "meses": 3}),
+        ]
+        for url, params in casos:
+            with self.subTest(url=url), mock.patch("despesas.paralelo._isolado", wraps=_isolado) as espiao:
+                response = self.get_asgi(url, params)
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertGreaterEqual(espiao.call_count, 3)
+                self.assertEqual(response.json(), self.client.get(url, params).json())
+        self.assertEqual(self.get_asgi("/api/relatorio-financeiro/", {"competencia": "2025-03"}).json()["total_gasto"], 80.0)
+
+    @override_settings(DESPESAS_CONSULTAS_PARALELAS=False)
+    def test_desligado_roda_em_sequencia(self):
+        with mock.patch("despesas.paralelo._isolado", wraps=_isolado) as espiao:
+            response = self.get_asgi("/api/dashboard/", {})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertFalse(espiao.called)
+
+
+class CargaWsgiAsgiTest(APITransactionTestCase):
+    def test_perfis_respondem_sem_erros(self):
+        casais = criar_casais(2, prefixo="teste")
+        criar_lancamentos(casais, 10, meses=3)
+        criar_rateios(casais)
+        resultados = carga_wsgi_asgi(usuarios=2, requisicoes=4, prefixo="teste")
+        self.assertEqual(list(resultados), ["wsgi", "asgi", "asgi-sequencial"])
+        for perfil, r in resultados.items():
+            with self.subTest(perfil=perfil):
+                self.assertEqual((r["requisicoes"], r["erros"]), (8, 0))
+                self.assertGreater(r["rps"], 0)
+
+
+class GeracaoConcorrenteTest(unittest.TestCase):
+    # processos separados sobre um SQLite temporário (o banco de teste em memória não é compartilhável)
+    def test_processos_simultaneos_nao_duplicam(self):
+        r = geracao_concorrente(processos=3, grupos=6, despesas=3)
+        self.assertEqual(r["falhas"], [])
+        self.assertEqual((r["gerados"], r["duplicados"], r["sem_rateio"]), (18, 0, 0))
+        self.assertEqual(r["agenda_avancada"], 18)
+
+
+class PerfilBancoTest(unittest.TestCase):
+    # unittest puro: os perfis abrem conexões (em threads) para bancos temporários fora de settings.DATABASES
+    def test_sqlite_otimizado_nao_perde_gravacoes_concorrentes(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            config = perfis_de_escrita(pasta)["sqlite-otimizado"]
+            self.assertEqual(config["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+            self.assertIn("journal_mode=WAL", config["OPTIONS"]["init_command"])
+            resultado = escrita_concorrente("sqlite-otimizado", config, usuarios=3, transacoes=20)
+        self.assertEqual((resultado["gravadas"], resultado["falhas"]), (60, 0))
@@ -1,7 +1,12 @@
 # despesas/utils.py
+import calendar
+from datetime import date, datetime
 from typing import Optional, TYPE_CHECKING
 
+from dateutil.relativedelta import relativedelta
+
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
 from .models import MembroCasal, Casal, PreferenciasUsuario
 
 # Para tipagem somente em tempo de checagem (Pylance/Mypy), sem impactar o runtime.
@@ -11,41 +16,71 @@ if TYPE_CHECKING:
 User = get_user_model()
 
 
-def _get_or_create_prefs(user: "DjangoUser") -> PreferenciasUsuario:
-    prefs, _ = PreferenciasUsuario.objects.get_or_create(usuario=user)
-    return prefs
-
-
 def get_casal_ativo_do_usuario(user: "DjangoUser") -> Optional[Casal]:
     """
     1) Se houver grupo_atual nas preferências e o usuário ainda pertence a ele, usa esse.
     2) Senão, pega o primeiro grupo em que o usuário é membro ativo e sincroniza nas preferências.
     3) Se não houver nenhum, retorna None.
     """
-    prefs = (
-        PreferenciasUsuario.objects.filter(usuario=user)
-        .select_related("grupo_atual")
-        .first()
-    )
-    if prefs and prefs.grupo_atual_id:
-        if MembroCasal.objects.filter(
-            usuario=user, casal_id=prefs.grupo_atual_id, ativo=True
-        ).exists():
-            return prefs.grupo_atual
-
+    # Uma consulta para os dois casos: o grupo atual vem primeiro, senão o primeiro grupo ativo.
+    preferencias = PreferenciasUsuario.objects.filter(usuario=user)
     membro = (
         MembroCasal.objects.filter(usuario=user, ativo=True)
         .select_related("casal")
+        .annotate(
+            atual=Exists(preferencias.filter(grupo_atual=OuterRef("casal_id"))),
+            com_preferencias=Exists(preferencias),
+        )
+        .order_by("-atual", "id")
         .first()
     )
-    if membro:
-        prefs = prefs or _get_or_create_prefs(user)
-        if prefs.grupo_atual_id != membro.casal_id:
-            prefs.grupo_atual = membro.casal
-            prefs.save(update_fields=["grupo_atual"])
+    if membro is None:
+        return None
+    if membro.atual:
         return membro.casal
 
-    return None
+    if membro.com_preferencias:
+        # troca de grupo: save() para o signal invalidar os tokens com o grupo antigo
+        prefs = preferencias.get()
+        prefs.grupo_atual = membro.casal
+        prefs.save(update_fields=["grupo_atual"])
+    else:
+        # primeiro acesso: um INSERT só (sem tokens emitidos, não há versão a trocar)
+        PreferenciasUsuario.objects.bulk_create(
+            [PreferenciasUsuario(usuario=user, grupo_atual=membro.casal)], ignore_conflicts=True
+        )
+    return membro.casal
+
+
+_NAO_RESOLVIDO = object()
+
+
+def get_casal_ativo(request) -> Optional[Casal]:
+    """
+    Resolve o grupo ativo uma única vez por request e guarda em `request.casal_ativo`.
+    Aceita tanto a Request do DRF quanto o HttpRequest do Django (o cache fica no HttpRequest,
+    então permissões, mixins e views compartilham o mesmo resultado).
+    """
+    http_request = getattr(request, "_request", request)
+    casal = getattr(http_request, "casal_ativo", _NAO_RESOLVIDO)
+    if casal is _NAO_RESOLVIDO:
+        user = getattr(request, "user", None)
+        casal_do_token = getattr(user, "casal_do_token", _NAO_RESOLVIDO)
+        if casal_do_token is not _NAO_RESOLVIDO:
+            # autenticação sem consulta (despesas.autenticacao): o token já traz o grupo validado
+            casal = Casal.from_db(None, ["id"], [casal_do_token]) if casal_do_token else None
+        elif user is not None and user.is_authenticated:
+            casal = get_casal_ativo_do_usuario(user)
+        else:
+            casal = None
+        http_request.casal_ativo = casal
+    return casal
+
+
+def set_casal_ativo(request, casal: Optional[Casal]) -> None:
+    """Atualiza o grupo ativo já resolvido na request (ex.: após trocar/criar grupo)."""
+    http_request = getattr(request, "_request", request)
+    http_request.casal_ativo = casal
 
 
 def assert_user_pertence_ao_casal(user: "DjangoUser", casal: Casal) -> None:
@@ -53,3 +88,24 @@ def assert_user_pertence_ao_casal(user: "DjangoUser", casal: Casal) -> None:
         from django.core.exceptions import ValidationError
 
         raise ValidationError("Usuário não pertence ao grupo informado.")
+
+
+def dia_no_mes(mes: date, dia: int) -> date:
+    """Dia `dia` do mês de `mes`; dias além do fim do mês (ex.: 31 em fevereiro) caem no último dia."""
+    return mes.replace(day=min(dia, calendar.monthrange(mes.year, mes.month)[1]))
+
+
+def intervalo_competencia(valor: str) -> tuple[date, date]:
+    """
+    Converte "YYYY", "YYYY-MM" ou "YYYY-MM-DD" no intervalo [início, fim) de competências.
+    Levanta ValueError para formatos inválidos.
+    """
+    valor = (valor or "").strip()
+    if len(valor) == 4:
+        inicio = datetime.strptime(valor, "%Y").date()
+        return inicio, inicio + relativedelta(years=1)
+    if len(valor) == 7:
+        inicio = datetime.strptime(valor, "%Y-%m").date()
+    else:
+        inicio = datetime.strptime(valor, "%Y-%m-%d").date().replace(day=1)
+    return inicio, inicio + relativedelta(months=1)
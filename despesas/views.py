@@ -2,11 +2,17 @@ from datetime import date
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum, Q
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Prefetch, Sum, Q, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
+from django_filters.utils import translate_validation
 from rest_framework import status, viewsets, filters
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
@@ -20,6 +26,9 @@ from .models import (
     Lancamento,
     CartaoCredito,
     CompraCartao,
+    ResumoMensal,
+    StatusLancamento,
+    TarefaProcessamento,
 )
 from .permissions import (
     IsAutenticadoNoSeuCasal,
@@ -43,10 +52,32 @@ from .serializers import (
     LancamentoSerializer,
     CartaoCreditoSerializer,
     CompraCartaoSerializer,
+    FaturaCartaoSerializer,
     ResumoLancamentoSerializer,
+    TarefaProcessamentoSerializer,
+    QuitarSerializer,
+    QuitarLoteSerializer,
 )
-from .services import criar_categorias_padrao_para_casal
-from .utils import get_casal_ativo_do_usuario
+from .services import (
+    criar_categorias_padrao_para_casal,
+    criar_rateios_para_lancamento,
+    quitar_lancamento,
+    quitar_lancamentos_lote,
+    agendar_sincronizacao_parcelas,
+    remover_compra_cartao,
+)
+from . import cache_referencia, tarefas
+from .acerto import saldos_acumulados, saldos_do_resumo, transferencias_para_quitar
+from .cache_referencia import CacheReferenciaMixin
+from .condicional import GetCondicionalMixin
+from .exportacao import linhas_lancamentos_csv, membros_para_exportacao
+from .importacao import SINAIS, SINAL_NEGATIVO, formato_do_arquivo
+from .filters import FaturaCartaoFilter, LancamentoFilter, ResumoMensalFilter
+from .pagination import LancamentoPagination, CompraCartaoPagination, DespesaModeloPagination
+from .paralelo import coletar, em_paralelo
+from .projecao import MAXIMO_MESES, projecao
+from .tendencias import MAXIMO_MESES as MAXIMO_MESES_TENDENCIA, calcular_tendencias
+from .utils import get_casal_ativo, intervalo_competencia, set_casal_ativo
 
 User = get_user_model()
 
@@ -69,7 +100,7 @@ class ChangePasswordView(APIView):
         serializer.is_valid(raise_exception=True)
         user = request.user
         user.set_password(serializer.validated_data["nova_senha"])
-        user.save()
+        user.save(update_fields=["password"])
         return Response({"detail": "Senha alterada com sucesso."}, status=status.HTTP_200_OK)
 
 class CurrentUserView(APIView):
@@ -79,6 +110,10 @@ class CurrentUserView(APIView):
     """
     permission_classes = [IsAuthenticated]
     def get(self, request, *args, **kwargs):
+        adiados = request.user.get_deferred_fields()
+        if adiados:
+            # usuário montado do token: carrega o restante numa consulta só
+            request.user.refresh_from_db(fields=adiados)
         serializer = UsuarioSlimSerializer(request.user)
         return Response(serializer.data)
     def post(self, request, *args, **kwargs):
@@ -95,6 +130,7 @@ class CurrentUserView(APIView):
         prefs, _ = PreferenciasUsuario.objects.get_or_create(usuario=request.user)
         prefs.grupo_atual = grupo
         prefs.save(update_fields=["grupo_atual"])
+        set_casal_ativo(request, grupo)
         return Response({"detail": "Grupo atual definido com sucesso.", "grupo_id": grupo.id})
 
 # ---------------------------
@@ -110,7 +146,7 @@ class CasalExtrasViewSet(viewsets.ViewSet):
         if not username_or_email:
             return Response({"detail": "Informe username_or_email."}, status=400)
 
-        casal = get_casal_ativo_do_usuario(request.user)
+        casal = get_casal_ativo(request)
         if not casal:
             return Response({"detail": "Defina/crie um grupo atual para convidar pessoas."}, status=400)
 
@@ -134,13 +170,16 @@ class CasalExtrasViewSet(viewsets.ViewSet):
 # Grupo (Casal) e Moradores
 # ---------------------------
 
-class CasalViewSet(viewsets.ModelViewSet):
-    queryset = Casal.objects.all()
+class CasalViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
+    queryset = Casal.objects.prefetch_related(
+        Prefetch("membros", queryset=MembroCasal.objects.select_related("usuario"))
+    ).all()
+    relacoes_versao = ("membros",)
     serializer_class = CasalSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        casal = get_casal_ativo_do_usuario(self.request.user)
+        casal = get_casal_ativo(self.request)
         return self.queryset.filter(id=casal.id) if casal else self.queryset.none()
 
     def create(self, request, *args, **kwargs):
@@ -161,18 +200,22 @@ class CasalViewSet(viewsets.ModelViewSet):
         prefs, _ = PreferenciasUsuario.objects.get_or_create(usuario=request.user)
         prefs.grupo_atual = casal
         prefs.save(update_fields=["grupo_atual"])
+        set_casal_ativo(request, casal)
         return Response(self.get_serializer(casal).data, status=201)
 
     @action(detail=False, methods=["get"], url_path="meu")
     def meu(self, request):
-        casal = get_casal_ativo_do_usuario(request.user)
+        casal = get_casal_ativo(request)
         if not casal:
             # 200 com null: modo solo não quebra frontend
             return Response(None, status=200)
-        data = self.get_serializer(casal).data
-        return Response(data)
+        def gerar():
+            prefetch_related_objects([casal], *self.queryset._prefetch_related_lookups)
+            return Response(self.get_serializer(casal).data)
+        return self.responder_condicional(request, Casal.objects.filter(pk=casal.pk), gerar)
 
-class MembroCasalViewSet(CasalScopedQuerysetMixin, viewsets.ModelViewSet):
+class MembroCasalViewSet(GetCondicionalMixin, CacheReferenciaMixin, CasalScopedQuerysetMixin, viewsets.ModelViewSet):
+    recurso_cache = cache_referencia.MEMBROS
     queryset = MembroCasal.objects.select_related("casal", "usuario").all()
     serializer_class = MembroCasalSerializer
     permission_classes = [IsAuthenticated, IsAutenticadoNoSeuCasal, SomenteDoMeuCasal]
@@ -195,7 +238,8 @@ class MembroCasalViewSet(CasalScopedQuerysetMixin, viewsets.ModelViewSet):
 # Cadastros
 # ---------------------------
 
-class CategoriaViewSet(CasalScopedQuerysetMixin, viewsets.ModelViewSet):
+class CategoriaViewSet(GetCondicionalMixin, CacheReferenciaMixin, CasalScopedQuerysetMixin, viewsets.ModelViewSet):
+    recurso_cache = cache_referencia.CATEGORIAS
     queryset = Categoria.objects.all()
     serializer_class = CategoriaSerializer
     permission_classes = [IsAuthenticated, IsAutenticadoNoSeuCasal, SomenteDoMeuCasal]
@@ -211,10 +255,12 @@ class CategoriaViewSet(CasalScopedQuerysetMixin, viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(casal=self.get_casal_usuario())
 
-class SubcategoriaViewSet(viewsets.ModelViewSet):
+class SubcategoriaViewSet(GetCondicionalMixin, CacheReferenciaMixin, viewsets.ModelViewSet):
     """
     Não tem 'casal' direto; filtra por categoria__casal.
     """
+    relacoes_versao = ("categoria",)
+    recurso_cache = cache_referencia.SUBCATEGORIAS
     queryset = Subcategoria.objects.select_related("categoria", "categoria__casal").all()
     serializer_class = SubcategoriaSerializer
     permission_classes = [IsAuthenticated, IsAutenticadoNoSeuCasal, SomenteDoMeuCasal]
@@ -222,48 +268,52 @@ class SubcategoriaViewSet(viewsets.ModelViewSet):
     filterset_fields = ["categoria", "ativa"]
 
     def get_queryset(self):
-        casal = get_casal_ativo_do_usuario(self.request.user)
+        casal = get_casal_ativo(self.request)
         if not casal:
             return self.queryset.none()
         return self.queryset.filter(categoria__casal=casal)
 
     def create(self, request, *args, **kwargs):
-        casal = get_casal_ativo_do_usuario(request.user)
+        casal = get_casal_ativo(request)
         if not casal:
             return Response({"detail": "Crie/seleciona um grupo para cadastrar subcategorias."}, status=400)
         return super().create(request, *args, **kwargs)
 
-class DespesaModeloViewSet(viewsets.ModelViewSet):
+class DespesaModeloViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
     """
     Também filtra por categoria__casal.
     """
-    queryset = DespesaModelo.objects.select_related("categoria", "categoria__casal").all()
+    relacoes_versao = ("categoria", "rateios_padrao")
+    queryset = DespesaModelo.objects.select_related("categoria", "categoria__casal", "dono_pessoal").prefetch_related(
+        Prefetch("rateios_padrao", queryset=RegraRateioPadrao.objects.select_related("membro"))
+    ).all()
     serializer_class = DespesaModeloSerializer
     permission_classes = [IsAuthenticated, IsAutenticadoNoSeuCasal, SomenteDoMeuCasal]
+    pagination_class = DespesaModeloPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["ativo", "escopo", "categoria"]
 
     def get_queryset(self):
-        casal = get_casal_ativo_do_usuario(self.request.user)
+        casal = get_casal_ativo(self.request)
         if not casal:
             return self.queryset.none()
         return self.queryset.filter(categoria__casal=casal)
 
     def create(self, request, *args, **kwargs):
-        casal = get_casal_ativo_do_usuario(request.user)
+        casal = get_casal_ativo(request)
         if not casal:
             return Response({"detail": "Crie/seleciona um grupo para cadastrar despesas modelo."}, status=400)
         return super().create(request, *args, **kwargs)
 
-class RegraRateioPadraoViewSet(viewsets.ModelViewSet):
+class RegraRateioPadraoViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
     queryset = RegraRateioPadrao.objects.select_related(
-        "despesa_modelo", "despesa_modelo__categoria", "despesa_modelo__categoria__casal"
+        "despesa_modelo", "despesa_modelo__categoria", "despesa_modelo__categoria__casal", "membro"
     ).all()
     serializer_class = RegraRateioPadraoSerializer
     permission_classes = [IsAuthenticated, IsAutenticadoNoSeuCasal, SomenteDoMeuCasal]
 
     def get_queryset(self):
-        casal = get_casal_ativo_do_usuario(self.request.user)
+        casal = get_casal_ativo(self.request)
         if not casal:
             return self.queryset.none()
         return self.queryset.filter(despesa_modelo__categoria__casal=casal)
@@ -272,21 +322,34 @@ class RegraRateioPadraoViewSet(viewsets.ModelViewSet):
 # Financeiro
 # ---------------------------
 
-class LancamentoViewSet(CasalScopedQuerysetMixin, viewsets.ModelViewSet):
+class LancamentoViewSet(GetCondicionalMixin, CasalScopedQuerysetMixin, viewsets.ModelViewSet):
     queryset = Lancamento.objects.select_related(
         "subcategoria",
         "subcategoria__categoria",
         "compra_cartao",
+        "pagador",
+        "dono_pessoal",
+        "criado_por",
     ).all()
     serializer_class = LancamentoSerializer
     permission_classes = [IsAuthenticated, IsAutenticadoNoSeuCasal, SomenteDoMeuCasal]
+    pagination_class = LancamentoPagination
     filter_backends = [filters.OrderingFilter, DjangoFilterBackend]
     ordering_fields = ["competencia", "data_vencimento", "id"]
-    filterset_fields = ["status", "escopo", "subcategoria", "pagador"]
+    # status, escopo, subcategoria, pagador, compra_cartao + competencia/de/ate (YYYY-MM)
+    filterset_class = LancamentoFilter
 
     def get_queryset(self):
         return self.filter_queryset_por_casal(super().get_queryset())
 
+    def versao_condicional(self, queryset):
+        # o agregado sobre todo o histórico (com joins) custaria mais que a página; usa o contador do grupo
+        casal = self.get_casal_usuario()
+        if not casal:
+            return super().versao_condicional(queryset)
+        versao = Casal.objects.filter(pk=casal.pk).values_list("versao_lancamentos", flat=True).first()
+        return f"lancamentos={versao}", None
+
     def create(self, request, *args, **kwargs):
         casal = self.get_casal_usuario()
         if not casal:
@@ -294,17 +357,104 @@ class LancamentoViewSet(CasalScopedQuerysetMixin, viewsets.ModelViewSet):
         return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(casal=self.get_casal_usuario(), criado_por=self.request.user)
+        lancamento = serializer.save(casal=self.get_casal_usuario(), criado_por=self.request.user)
+        criar_rateios_para_lancamento(lancamento)
+
+    def perform_update(self, serializer):
+        # os rateios só mudam se mudar o valor ou quem participa da despesa
+        anterior = (serializer.instance.valor_total, serializer.instance.escopo, serializer.instance.dono_pessoal_id)
+        lancamento = serializer.save()
+        if (lancamento.valor_total, lancamento.escopo, lancamento.dono_pessoal_id) != anterior:
+            criar_rateios_para_lancamento(lancamento)
+
+    @action(detail=False, methods=["get"], url_path="exportar")
+    def exportar(self, request):
+        """CSV com todos os lançamentos que a listagem retornaria (mesmos filtros), sem paginação."""
+        casal = self.get_casal_usuario()
+        qs = self.filter_queryset(self.get_queryset())
+        if not request.query_params.get("ordering"):
+            qs = qs.order_by(*LancamentoPagination.ordering)
+        response = StreamingHttpResponse(
+            linhas_lancamentos_csv(qs, membros_para_exportacao(casal)), content_type="text/csv; charset=utf-8"
+        )
+        response["Content-Disposition"] = f'attachment; filename="lancamentos-{date.today():%Y%m%d}.csv"'
+        return response
+
+    @action(detail=False, methods=["post"], url_path="importar", parser_classes=[MultiPartParser])
+    def importar(self, request):
+        """
+        Importa um extrato CSV/OFX (campo `arquivo`) em segundo plano; responde 202 com a tarefa,
+        acompanhada por /api/tarefas/{id}/ (progresso e, ao final, importadas/duplicadas/erros por linha).
+        Opcionais: formato (csv|ofx, padrão pela extensão), pagador_id, subcategoria_id (padrão para linhas
+        sem subcategoria), status (padrão PAGO) e sinal (negativo|positivo: sinal das despesas no arquivo,
+        padrão negativo como nos extratos; as linhas do outro sinal são ignoradas).
+        """
+        casal = self.get_casal_usuario()
+        if not casal:
+            return Response({"detail": "Crie/seleciona um grupo para importar lançamentos."}, status=400)
+        arquivo = request.FILES.get("arquivo")
+        if not arquivo:
+            return Response({"arquivo": "Envie o arquivo do extrato."}, status=400)
+        try:
+            formato = formato_do_arquivo(arquivo.name, request.data.get("formato"))
+        except DjangoValidationError as exc:
+            return Response({"formato": exc.messages}, status=400)
+        status_lanc = request.data.get("status") or StatusLancamento.PAGO
+        if status_lanc not in StatusLancamento.values:
+            return Response({"status": "Status inválido."}, status=400)
+        pagador_id = request.data.get("pagador_id") or None
+        if pagador_id and not MembroCasal.objects.filter(casal=casal, usuario_id=pagador_id).exists():
+            return Response({"pagador_id": "O pagador precisa ser membro do grupo."}, status=400)
+        subcategoria_id = request.data.get("subcategoria_id") or None
+        if subcategoria_id and not Subcategoria.objects.filter(pk=subcategoria_id, categoria__casal=casal).exists():
+            return Response({"subcategoria_id": "Subcategoria não encontrada no grupo."}, status=400)
+        sinal = request.data.get("sinal") or SINAL_NEGATIVO
+        if sinal not in SINAIS:
+            return Response({"sinal": f"Use {' ou '.join(SINAIS)}."}, status=400)
+
+        # a tarefa lê o arquivo depois que a request termina, talvez em outro host: vai junto, no banco
+        tarefa = tarefas.enfileirar(
+            casal, "importar_lancamentos", criado_por=request.user, anexo=b"".join(arquivo.chunks()), formato=formato,
+            pagador_id=pagador_id, subcategoria_id=subcategoria_id, status=status_lanc, sinal=sinal,
+        )
+        return Response(TarefaProcessamentoSerializer(tarefa).data, status=status.HTTP_202_ACCEPTED)
+
+    def _dados_quitacao(self, serializer_class):
+        serializer = serializer_class(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        pagador = serializer.validated_data.get("pagador")
+        if pagador and not MembroCasal.objects.filter(casal=self.get_casal_usuario(), usuario=pagador).exists():
+            raise ValidationError({"pagador_id": "O pagador precisa ser membro do grupo."})
+        return serializer.validated_data
 
     @action(detail=True, methods=["post"], url_path="quitar")
     def quitar(self, request, pk=None):
+        """Marca como pago; opcionais: data_pagamento (padrão: hoje) e pagador_id."""
         lancamento = self.get_object()
-        if lancamento.status != "PAGO":
-            lancamento.status = "PAGO"
-            lancamento.save(update_fields=["status"])
+        dados = self._dados_quitacao(QuitarSerializer)
+        quitar_lancamento(lancamento, dados.get("data_pagamento"), dados.get("pagador"))
         return Response({"detail": "Quitado com sucesso."})
 
-class CartaoCreditoViewSet(CasalScopedQuerysetMixin, viewsets.ModelViewSet):
+    @action(detail=False, methods=["post"], url_path="quitar-lote")
+    def quitar_lote(self, request):
+        """
+        Quita vários lançamentos pendentes num único UPDATE. Corpo: `ids` e/ou `filtros` (os mesmos da
+        listagem, ex.: {"competencia": "2025-03", "cartao": 2}); opcionais data_pagamento e pagador_id.
+        """
+        dados = self._dados_quitacao(QuitarLoteSerializer)
+        qs = self.get_queryset()
+        if dados.get("ids"):
+            qs = qs.filter(id__in=dados["ids"])
+        if dados.get("filtros"):
+            filtro = LancamentoFilter(dados["filtros"], queryset=qs, request=request)
+            if not filtro.is_valid():
+                raise translate_validation(filtro.errors)
+            qs = filtro.qs
+        quitados = quitar_lancamentos_lote(qs, dados.get("data_pagamento"), dados.get("pagador"))
+        return Response({"quitados": quitados})
+
+class CartaoCreditoViewSet(GetCondicionalMixin, CacheReferenciaMixin, CasalScopedQuerysetMixin, viewsets.ModelViewSet):
+    recurso_cache = cache_referencia.CARTOES
     queryset = CartaoCredito.objects.all()
     serializer_class = CartaoCreditoSerializer
     permission_classes = [IsAuthenticated, IsAutenticadoNoSeuCasal, SomenteDoMeuCasal]
@@ -320,75 +470,297 @@ class CartaoCreditoViewSet(CasalScopedQuerysetMixin, viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(casal=self.get_casal_usuario())
 
-class CompraCartaoViewSet(CasalScopedQuerysetMixin, viewsets.ModelViewSet):
-    queryset = CompraCartao.objects.select_related("cartao", "subcategoria", "subcategoria__categoria").all()
+    @action(detail=True, methods=["get"], url_path="faturas")
+    def faturas(self, request, pk=None):
+        """
+        Faturas do cartão (totais mantidos por despesas.faturas) e limite disponível.
+        ?competencia=YYYY-MM ou ?de=YYYY-MM&ate=YYYY-MM filtram pelo mês de vencimento.
+        """
+        cartao = self.get_object()
+        filtro = FaturaCartaoFilter(request.query_params, queryset=cartao.faturas.exclude(quantidade=0))
+        if not filtro.is_valid():
+            raise translate_validation(filtro.errors)
+        return Response({
+            "cartao": cartao.id,
+            "limite": float(cartao.limite),
+            "limite_utilizado": float(cartao.limite_utilizado),
+            "limite_disponivel": float(cartao.limite_disponivel),
+            "faturas": FaturaCartaoSerializer(filtro.qs.order_by("competencia"), many=True).data,
+        })
+
+
+class CompraCartaoViewSet(GetCondicionalMixin, CasalScopedQuerysetMixin, viewsets.ModelViewSet):
+    queryset = CompraCartao.objects.select_related(
+        "cartao", "subcategoria", "subcategoria__categoria", "pagador", "dono_pessoal"
+    ).all()
+    relacoes_versao = ("cartao", "subcategoria", "subcategoria__categoria")
     serializer_class = CompraCartaoSerializer
     permission_classes = [IsAuthenticated, IsAutenticadoNoSeuCasal, SomenteDoMeuCasal]
+    pagination_class = CompraCartaoPagination
 
     def get_queryset(self):
         return self.filter_queryset_por_casal(super().get_queryset())
 
+    # Campos que, se alterados, exigem recriar as parcelas
+    CAMPOS_PARCELAS = (
+        "cartao", "descricao", "subcategoria", "escopo", "dono_pessoal", "valor_total",
+        "parcelas_total", "data_compra", "primeira_competencia", "primeiro_vencimento", "pagador",
+    )
+
     def create(self, request, *args, **kwargs):
         if not self.get_casal_usuario():
             return Response({"detail": "Crie/seleciona um grupo para lançar compras no cartão."}, status=400)
-        return super().create(request, *args, **kwargs)
+        response = super().create(request, *args, **kwargs)
+        return self._com_tarefa(response)
+
+    def update(self, request, *args, **kwargs):
+        response = super().update(request, *args, **kwargs)
+        return self._com_tarefa(response)
 
     def perform_create(self, serializer):
-        serializer.save(casal=self.get_casal_usuario())
+        compra = serializer.save(casal=self.get_casal_usuario())
+        self.tarefa = agendar_sincronizacao_parcelas(compra, self.request.user)
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        mudou = any(
+            campo in serializer.validated_data and serializer.validated_data[campo] != getattr(instance, campo)
+            for campo in self.CAMPOS_PARCELAS
+        )
+        compra = serializer.save()
+        self.tarefa = agendar_sincronizacao_parcelas(compra, self.request.user) if mudou else None
+
+    def perform_destroy(self, instance):
+        remover_compra_cartao(instance)
+
+    def _com_tarefa(self, response):
+        # Planos longos são gerados em segundo plano; o frontend acompanha por /api/tarefas/{id}/
+        tarefa = getattr(self, "tarefa", None)
+        response.data["tarefa"] = TarefaProcessamentoSerializer(tarefa).data if tarefa else None
+        return response
+
+class TarefaProcessamentoViewSet(GetCondicionalMixin, CasalScopedQuerysetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = TarefaProcessamento.objects.defer("anexo")
+    serializer_class = TarefaProcessamentoSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return self.filter_queryset_por_casal(super().get_queryset())
 
 # ---------------------------
 # Resumo / Relatório
 # ---------------------------
 
+RELATORIO_VAZIO = {"salario_declarado": 0, "total_gasto": 0, "gastos_por_categoria": []}
+
+
+def dados_lancamentos_resumo(casal) -> list:
+    qs = (
+        Lancamento.objects.filter(casal=casal)
+        .values("id", "descricao", "valor_total", "status", "competencia", "data_vencimento")
+        .order_by("-competencia", "-data_vencimento", "-id")[:200]
+    )
+    return list(qs)
+
+
+def dados_relatorio_financeiro(casal, params, paralelo=False) -> dict:
+    membro_id = params.get("membro_id")
+
+    # Lê do agregado materializado (ResumoMensal) em vez de somar os lançamentos a cada acesso
+    # ?competencia=YYYY-MM ou ?de=YYYY-MM&ate=YYYY-MM
+    filtro = ResumoMensalFilter(params, queryset=ResumoMensal.objects.filter(casal=casal))
+    if not filtro.is_valid():
+        raise translate_validation(filtro.errors)
+    qs = filtro.qs
+    if membro_id and membro_id != "geral":
+        # pagador OU dono_pessoal = membro
+        campo = "valor_envolvido"
+        qs = qs.filter(membro_id=membro_id).exclude(valor_envolvido=0)
+    else:
+        campo = "valor_pago"
+        qs = qs.exclude(valor_pago=0, quantidade=0)
+
+    # três agregados independentes: em paralelo sob ASGI (despesas.paralelo)
+    dados = coletar({
+        "total": lambda: qs.aggregate(total=Sum(campo))["total"] or 0,
+        "salario": lambda: (
+            MembroCasal.objects.filter(casal=casal, ativo=True).aggregate(total=Sum("salario_mensal"))["total"] or 0
+        ),
+        "por_cat": lambda: list(
+            qs.values("categoria__nome")
+            .annotate(valor_total=Sum(campo))
+            .order_by("-valor_total")
+        ),
+    }, paralelo)
+    return {
+        "salario_declarado": float(dados["salario"]),
+        "total_gasto": float(dados["total"]),
+        "gastos_por_categoria": [
+            {
+                "lancamento__subcategoria__categoria__nome": row["categoria__nome"],
+                "valor_total": float(row["valor_total"]),
+            }
+            for row in dados["por_cat"]
+        ],
+    }
+
+
 class ResumoLancamentosView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        casal = get_casal_ativo_do_usuario(request.user)
+        casal = get_casal_ativo(request)
         if not casal:
             return Response([], status=200)
-        qs = (
-            Lancamento.objects.filter(casal=casal)
-            .values("id", "descricao", "valor_total", "status", "competencia", "data_vencimento")
-            .order_by("-competencia", "-data_vencimento", "-id")[:200]
-        )
-        return Response(list(qs), status=200)
+        return Response(dados_lancamentos_resumo(casal), status=200)
+
 
 class RelatorioFinanceiroView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        casal = get_casal_ativo_do_usuario(request.user)
+        casal = get_casal_ativo(request)
         if not casal:
-            return Response(
-                {"salario_declarado": 0, "total_gasto": 0, "gastos_por_categoria": []},
-                status=200,
-            )
-        competencia = request.query_params.get("competencia")
-        membro_id = request.query_params.get("membro_id")
-
-        qs = Lancamento.objects.filter(casal=casal)
-        if competencia:
-            qs = qs.filter(competencia__startswith=competencia)  # "YYYY-MM"
-        if membro_id and membro_id != "geral":
-            qs = qs.filter(Q(pagador_id=membro_id) | Q(dono_pessoal_id=membro_id))
-
-        total = qs.aggregate(total=Sum("valor_total"))["total"] or 0
-        salario = (
-            MembroCasal.objects.filter(casal=casal, ativo=True).aggregate(total=Sum("salario_mensal"))["total"] or 0
-        )
-        por_cat = (
-            qs.values("subcategoria__categoria__nome")
-            .annotate(valor_total=Sum("valor_total"))
-            .order_by("-valor_total")
-        )
-        data = {
-            "salario_declarado": float(salario),
-            "total_gasto": float(total),
-            "gastos_por_categoria": [
-                {
-                    "lancamento__subcategoria__categoria__nome": row["subcategoria__categoria__nome"],
-                    "valor_total": float(row["valor_total"]),
-                }
-                for row in por_cat
-            ],
+            return Response(RELATORIO_VAZIO, status=200)
+        return Response(dados_relatorio_financeiro(casal, request.query_params, em_paralelo(request)), status=200)
+
+
+class DashboardView(APIView):
+    """
+    Tela inicial numa única requisição. Seções (padrão: todas; ?secoes=grupo,relatorio escolhe):
+    grupo (/api/grupos/meu/), moradores (/api/moradores/), lancamentos_resumo (/api/lancamentos-resumo/),
+    relatorio (/api/relatorio-financeiro/, com os mesmos filtros competencia/de/ate/membro_id) e
+    categorias (/api/categorias/), cada uma com o payload do endpoint original. Usuário e grupo ativo
+    são resolvidos uma vez; sob ASGI as seções rodam em paralelo (despesas.paralelo).
+    """
+    permission_classes = [IsAuthenticated]
+    vazio = {
+        "grupo": None, "moradores": [], "lancamentos_resumo": [], "relatorio": RELATORIO_VAZIO, "categorias": [],
+    }
+
+    def get(self, request):
+        pedidas = [s for s in request.query_params.get("secoes", "").split(",") if s] or list(self.vazio)
+        invalidas = sorted(set(pedidas) - set(self.vazio))
+        if invalidas:
+            raise ValidationError({"secoes": f"Seções desconhecidas: {', '.join(invalidas)}."})
+        casal = get_casal_ativo(request)
+        if not casal:
+            return Response({secao: self.vazio[secao] for secao in pedidas}, status=200)
+
+        params = request.query_params
+        geradores = {
+            "grupo": lambda: CasalSerializer(CasalViewSet.queryset.get(pk=casal.pk)).data,
+            # mesmas chaves de cache das listagens sem filtro (CacheReferenciaMixin)
+            "moradores": lambda: cache_referencia.obter(
+                cache_referencia.MEMBROS, casal.id, "",
+                lambda: MembroCasalSerializer(MembroCasalViewSet.queryset.filter(casal=casal), many=True).data,
+            ),
+            "lancamentos_resumo": lambda: dados_lancamentos_resumo(casal),
+            "relatorio": lambda: dados_relatorio_financeiro(casal, params),
+            "categorias": lambda: cache_referencia.obter(
+                cache_referencia.CATEGORIAS, casal.id, "",
+                lambda: CategoriaSerializer(CategoriaViewSet.queryset.filter(casal=casal), many=True).data,
+            ),
         }
-        return Response(data, status=200)
+        return Response(coletar({secao: geradores[secao] for secao in pedidas}, em_paralelo(request)), status=200)
+
+
+def ler_janela(params, campo_mes, padrao, maximo):
+    """(mês, meses) de ?<campo_mes>=YYYY-MM (padrão: mês atual) e ?meses=1..maximo."""
+    try:
+        meses = int(params.get("meses", padrao))
+    except ValueError:
+        raise ValidationError({"meses": "Informe um número inteiro."})
+    if not 1 <= meses <= maximo:
+        raise ValidationError({"meses": f"Use de 1 a {maximo} meses."})
+    mes = timezone.localdate().replace(day=1)
+    if params.get(campo_mes):
+        try:
+            mes, _ = intervalo_competencia(params[campo_mes])
+        except ValueError:
+            raise ValidationError({campo_mes: "Use o formato YYYY-MM."})
+    return mes, meses
+
+
+class ProjecaoView(APIView):
+    """
+    Projeção de caixa dos próximos meses (despesas.projecao): lançamentos já gravados + despesas-modelo
+    ainda não geradas, por mês e por membro, contra os salários. ?meses=1..24 (padrão 12) e
+    ?inicio=YYYY-MM (padrão: mês atual). Não cria lançamentos.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        casal = get_casal_ativo(request)
+        if not casal:
+            return Response({"membros": [], "competencias": [], "avisos": []}, status=200)
+        inicio, meses = ler_janela(request.query_params, "inicio", padrao=12, maximo=MAXIMO_MESES)
+        return Response(projecao(casal.id, inicio, meses), status=200)
+
+
+class TendenciasView(APIView):
+    """
+    Tendência dos gastos (despesas.tendencias): total mês a mês com variação, cada categoria e, por
+    membro, pago × parte nos rateios. ?meses=1..36 (padrão 6) terminando em ?fim=YYYY-MM (padrão: mês atual).
+    Sob ASGI as três consultas rodam em paralelo.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        casal = get_casal_ativo(request)
+        if not casal:
+            return Response({"competencias": [], "categorias": [], "membros": []}, status=200)
+        fim, meses = ler_janela(request.query_params, "fim", padrao=6, maximo=MAXIMO_MESES_TENDENCIA)
+        return Response(calcular_tendencias(casal.id, fim, meses, em_paralelo(request)), status=200)
+
+
+class AcertoContasView(APIView):
+    """
+    Quem deve a quem no grupo, considerando só lançamentos pagos.
+    Sem filtros: saldo acumulado (SaldoMembro). Com ?competencia=YYYY-MM ou ?de=YYYY-MM&ate=YYYY-MM:
+    saldo do período, numa consulta agrupada sobre ResumoMensal.
+    saldo > 0: tem a receber; saldo < 0: deve. `transferencias` zera todos os saldos.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        casal = get_casal_ativo(request)
+        if not casal:
+            return Response({"saldos": [], "transferencias": []}, status=200)
+
+        filtro = ResumoMensalFilter(request.query_params, queryset=ResumoMensal.objects.filter(casal=casal))
+        if not filtro.is_valid():
+            raise translate_validation(filtro.errors)
+        if any(request.query_params.get(campo) for campo in filtro.filters):
+            saldos = saldos_do_resumo(filtro.qs)
+        else:
+            saldos = saldos_acumulados(casal.id)
+
+        membros = MembroCasal.objects.filter(casal=casal).select_related("usuario").order_by("id")
+        nomes = {}
+        linhas = []
+        for m in membros:
+            nomes[m.usuario_id] = m.apelido or m.usuario.first_name or m.usuario.username
+            # membros inativos só aparecem se ainda tiverem saldo
+            if m.ativo or saldos.get(m.usuario_id):
+                linhas.append({
+                    "membro": UsuarioSlimSerializer(m.usuario).data,
+                    "apelido": nomes[m.usuario_id],
+                    "saldo": float(saldos.get(m.usuario_id, 0)),
+                })
+        transferencias = [
+            {"de": devedor, "de_nome": nomes.get(devedor, ""), "para": credor, "para_nome": nomes.get(credor, ""),
+             "valor": float(valor)}
+            for devedor, credor, valor in transferencias_para_quitar(saldos)
+        ]
+        return Response({"saldos": linhas, "transferencias": transferencias}, status=200)
+
+
+class CacheReferenciaView(APIView):
+    """Acertos/faltas/invalidações do cache de dados de referência, por recurso. DELETE zera os contadores."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_referencia.estatisticas())
+
+    def delete(self, request):
+        cache_referencia.limpar_estatisticas()
+        return Response(status=204)
@@ -0,0 +1,18 @@
+import api from "@/api/axios";
+
+// Listagens paginadas por cursor (lançamentos, compras no cartão, despesas modelo):
+// segue o link `next` até a última página e devolve todas as linhas.
+// Respostas sem paginação (listas simples) são devolvidas como vieram.
+export async function buscarTodas(url, params = {}) {
+  const itens = [];
+  let cursor = null;
+  do {
+    const { data } = await api.get(url, {
+      params: cursor ? { ...params, cursor } : params,
+    });
+    if (Array.isArray(data)) return data;
+    itens.push(...(data?.results ?? []));
+    cursor = data?.next ? new URL(data.next).searchParams.get("cursor") : null;
+  } while (cursor);
+  return itens;
+}
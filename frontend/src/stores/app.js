@@ -31,6 +31,18 @@ export const useAppStore = defineStore("app", {
       }
     },
 
+    // grupo, moradores, resumo, relatório e categorias numa requisição só
+    async fetchDashboard(params = {}) {
+      try {
+        const { data } = await api.get("/dashboard/", { params });
+        if ("grupo" in data) this.grupoAtual = data.grupo;
+        if ("moradores" in data) this.moradores = data.moradores;
+        return data;
+      } catch (e) {
+        console.error("Erro ao buscar painel", e);
+      }
+    },
+
     async fetchMoradores() {
       try {
         const { data } = await api.get("/moradores/");
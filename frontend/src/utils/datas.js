@@ -0,0 +1,6 @@
+// Competência ("YYYY-MM") do mês corrente no fuso do navegador.
+// toISOString() usa UTC: no Brasil, à noite do último dia do mês já seria o mês seguinte.
+export function competenciaAtual(data = new Date()) {
+  const mes = String(data.getMonth() + 1).padStart(2, "0");
+  return `${data.getFullYear()}-${mes}`;
+}